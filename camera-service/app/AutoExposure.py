@@ -0,0 +1,193 @@
+# Системные импорты
+import os, sys, time, threading
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Внешние модули
+import numpy as np
+
+# Внутренние модули
+from common.Logger import config_logger
+
+logger = config_logger("camera-service/AutoExposure.py")
+
+
+def exposure_statistics(image, bits=8, step=8, region=None):
+    """
+    Яркость кадра по прореженной выборке: каждый step-й пиксель по строкам и столбцам
+    (1/step² кадра), поэтому расчёт занимает микросекунды, а не проход по всему кадру.
+    :param image: кадр Mono (h, w) или BGR (h, w, 3) - для цветного берётся зелёный канал.
+    :param bits: разрядность значений кадра uint16 (10, 12, 16); для uint8 не используется.
+    :param region: (x0, y0, x1, y1) - область замера в пикселях кадра, None - весь кадр.
+    :return: словарь Mean, P5, P50, P95 и Clipped (доля пересвеченных пикселей), яркость в долях полной шкалы.
+    """
+    if region is not None:
+        x0, y0, x1, y1 = region
+        image = image[y0:y1, x0:x1]
+    if image.ndim == 3:
+        image = image[..., 1]
+    sample = image[::step, ::step]
+    if sample.size == 0:
+        return None
+    if sample.dtype != np.uint8:
+        # Гистограмма на 256 столбцов при любой разрядности
+        sample = np.right_shift(sample, max(0, bits - 8)).astype(np.uint8)
+    histogram = np.bincount(sample.ravel(), minlength=256)[:256]
+    cumulative = np.cumsum(histogram)
+    total = cumulative[-1]
+    p5, p50, p95 = np.searchsorted(cumulative, (0.05 * total, 0.5 * total, 0.95 * total))
+    return {
+        "Mean": float(np.dot(histogram, np.arange(256))) / total / 255,
+        "P5": float(p5) / 255,
+        "P50": float(p50) / 255,
+        "P95": float(p95) / 255,
+        "Clipped": float(histogram[250:].sum()) / total,
+    }
+
+
+class AutoExposure:
+    """
+    Программная автоэкспозиция.
+    Рабочие потоки конвейера передают кадры в submit(): он только считает статистику
+    прореженной выборки в области замера. Экспозицию меняет отдельный поток регулятора,
+    поэтому запись параметров камеры не задерживает захват и публикацию.
+    Регулятор демпфирован: за шаг экспозиция меняется на долю Damping от нужного изменения
+    и не более чем в MaxStepRatio раз; после изменения выжидается SettleFrames кадров.
+    """
+
+    def __init__(self, set_exposure, exposure, bits=8, target=0.45, tolerance=0.05, damping=0.5,
+                 max_step_ratio=2.0, min_exposure=50.0, max_exposure=200000.0, max_clipped=0.01,
+                 step=8, interval=0.2, settle_frames=2, metrics=None):
+        """
+        :param set_exposure: функция установки экспозиции камеры, мкс.
+        :param exposure: текущая экспозиция камеры, мкс.
+        :param bits: разрядность кадров uint16.
+        :param target: целевая средняя яркость в долях полной шкалы.
+        :param tolerance: допустимое относительное отклонение яркости, при котором экспозиция не меняется.
+        :param damping: доля нужного изменения экспозиции за один шаг (0-1].
+        :param max_step_ratio: наибольшее изменение экспозиции за шаг, раз.
+        :param min_exposure: нижняя граница экспозиции, мкс.
+        :param max_exposure: верхняя граница экспозиции, мкс.
+        :param max_clipped: допустимая доля пересвеченных пикселей; при превышении экспозиция уменьшается.
+        :param step: шаг прореживания выборки, пикселей.
+        :param interval: наименьший интервал между замерами, сек.
+        :param settle_frames: кадров после изменения экспозиции, которые не участвуют в замере.
+        :param metrics: счётчики канала (common.Metrics) для стадии exposure_stats и счётчика exposure_changes.
+        """
+        self.__set_exposure = set_exposure
+        self.exposure = float(exposure)
+        self.bits = int(bits)
+        self.target = float(target)
+        self.tolerance = float(tolerance)
+        self.damping = min(1.0, max(0.01, float(damping)))
+        self.max_step_ratio = max(1.0, float(max_step_ratio))
+        self.min_exposure = float(min_exposure)
+        self.max_exposure = float(max_exposure)
+        self.max_clipped = float(max_clipped)
+        self.step = max(1, int(step))
+        self.interval = float(interval)
+        self.settle_frames = max(0, int(settle_frames))
+        self.__metrics = metrics
+        # Область замера в пикселях сенсора (Left, Top, Right, Bottom), None - весь кадр
+        self.region = None
+        self.statistics = None
+        self.__last_sample_time = 0.0
+        # Номер кадра, начиная с которого кадры сняты с новой экспозицией
+        self.__settled_seq = 0
+        self.__last_seq = 0
+        self.__lock = threading.Lock()
+        self.__pending = threading.Event()
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__control_loop, daemon=True)
+        self.__thread.start()
+
+    def set_region(self, roi):
+        """Область замера: словарь Left, Top, Right, Bottom в пикселях сенсора (например, откалиброванная область)."""
+        self.region = (roi["Left"], roi["Top"], roi["Right"], roi["Bottom"]) if roi else None
+
+    def __frame_region(self, frame):
+        """Область замера в пикселях кадра с учётом положения кадра на сенсоре и объединения пикселей."""
+        if self.region is None:
+            return None
+        left, top, right, bottom = self.region
+        b = max(1, frame.binning)
+        h, w = frame.image.shape[:2]
+        x0 = min(w, max(0, int((left - frame.offset_x) // b)))
+        y0 = min(h, max(0, int((top - frame.offset_y) // b)))
+        x1 = min(w, max(0, int((right - frame.offset_x) // b)))
+        y1 = min(h, max(0, int((bottom - frame.offset_y) // b)))
+        if x1 <= x0 or y1 <= y0:
+            # Область вне кадра: замер по всему кадру
+            return None
+        return x0, y0, x1, y1
+
+    def submit(self, frame):
+        """Замер яркости кадра в рабочем потоке конвейера; не чаще, чем раз в interval секунд."""
+        if frame.host_timestamp - self.__last_sample_time < self.interval or frame.seq < self.__settled_seq:
+            return
+        self.__last_sample_time = frame.host_timestamp
+        start = time.perf_counter()
+        statistics = exposure_statistics(frame.image, self.bits, self.step, self.__frame_region(frame))
+        if self.__metrics is not None:
+            self.__metrics.observe("exposure_stats", time.perf_counter() - start)
+        if statistics is None:
+            return
+        with self.__lock:
+            self.statistics = statistics
+            self.__last_seq = max(self.__last_seq, frame.seq)
+        self.__pending.set()
+
+    def __next_exposure(self, statistics):
+        """Новая экспозиция по замеру или None, если яркость в допуске."""
+        mean = max(statistics["Mean"], 1.0 / 255)
+        if statistics["Clipped"] > self.max_clipped and mean >= self.target:
+            # Пересвет: уменьшаем экспозицию, даже если средняя яркость в допуске
+            ratio = 1.0 / self.max_step_ratio
+        elif abs(mean - self.target) <= self.tolerance * self.target:
+            return None
+        else:
+            ratio = self.target / mean
+        ratio = min(self.max_step_ratio, max(1.0 / self.max_step_ratio, ratio ** self.damping))
+        exposure = min(self.max_exposure, max(self.min_exposure, self.exposure * ratio))
+        if abs(exposure - self.exposure) < 1.0:
+            return None
+        return exposure
+
+    def __control_loop(self):
+        """Поток регулятора: изменение экспозиции по последнему замеру."""
+        while not self.__stop.is_set():
+            if not self.__pending.wait(timeout=1):
+                continue
+            self.__pending.clear()
+            with self.__lock:
+                statistics, seq = self.statistics, self.__last_seq
+            exposure = self.__next_exposure(statistics)
+            if exposure is None:
+                continue
+            try:
+                self.__set_exposure(exposure)
+            except Exception as e:
+                logger.warning(f"Не удалось установить экспозицию {exposure:.0f} мкс: {e}")
+                continue
+            logger.debug(
+                f"Экспозиция {self.exposure:.0f} -> {exposure:.0f} мкс, "
+                f"яркость {statistics['Mean']:.3f}, пересвет {statistics['Clipped']:.3f}"
+            )
+            self.exposure = exposure
+            # Кадры, уже захваченные с прежней экспозицией, в замер не попадают
+            self.__settled_seq = seq + 1 + self.settle_frames
+            if self.__metrics is not None:
+                self.__metrics.count("exposure_changes")
+
+    def status(self) -> dict:
+        return {
+            "Exposure": round(self.exposure, 1),
+            "Target": self.target,
+            "Region": list(self.region) if self.region else None,
+            "Statistics": self.statistics,
+        }
+
+    def close(self):
+        self.__stop.set()
+        self.__pending.set()
+        self.__thread.join(timeout=2)
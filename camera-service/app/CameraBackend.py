@@ -0,0 +1,159 @@
+# Системные импорты
+import os, sys, time
+from threading import Lock
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Внутренние модули
+from common.Logger import config_logger
+
+logger = config_logger("camera-service/CameraBackend.py")
+
+# Режимы захвата кадров
+ACQUISITION_MODE_TRIGGER = "Trigger"        # Программный триггер на каждый кадр
+ACQUISITION_MODE_CONTINUOUS = "Continuous"  # Непрерывный захват с заданной частотой кадров
+ACQUISITION_MODE_HARDWARE = "Hardware"      # Аппаратный триггер на входе камеры: серия кадров на каждый фронт
+
+# Реализации камеры
+BACKEND_HIK = "Hik"        # Камера Hikvision через MvCameraControl SDK
+BACKEND_REPLAY = "Replay"  # Воспроизведение PNG-каталога, видеофайла или синтетических кадров
+
+
+class CameraFrame:
+    """
+    Кадр, заимствованный у камеры. Изображение может ссылаться на буфер SDK
+    или пула, поэтому после использования кадр необходимо вернуть через release().
+    Для удержания кадра несколькими потребителями используется retain().
+    """
+
+    def __init__(self, image, frame_num, release_callback=None, device_timestamp=0, host_timestamp=None,
+                 offset_x=0, offset_y=0, binning=1, trigger_timestamp=0.0):
+        self.image = image
+        self.frame_num = frame_num
+        self.seq = None
+        # Метка времени камеры (такты устройства) и хоста (секунды Unix) в момент захвата
+        self.device_timestamp = device_timestamp
+        self.host_timestamp = time.time() if host_timestamp is None else host_timestamp
+        # Положение кадра на сенсоре (области интереса), в пикселях сенсора
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.binning = binning
+        # Момент фронта триггера, запустившего серию кадров (секунды Unix), 0 - кадр без внешнего триггера
+        self.trigger_timestamp = trigger_timestamp
+        self.__release_callback = release_callback
+        self.__refs = 1
+        self.__lock = Lock()
+
+    def retain(self):
+        """Увеличивает счётчик владельцев кадра."""
+        with self.__lock:
+            self.__refs += 1
+        return self
+
+    def release(self):
+        """Возвращает буфер кадра владельцу, когда кадр отпущен всеми владельцами."""
+        with self.__lock:
+            if self.__refs <= 0:
+                return
+            self.__refs -= 1
+            if self.__refs > 0:
+                return
+            callback, self.__release_callback = self.__release_callback, None
+        if callback is not None:
+            callback()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class CameraBackend:
+    """
+    Интерфейс камеры, которым пользуются main.py и FramePipeline.
+    HikCamera реализует его поверх SDK, ReplayCamera - поверх файлов и синтетических кадров.
+    """
+
+    acquisition_mode = ACQUISITION_MODE_TRIGGER
+    # Счётчики и задержки стадий захвата (common.Metrics)
+    metrics = None
+
+    def open(self, acquisition_mode=ACQUISITION_MODE_TRIGGER, frame_rate=None, buffer_count=4, pixel_format="Mono8",
+             roi=None, hardware_trigger=None):
+        """
+        Открытие камеры и запуск захвата.
+        :param roi: область интереса: словарь Left, Top, Right, Bottom (пиксели сенсора) и Binning;
+            None - весь сенсор. Фактическая область доступна через get_roi().
+        :param hardware_trigger: параметры режима Hardware: словарь Line, Edge, BurstFrames, DelayUs.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Остановка захвата и закрытие камеры."""
+        raise NotImplementedError
+
+    def is_opened(self):
+        """Камера открыта и связь с ней не потеряна."""
+        raise NotImplementedError
+
+    def reconnect(self):
+        """
+        Быстрое переподключение к тому же устройству после обрыва связи: без поиска устройств,
+        с параметрами последнего open() и установленными ранее параметрами камеры.
+        """
+        raise NotImplementedError
+
+    def borrow_frame(self, timeout=None):
+        """Кадр без копирования (CameraFrame) или None, если за timeout секунд кадр не получен."""
+        raise NotImplementedError
+
+    def get_frame(self):
+        """Копия текущего кадра."""
+        raise NotImplementedError
+
+    def get_ip(self):
+        raise NotImplementedError
+
+    def get_device_name(self):
+        raise NotImplementedError
+
+    def get_serial_number(self):
+        raise NotImplementedError
+
+    def get_roi(self):
+        """Фактическая область интереса: словарь OffsetX, OffsetY, Width, Height (пиксели сенсора) и Binning."""
+        raise NotImplementedError
+
+    def get_stream_statistics(self):
+        """Статистика транспортного потока камеры (потери пакетов и т.п.), словарь."""
+        raise NotImplementedError
+
+    def set_exposure(self, exposure_value):
+        raise NotImplementedError
+
+    def set_frame_rate(self, frame_rate):
+        raise NotImplementedError
+
+    def set_tone_mapping(self, enabled, gamma=1.0, precise=False):
+        raise NotImplementedError
+
+    def apply_parameters(self, parameters, stop_on_error=False):
+        """Установка нескольких параметров камеры, возвращает словарь ошибок."""
+        raise NotImplementedError
+
+
+def create_camera(backend=BACKEND_HIK, **kwargs):
+    """
+    Создание камеры выбранной реализации.
+    SDK Hikvision импортируется только для BACKEND_HIK, поэтому воспроизведение
+    работает на машинах без камеры и без установленного SDK.
+    """
+    logger.info(f"Создание камеры, реализация: {backend}")
+    if backend == BACKEND_HIK:
+        from HikCamera.HikCamera import HikCamera
+        return HikCamera(**kwargs)
+    if backend == BACKEND_REPLAY:
+        from ReplayCamera import ReplayCamera
+        return ReplayCamera(**kwargs)
+    raise ValueError(f"Неизвестная реализация камеры: {backend}")
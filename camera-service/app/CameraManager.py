@@ -0,0 +1,763 @@
+# Системные импорты
+import os, sys, re, time, threading
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Внешние модули
+import numpy as np
+import cv2
+
+# Внутренние модули
+from common.Config import Config
+from common.Logger import config_logger
+from common.FrameBus import FrameBusWriter, pixel_format_from_array, FRAME_BUS_NAME, REDIS_CAMERA_FRAME_BUS_KEY
+from common.FrameMeta import FrameMeta, publish_frame as publish_redis_frame, meta_key, seq_key
+from common.FrameNotifier import FrameNotifier
+from common.CameraRoi import REDIS_CAMERA_ROI_KEY, get_roi_request
+from common.FrameLease import (
+    REDIS_CAMERA_LEASES_KEY, RENDITIONS, RENDITION_FRAME, RENDITION_FRAME_BUS, RENDITION_PREVIEW,
+    get_active_leases, lease_demand,
+)
+from common.Metrics import Metrics
+from CameraBackend import (
+    create_camera, BACKEND_HIK, BACKEND_REPLAY, ACQUISITION_MODE_TRIGGER, ACQUISITION_MODE_CONTINUOUS,
+)
+from CaptureTrigger import IOTrigger, ACQUISITION_MODE_IO
+from AutoExposure import AutoExposure
+from FramePipeline import FramePipeline
+from FrameRecorder import FrameRecorder
+
+logger = config_logger("camera-service/CameraManager.py")
+
+REDIS_CAMERA_FRAME_KEY = os.getenv("REDIS_CAMERA_FRAME_KEY", "camera_frame")
+REDIS_CAMERA_PREVIEW_KEY = os.getenv("REDIS_CAMERA_PREVIEW_KEY", "camera_frame_preview")
+# Идентификатор основной камеры: она использует прежние разделы конфигурации и ключи Redis
+PRIMARY_CAMERA_ID = "main"
+
+# Состояния подключения канала камеры
+CAMERA_STATE_STOPPED = "Stopped"
+CAMERA_STATE_CONNECTING = "Connecting"        # Первое подключение
+CAMERA_STATE_STREAMING = "Streaming"          # Камера снимает
+CAMERA_STATE_RECONNECTING = "Reconnecting"    # Связь потеряна, переподключение к известному устройству
+CAMERA_STATE_REDISCOVERING = "Rediscovering"  # Устройство не отвечает по прежнему адресу, повторный поиск
+
+_MISSING = object()
+
+
+def camera_id_from_serial(serial):
+    """Идентификатор камеры, пригодный для ключей Redis, имён разделяемой памяти и URL."""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", serial) or "camera"
+
+
+class CameraChannel:
+    """
+    Камера со своим конвейером захвата, шиной кадров, ключами Redis и разделом конфигурации.
+    Основная камера работает с разделами HikCamera/Camera/Replay и прежними ключами,
+    остальные - с разделом Cameras.<id>, значения которого перекрывают разделы основной камеры,
+    и ключами с суффиксом _<id>.
+    """
+
+    def __init__(self, camera_id, redis_client=None, serial=None):
+        """
+        :param camera_id: идентификатор камеры; PRIMARY_CAMERA_ID - основная камера.
+        :param redis_client: клиент Redis для публикации кадров и запросов области интереса.
+        :param serial: серийный номер камеры Hikvision; None - первое найденное устройство.
+        """
+        self.camera_id = camera_id
+        self.primary = camera_id == PRIMARY_CAMERA_ID
+        self.serial = serial
+        self.__prefix = "" if self.primary else f"Cameras.{camera_id}."
+        suffix = "" if self.primary else f"_{camera_id}"
+        self.frame_key = REDIS_CAMERA_FRAME_KEY + suffix
+        self.preview_key = REDIS_CAMERA_PREVIEW_KEY + suffix
+        self.roi_key = REDIS_CAMERA_ROI_KEY + suffix
+        self.leases_key = REDIS_CAMERA_LEASES_KEY + suffix
+        self.frame_bus_name = FRAME_BUS_NAME + suffix
+        self.frame_bus_key = REDIS_CAMERA_FRAME_BUS_KEY + suffix
+        # Переменная окружения позволяет запустить воспроизведение без изменения конфигурации (например, в CI)
+        self.backend = os.getenv("CAMERA_BACKEND") or self.config_get("Camera.Backend", BACKEND_HIK)
+
+        self.__redis_client = redis_client
+        self.camera = None
+        self.pipeline = None
+        self.frame_bus = None
+        self.recorder = None
+        self.trigger = None
+        self.auto_exposure = None
+        # Задержки стадий публикации: record, encode, preview, publish, полная capture_to_publish
+        # и trigger_to_publish от фронта датчика
+        self.metrics = Metrics()
+        self.__publish_lock = threading.Lock()
+        self.__last_published_seq = 0
+        self.__preview_lock = threading.Lock()
+        self.__last_preview_time = 0.0
+        self.__reconfigure_lock = threading.Lock()
+        # Заявки потребителей: действующие заявки, потребность (вариант -> частота, None - публикуются все
+        # варианты) и применённая частота захвата
+        self.leases = []
+        self.__demand = None
+        self.__acquisition_target = None
+        self.__lease_lock = threading.Lock()
+        self.__rendition_lock = threading.Lock()
+        self.__last_rendition_time = {}
+        # Состояние подключения, момент обрыва связи, число и длительность последнего переподключения
+        self.state = CAMERA_STATE_STOPPED
+        self.disconnected_since = None
+        self.reconnects = 0
+        self.last_reconnect_ms = None
+        self.__stop = threading.Event()
+        self.__connect_thread = None
+        self.__roi_thread = None
+        self.__lease_thread = None
+
+    def config_get(self, key, default=None):
+        """Значение из раздела камеры, иначе из раздела основной камеры."""
+        if not self.primary:
+            value = Config.get(self.__prefix + key, _MISSING)
+            if value is not _MISSING:
+                return value
+        return Config.get(key, default)
+
+    def config_set(self, key, value):
+        """Запись значения в раздел камеры."""
+        Config.set(self.__prefix + key, value)
+
+    def is_connected(self):
+        return self.camera is not None and self.camera.is_opened()
+
+    def __create_camera(self):
+        """Создание камеры выбранной реализации."""
+        if self.backend == BACKEND_REPLAY:
+            return create_camera(
+                BACKEND_REPLAY,
+                source=self.config_get("Replay.Source", ""),
+                fps=self.config_get("Replay.FPS", 10.0),
+                pixel_format=self.config_get("Replay.PixelFormat", "Mono8"),
+                loop=self.config_get("Replay.Loop", True),
+                width=self.config_get("Replay.Width", 1280),
+                height=self.config_get("Replay.Height", 1024),
+            )
+        camera = create_camera(
+            self.backend,
+            serial=self.serial,
+            lock_name=self.config_get("HikCamera.TriggerLockGroup"),
+            heartbeat_timeout_ms=self.config_get("HikCamera.HeartbeatTimeoutMs"),
+            # Повторы поиска выполняет канал с собственной задержкой и проверкой остановки
+            wait_for_device=False,
+        )
+        self.config_set("HikCamera.IPAddress", camera.get_ip())
+        self.config_set("HikCamera.DeviceName", camera.get_device_name())
+        self.config_set("HikCamera.SerialNumber", camera.get_serial_number())
+        Config.save()
+        return camera
+
+    def acquisition_mode(self):
+        """Режим захвата канала: режимы камеры и IO - программный триггер по событиям io-service."""
+        return self.config_get("HikCamera.AcquisitionMode", ACQUISITION_MODE_TRIGGER)
+
+    def frame_rate_key(self):
+        """Ключ частоты непрерывного захвата: у воспроизведения своя частота Replay.FPS."""
+        return "Replay.FPS" if self.backend == BACKEND_REPLAY else "HikCamera.AcquisitionFrameRate"
+
+    def open_camera(self, roi=None):
+        """Открытие камеры с параметрами из конфигурации и областью интереса roi."""
+        camera = self.camera
+        mode = self.acquisition_mode()
+        camera.open(
+            acquisition_mode=ACQUISITION_MODE_TRIGGER if mode == ACQUISITION_MODE_IO else mode,
+            frame_rate=self.config_get(self.frame_rate_key(), 0),
+            buffer_count=self.config_get("HikCamera.BufferCount", 4),
+            pixel_format=self.config_get("Replay.PixelFormat" if self.backend == BACKEND_REPLAY else "HikCamera.PixelFormat", "Mono8"),
+            roi=roi,
+            hardware_trigger=self.config_get("CaptureTrigger"),
+        )
+        camera.set_tone_mapping(
+            self.config_get("HikCamera.ToneMap8Bit", False),
+            self.config_get("HikCamera.ToneMapGamma", 1.0),
+            self.config_get("HikCamera.ToneMapPrecise", False),
+        )
+        camera.set_exposure(self.config_get("HikCamera.ExposureValue"))
+
+    def __rendition_due(self, rendition, frame):
+        """Нужен ли вариант публикации кадра потребителям с учётом частоты из заявок."""
+        demand = self.__demand
+        if demand is None:
+            return True
+        if rendition not in demand:
+            return False
+        fps = demand[rendition]
+        if not fps:
+            return True
+        with self.__rendition_lock:
+            # Допуск на дрожание интервала захвата, иначе при равных частотах пропускался бы каждый второй кадр
+            if frame.host_timestamp - self.__last_rendition_time.get(rendition, 0.0) < 0.9 / fps:
+                return False
+            self.__last_rendition_time[rendition] = frame.host_timestamp
+            return True
+
+    def __preview_due(self, frame):
+        """Нужна ли уменьшенная копия кадра с учётом заявок и ограничения Preview.MaxFPS."""
+        if not self.config_get("Preview.Enabled", True) or not self.__rendition_due(RENDITION_PREVIEW, frame):
+            return False
+        max_fps = self.config_get("Preview.MaxFPS", 0)
+        if not max_fps:
+            return True
+        with self.__preview_lock:
+            if frame.host_timestamp - self.__last_preview_time < 1.0 / max_fps:
+                return False
+            self.__last_preview_time = frame.host_timestamp
+            return True
+
+    def __encode_preview(self, image):
+        """Уменьшенная копия кадра для браузера: масштаб и качество JPEG из раздела Preview."""
+        scale = self.config_get("Preview.Scale", 0.5)
+        if 0 < scale < 1:
+            size = (max(1, int(image.shape[1] * scale)), max(1, int(image.shape[0] * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        if image.dtype != np.uint8:
+            image = cv2.convertScaleAbs(image, alpha=255.0 / np.iinfo(image.dtype).max)
+        _, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.config_get("Preview.JpegQuality", 70)])
+        return buffer, image.shape[1], image.shape[0]
+
+    def clear_preview(self):
+        """Удаляет уменьшенную копию из Redis, чтобы стриминг не показывал устаревший кадр."""
+        try:
+            self.__redis_client.delete(self.preview_key, meta_key(self.preview_key), seq_key(self.preview_key))
+        except Exception as e:
+            logger.warning(f"Не удалось удалить уменьшенную копию кадра камеры {self.camera_id}: {e}")
+
+    def publish_frame(self, frame):
+        """Публикует кадр в шину кадров камеры и, при необходимости, JPEG и уменьшенную копию в Redis."""
+        metrics = self.metrics
+        buffer = None
+        write_bus = self.frame_bus is not None and self.__rendition_due(RENDITION_FRAME_BUS, frame)
+        publish_jpeg = self.frame_bus is None or self.config_get("FrameBus.PublishJpeg", True)
+        if publish_jpeg and self.__rendition_due(RENDITION_FRAME, frame):
+            # Кодирование выполняется параллельно в рабочих потоках конвейера
+            with metrics.timer("encode"):
+                _, buffer = cv2.imencode(".jpg", frame.image, [cv2.IMWRITE_JPEG_QUALITY, 100])
+        preview = None
+        if frame.seq > self.__last_published_seq and self.__preview_due(frame):
+            # Уменьшенная копия создаётся один раз на кадр и отдаётся всем браузерам через streaming-service
+            with metrics.timer("preview"):
+                preview = self.__encode_preview(frame.image)
+        with self.__publish_lock:
+            # Рабочие потоки могут закончить кадры не по порядку, устаревший кадр не публикуем
+            if frame.seq <= self.__last_published_seq:
+                metrics.count("stale_frames")
+                logger.debug(f"Кадр {frame.seq} камеры {self.camera_id} устарел, публикация пропущена")
+                return
+            self.__last_published_seq = frame.seq
+            publish_start = time.perf_counter()
+            if write_bus:
+                self.frame_bus.write(
+                    frame.image, seq=frame.seq,
+                    host_timestamp=frame.host_timestamp, device_timestamp=frame.device_timestamp,
+                    offset_x=frame.offset_x, offset_y=frame.offset_y, binning=frame.binning,
+                    trigger_timestamp=frame.trigger_timestamp,
+                )
+            if buffer is not None:
+                meta = FrameMeta(
+                    frame.seq, frame.host_timestamp, frame.device_timestamp,
+                    width=frame.image.shape[1], height=frame.image.shape[0],
+                    pixel_format=pixel_format_from_array(frame.image),
+                    offset_x=frame.offset_x, offset_y=frame.offset_y, binning=frame.binning,
+                    trigger_timestamp=frame.trigger_timestamp,
+                )
+                publish_redis_frame(self.__redis_client, self.frame_key, buffer.tobytes(), meta)
+            if preview is not None:
+                preview_buffer, width, height = preview
+                meta = FrameMeta(
+                    frame.seq, frame.host_timestamp, frame.device_timestamp,
+                    width=width, height=height, pixel_format="Mono8" if frame.image.ndim == 2 else "BGR8",
+                    offset_x=frame.offset_x, offset_y=frame.offset_y, binning=frame.binning,
+                    trigger_timestamp=frame.trigger_timestamp,
+                )
+                publish_redis_frame(self.__redis_client, self.preview_key, preview_buffer.tobytes(), meta)
+            metrics.observe("publish", time.perf_counter() - publish_start)
+        metrics.observe("capture_to_publish", time.time() - frame.host_timestamp)
+        if frame.trigger_timestamp:
+            metrics.observe("trigger_to_publish", time.time() - frame.trigger_timestamp)
+        metrics.mark("published_frames")
+
+    def __record(self, frame):
+        """Копия кадра в кольцевой буфер регистратора с замером времени."""
+        with self.metrics.timer("record"):
+            self.recorder.record(frame)
+
+    def get_metrics(self):
+        """Счётчики захвата камеры, статистика потока SDK и задержки публикации."""
+        camera = self.camera
+        if self.pipeline is not None:
+            self.metrics.set_gauge("pipeline_dropped_frames", self.pipeline.dropped_frames)
+        try:
+            stream = camera.get_stream_statistics() if self.is_connected() else {}
+        except Exception as e:
+            logger.warning(f"Не удалось получить статистику потока камеры {self.camera_id}: {e}")
+            stream = {"Error": str(e)}
+        return {
+            "CameraId": self.camera_id,
+            "Connected": self.is_connected(),
+            "Acquisition": camera.metrics.snapshot() if camera is not None and camera.metrics is not None else None,
+            "Stream": stream,
+            "Publishing": self.metrics.snapshot(),
+            "Recorder": self.recorder.status() if self.recorder is not None else None,
+        }
+
+    def start(self):
+        """Подключение к камере и запуск захвата в отдельном потоке, чтобы камеры не ждали друг друга."""
+        self.__stop.clear()
+        self.state = CAMERA_STATE_CONNECTING
+        self.__connect_thread = threading.Thread(target=self.__supervise, daemon=True)
+        self.__connect_thread.start()
+
+    def __connect(self, reconnect=False):
+        """
+        Подключение к камере до успеха или остановки с экспоненциальной задержкой между попытками
+        от Camera.Reconnect.InitialDelayMs до MaxDelayMs.
+        При переподключении сначала повторяется быстрый путь к известному устройству (camera.reconnect()),
+        и только если устройство не ответило за RediscoverAfterMs, камера создаётся заново с поиском устройства.
+        :return: True - камера открыта, False - канал остановлен.
+        """
+        delay_ms = self.config_get("Camera.Reconnect.InitialDelayMs", 50)
+        max_delay_ms = self.config_get("Camera.Reconnect.MaxDelayMs", 2000)
+        rediscover_at = time.monotonic() + self.config_get("Camera.Reconnect.RediscoverAfterMs", 5000) / 1000
+        while not self.__stop.is_set():
+            try:
+                if self.camera is None:
+                    self.camera = self.__create_camera()
+                    self.open_camera(self.config_get("Camera.Roi"))
+                elif reconnect:
+                    self.camera.reconnect()
+                else:
+                    self.open_camera(self.config_get("Camera.Roi"))
+                if self.camera.is_opened():
+                    return True
+            except Exception as e:
+                logger.error(f"Ошибка при подключении к камере {self.camera_id}: {e}. Повтор через {delay_ms} мс.")
+            if reconnect and self.camera is not None and time.monotonic() >= rediscover_at:
+                logger.warning(f"Камера {self.camera_id} не отвечает по прежнему адресу, повторный поиск устройства")
+                self.state = CAMERA_STATE_REDISCOVERING
+                self.__discard_camera()
+            self.__stop.wait(delay_ms / 1000)
+            delay_ms = min(delay_ms * 2, max_delay_ms)
+        return False
+
+    def __discard_camera(self):
+        """Закрытие камеры без сохранённого устройства: следующая попытка создаст камеру с поиском устройства."""
+        camera, self.camera = self.camera, None
+        try:
+            camera.close()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии камеры {self.camera_id}: {e}")
+
+    def __supervise(self):
+        """Подключение к камере, запуск публикации и надзор за связью с камерой."""
+        if not self.__connect():
+            return
+        logger.info(f"Камера {self.camera_id} успешно подключена")
+        self.__start_publishing()
+        self.state = CAMERA_STATE_STREAMING
+        interval = self.config_get("Camera.Reconnect.CheckIntervalMs", 50) / 1000
+        while not self.__stop.wait(interval):
+            # Во время смены области интереса камера закрыта намеренно
+            if not self.__reconfigure_lock.acquire(blocking=False):
+                continue
+            try:
+                if self.__connection_lost():
+                    self.__recover()
+            except Exception as e:
+                logger.error(f"Ошибка при переподключении камеры {self.camera_id}: {e}")
+            finally:
+                self.__reconfigure_lock.release()
+
+    def __connection_lost(self):
+        """Камера сообщила об обрыве связи или подряд не получено Camera.Reconnect.FailedFrames кадров."""
+        if not self.camera.is_opened():
+            return True
+        failed_frames = self.config_get("Camera.Reconnect.FailedFrames", 5)
+        return bool(failed_frames) and self.pipeline.consecutive_failures >= failed_frames
+
+    def __recover(self):
+        """
+        Переподключение после обрыва связи. Конвейер останавливается: его кадры ссылаются
+        на буферы прежнего подключения. Шина кадров, регистратор и HTTP API продолжают работать.
+        """
+        started = time.perf_counter()
+        self.disconnected_since = time.time()
+        self.state = CAMERA_STATE_RECONNECTING
+        self.metrics.count("disconnects")
+        logger.warning(f"Потеряна связь с камерой {self.camera_id}, переподключение")
+        self.pipeline.stop()
+        if not self.__connect(reconnect=True):
+            return
+        # После повторного поиска камера - новый объект
+        self.pipeline.set_camera(self.camera)
+        self.pipeline.start()
+        elapsed = time.perf_counter() - started
+        self.metrics.observe("reconnect", elapsed)
+        self.reconnects += 1
+        self.last_reconnect_ms = round(elapsed * 1000, 1)
+        self.disconnected_since = None
+        self.state = CAMERA_STATE_STREAMING
+        logger.info(f"Камера {self.camera_id} переподключена за {self.last_reconnect_ms} мс")
+        try:
+            # Переоткрытая камера снимает с частотой из конфигурации
+            self.refresh_leases(force=True)
+        except Exception as e:
+            logger.error(f"Ошибка при чтении заявок на кадры камеры {self.camera_id}: {e}")
+
+    def __start_publishing(self):
+        """Шина кадров, регистратор, триггер и конвейер захвата подключённой камеры."""
+        if not self.config_get("Preview.Enabled", True):
+            self.clear_preview()
+        if self.config_get("FrameBus.Enabled", True):
+            self.frame_bus = FrameBusWriter(
+                name=self.frame_bus_name, slots=self.config_get("FrameBus.Slots", 4),
+                redis_client=self.__redis_client, redis_key=self.frame_bus_key,
+            )
+        publishers = [self.publish_frame]
+        if self.config_get("Recorder.Enabled", True):
+            self.recorder = FrameRecorder(
+                max_frames=self.config_get("Recorder.BufferFrames", 50),
+                max_memory_mb=self.config_get("Recorder.MaxMemoryMB", 512),
+                writers=self.config_get("Recorder.Writers", 2),
+                image_format=self.config_get("Recorder.Format", "png"),
+                png_compression=self.config_get("Recorder.PngCompression", 1),
+                jpeg_quality=self.config_get("Recorder.JpegQuality", 95),
+                max_pending=self.config_get("Recorder.MaxPendingFrames", 200),
+            )
+            # Регистратор копирует кадр первым: ошибка публикации не должна терять кадр из истории
+            publishers.insert(0, self.__record)
+        if self.config_get("AutoExposure.Enabled", False):
+            self.auto_exposure = self.__create_auto_exposure()
+            publishers.append(self.auto_exposure.submit)
+        if self.acquisition_mode() == ACQUISITION_MODE_IO:
+            self.trigger = IOTrigger(
+                self.__redis_client,
+                variable=self.config_get("CaptureTrigger.Variable", "DI0"),
+                edge=self.config_get("CaptureTrigger.Edge", "Rising"),
+                burst_frames=self.config_get("CaptureTrigger.BurstFrames", 1),
+                burst_interval=self.config_get("CaptureTrigger.BurstInterval", 0.0),
+                max_event_age=self.config_get("CaptureTrigger.MaxEventAge", 0.5),
+                metrics=self.metrics,
+            )
+        # Запуск конвейера захвата после подключения камеры
+        self.pipeline = FramePipeline(
+            self.camera, publishers, workers=self.config_get("HikCamera.PublishWorkers", 2), trigger=self.trigger,
+            config_get=self.config_get,
+        )
+        if self.config_get("Leases.Enabled", True):
+            # Частота по заявкам выбирается до первого кадра, чтобы камера без потребителей не стартовала на полной скорости
+            try:
+                self.refresh_leases(force=True)
+            except Exception as e:
+                logger.error(f"Ошибка при чтении заявок на кадры камеры {self.camera_id}: {e}")
+            self.__lease_thread = threading.Thread(target=self.__lease_loop, daemon=True)
+            self.__lease_thread.start()
+        self.pipeline.start()
+        self.__roi_thread = threading.Thread(target=self.__roi_request_loop, daemon=True)
+        self.__roi_thread.start()
+
+    def __create_auto_exposure(self):
+        """Автоэкспозиция с параметрами раздела AutoExposure и областью замера Region или откалиброванной областью."""
+        pixel_format = self.config_get(
+            "Replay.PixelFormat" if self.backend == BACKEND_REPLAY else "HikCamera.PixelFormat", "Mono8"
+        )
+        bits = re.search(r"\d+", pixel_format)
+        auto_exposure = AutoExposure(
+            self.__set_auto_exposure,
+            exposure=self.config_get("HikCamera.ExposureValue", 50000),
+            bits=int(bits.group()) if bits else 8,
+            target=self.config_get("AutoExposure.TargetMean", 0.45),
+            tolerance=self.config_get("AutoExposure.Tolerance", 0.05),
+            damping=self.config_get("AutoExposure.Damping", 0.5),
+            max_step_ratio=self.config_get("AutoExposure.MaxStepRatio", 2.0),
+            min_exposure=self.config_get("AutoExposure.MinExposure", 50.0),
+            max_exposure=self.config_get("AutoExposure.MaxExposure", 200000.0),
+            max_clipped=self.config_get("AutoExposure.MaxClipped", 0.01),
+            step=self.config_get("AutoExposure.Subsample", 8),
+            interval=self.config_get("AutoExposure.Interval", 0.2),
+            settle_frames=self.config_get("AutoExposure.SettleFrames", 2),
+            metrics=self.metrics,
+        )
+        region = self.config_get("AutoExposure.Region")
+        if region is None:
+            try:
+                region = get_roi_request(self.__redis_client, self.roi_key)
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать откалиброванную область камеры {self.camera_id}: {e}")
+        auto_exposure.set_region(region)
+        return auto_exposure
+
+    def __set_auto_exposure(self, exposure):
+        """Экспозиция от автоэкспозиции: в конфигурацию не сохраняется, чтобы не писать файл на каждом шаге."""
+        if not self.is_connected():
+            raise RuntimeError(f"Камера {self.camera_id} не подключена")
+        self.camera.set_exposure(exposure)
+
+    def reconfigure(self, roi):
+        """
+        Смена области интереса: Width/Height/Binning меняются только при остановленном
+        захвате, поэтому конвейер останавливается, камера переоткрывается с новой областью.
+        """
+        with self.__reconfigure_lock:
+            if self.pipeline is None:
+                raise RuntimeError(f"Камера {self.camera_id} не подключена")
+            logger.info(f"Смена области интереса камеры {self.camera_id}: {roi}")
+            self.pipeline.stop()
+            try:
+                self.camera.close()
+                self.open_camera(roi)
+            except Exception as e:
+                # Камера переоткрывается с прежней областью, иначе переподключение повторяло бы неудачную
+                logger.error(f"Не удалось применить область интереса камеры {self.camera_id}: {e}")
+                self.__reopen_previous_roi()
+                raise
+            finally:
+                self.pipeline.start()
+            # Переоткрытая камера снимает с частотой из конфигурации
+            self.refresh_leases(force=True)
+            self.config_set("Camera.Roi", roi)
+            Config.save()
+            return self.camera.get_roi()
+
+    def __reopen_previous_roi(self):
+        """Открытие камеры с областью интереса из конфигурации после неудачной смены области."""
+        try:
+            self.camera.close()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии камеры {self.camera_id}: {e}")
+        try:
+            self.open_camera(self.config_get("Camera.Roi"))
+        except Exception as e:
+            logger.error(f"Не удалось переоткрыть камеру {self.camera_id} с прежней областью интереса: {e}")
+
+    def __roi_request_loop(self):
+        """Применение областей интереса, запрошенных cv-service после калибровки."""
+        notifier = FrameNotifier(self.__redis_client, self.roi_key)
+        last_seq = notifier.wait_for_frame(timeout=1)
+        while not self.__stop.is_set():
+            seq = notifier.wait_for_frame(last_seq, timeout=1)
+            if seq is None:
+                continue
+            last_seq = seq
+            try:
+                roi = get_roi_request(self.__redis_client, self.roi_key)
+            except Exception as e:
+                logger.error(f"Ошибка при чтении области интереса камеры {self.camera_id}: {e}")
+                continue
+            if self.auto_exposure is not None and self.config_get("AutoExposure.Region") is None:
+                # Экспозиция подбирается по откалиброванной области, даже если сенсор не обрезается
+                self.auto_exposure.set_region(roi)
+            if not self.config_get("Camera.AcceptRoiRequests", True):
+                logger.debug(f"Запрос области интереса камеры {self.camera_id} проигнорирован: приём запросов отключён")
+                continue
+            try:
+                self.reconfigure(roi)
+            except Exception as e:
+                logger.error(f"Ошибка при смене области интереса камеры {self.camera_id}: {e}")
+        notifier.close()
+
+    def refresh_leases(self, force=False):
+        """
+        Выбор частоты захвата и вариантов публикации по действующим заявкам потребителей.
+        Без заявок камера снимает с частотой Leases.IdleFPS и публикует все варианты,
+        чтобы новый потребитель сразу получил свежий кадр.
+        :param force: применить частоту захвата, даже если потребность не изменилась.
+        """
+        if not self.config_get("Leases.Enabled", True):
+            if force and self.pipeline is not None:
+                # Интервал читается конвейером из раздела камеры, ожидание пересчитывается сразу
+                self.pipeline.set_frame_interval(None)
+            return
+        with self.__lease_lock:
+            leases = get_active_leases(self.__redis_client, self.leases_key)
+            # Варианты, которые канал не публикует, заменяются полным кадром в Redis
+            substitutes = {}
+            if self.frame_bus is None:
+                substitutes[RENDITION_FRAME_BUS] = RENDITION_FRAME
+            if not self.config_get("Preview.Enabled", True):
+                substitutes[RENDITION_PREVIEW] = RENDITION_FRAME
+            demand = lease_demand(leases, substitutes)
+            if demand:
+                fps = max(demand.values()) if all(demand.values()) else 0.0
+            else:
+                fps = self.config_get("Leases.IdleFPS", 1.0)
+                demand = {rendition: 0.0 for rendition in RENDITIONS}
+            if demand != self.__demand:
+                consumers = [lease.consumer for lease in leases]
+                logger.info(
+                    f"Заявки на кадры камеры {self.camera_id}: {consumers or 'нет'}, "
+                    f"варианты: {demand}, частота захвата: {fps or 'максимальная'}"
+                )
+            self.leases = leases
+            self.__demand = demand
+            self.__apply_acquisition_fps(fps, force)
+
+    def __apply_acquisition_fps(self, fps, force=False):
+        """Частота захвата по заявкам, не выше настроенной; в режимах IO и Hardware частоту задаёт датчик."""
+        camera = self.camera
+        if self.pipeline is None or not self.is_connected() or self.trigger is not None:
+            return
+        if camera.acquisition_mode == ACQUISITION_MODE_TRIGGER:
+            interval = self.config_get("HikCamera.FrameInterval", 0.1)
+            target = (ACQUISITION_MODE_TRIGGER, max(interval, 1.0 / fps) if fps else interval)
+        elif camera.acquisition_mode == ACQUISITION_MODE_CONTINUOUS:
+            configured = self.config_get(self.frame_rate_key(), 0)
+            target = (ACQUISITION_MODE_CONTINUOUS, fps if fps and (not configured or fps < configured) else configured)
+        else:
+            return
+        if target == self.__acquisition_target and not force:
+            return
+        self.__acquisition_target = target
+        if target[0] == ACQUISITION_MODE_TRIGGER:
+            self.pipeline.set_frame_interval(target[1])
+        else:
+            camera.set_frame_rate(target[1])
+
+    def __lease_loop(self):
+        """Пересчёт потребности при изменении заявок и периодически - для снятия истёкших заявок."""
+        notifier = FrameNotifier(self.__redis_client, self.leases_key)
+        last_seq = None
+        while not self.__stop.is_set():
+            try:
+                self.refresh_leases()
+            except Exception as e:
+                logger.error(f"Ошибка при чтении заявок на кадры камеры {self.camera_id}: {e}")
+            seq = notifier.wait_for_frame(last_seq, timeout=self.config_get("Leases.RefreshInterval", 1.0))
+            if seq is not None:
+                last_seq = seq
+        notifier.close()
+
+    def stop(self):
+        """Остановка захвата, закрытие камеры и шины кадров."""
+        self.__stop.set()
+        self.state = CAMERA_STATE_STOPPED
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        try:
+            if self.camera is not None and self.camera.is_opened():
+                self.camera.close()
+                logger.info(f"Камера {self.camera_id} закрыта при остановке сервиса")
+        except Exception as e:
+            logger.error(f"Ошибка при закрытии камеры {self.camera_id} при остановке: {e}")
+        if self.trigger is not None:
+            self.trigger.close()
+        if self.auto_exposure is not None:
+            self.auto_exposure.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.frame_bus is not None:
+            self.frame_bus.close()
+
+    def status(self):
+        """Состояние камеры и имена её каналов публикации."""
+        return {
+            "CameraId": self.camera_id,
+            "Primary": self.primary,
+            "Backend": self.backend,
+            "Connected": self.is_connected(),
+            "State": self.state,
+            "DisconnectedSince": self.disconnected_since,
+            "Reconnects": self.reconnects,
+            "LastReconnectMs": self.last_reconnect_ms,
+            "AcquisitionMode": self.acquisition_mode(),
+            "TriggerVariable": self.trigger.variable if self.trigger is not None else None,
+            "SerialNumber": self.serial or self.config_get("HikCamera.SerialNumber"),
+            "DeviceName": self.camera.get_device_name() if self.camera is not None else None,
+            "FrameKey": self.frame_key,
+            "PreviewKey": self.preview_key if self.config_get("Preview.Enabled", True) else None,
+            "FrameBusName": self.frame_bus_name if self.frame_bus is not None else None,
+            "FrameBusKey": self.frame_bus_key if self.frame_bus is not None else None,
+            "RoiKey": self.roi_key,
+            "Roi": self.camera.get_roi() if self.is_connected() else None,
+            "Recorder": self.recorder.status() if self.recorder is not None else None,
+            "AutoExposure": self.auto_exposure.status() if self.auto_exposure is not None else None,
+            "Leases": [lease.to_dict() for lease in self.leases],
+            "Demand": self.__demand,
+        }
+
+
+class CameraManager:
+    """
+    Набор камер сервиса. По умолчанию обслуживается одна камера, как раньше;
+    с Camera.MultiCamera камеры Hikvision находятся автоматически (GigE и USB),
+    а камеры воспроизведения перечисляются в разделе Cameras.
+    """
+
+    def __init__(self, redis_client=None):
+        self.__redis_client = redis_client
+        self.channels = {}
+        self.__stop = threading.Event()
+
+    def __discover(self, primary):
+        """Создание каналов для всех камер конфигурации или найденных устройств."""
+        channels = [primary]
+        if primary.backend == BACKEND_HIK:
+            from HikCamera.HikCamera import enumerate_devices
+            delay_ms = Config.get("Camera.Reconnect.InitialDelayMs", 50)
+            while True:
+                try:
+                    devices = enumerate_devices()
+                except Exception as e:
+                    logger.error(f"Ошибка поиска камер: {e}")
+                    devices = []
+                if devices:
+                    break
+                logger.error(f"Камеры Hikvision не найдены! Повтор поиска через {delay_ms} мс.")
+                if self.__stop.wait(delay_ms / 1000):
+                    return []
+                delay_ms = min(delay_ms * 2, Config.get("Camera.Reconnect.MaxDelayMs", 2000))
+            serials = [device["SerialNumber"] for device in devices]
+            logger.info(f"Найдено камер Hikvision: {len(devices)}, серийные номера: {serials}")
+            # Основной остаётся камера, выбранная ранее, чтобы ключи cv-service не переключались между камерами
+            primary_serial = Config.get("Camera.PrimarySerial")
+            if primary_serial not in serials:
+                primary_serial = serials[0]
+                Config.set("Camera.PrimarySerial", primary_serial)
+                Config.save()
+            primary.serial = primary_serial
+            for serial in serials:
+                if serial != primary_serial:
+                    channels.append(CameraChannel(camera_id_from_serial(serial), self.__redis_client, serial=serial))
+        else:
+            for camera_id in Config.get("Cameras", {}) or {}:
+                if camera_id != PRIMARY_CAMERA_ID:
+                    channels.append(CameraChannel(camera_id, self.__redis_client))
+        return channels
+
+    def start(self):
+        """
+        Поиск камер и запуск захвата на каждой. Поиск нескольких камер выполняется в фоновом потоке,
+        чтобы HTTP API отвечал, пока камеры не найдены; основная камера доступна сразу.
+        """
+        primary = CameraChannel(PRIMARY_CAMERA_ID, self.__redis_client)
+        self.channels[PRIMARY_CAMERA_ID] = primary
+        if not Config.get("Camera.MultiCamera", False):
+            primary.start()
+            logger.info(f"Запущено камер: 1: {list(self.channels)}")
+            return
+        primary.state = CAMERA_STATE_CONNECTING
+        threading.Thread(target=self.__start_channels, args=(primary,), daemon=True).start()
+
+    def __start_channels(self, primary):
+        for channel in self.__discover(primary):
+            self.channels[channel.camera_id] = channel
+            channel.start()
+        logger.info(f"Запущено камер: {len(self.channels)}: {list(self.channels)}")
+
+    def stop(self):
+        self.__stop.set()
+        for channel in list(self.channels.values()):
+            channel.stop()
+
+    def get(self, camera_id=PRIMARY_CAMERA_ID):
+        """Канал камеры или None, если камеры с таким идентификатором нет."""
+        return self.channels.get(camera_id)
+
+    def status(self):
+        return [channel.status() for channel in list(self.channels.values())]
+
+    def get_metrics(self):
+        return [channel.get_metrics() for channel in list(self.channels.values())]
@@ -0,0 +1,81 @@
+# Системные импорты
+import os, sys, time
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Внутренние модули
+from common.Logger import config_logger
+from common.FrameMeta import get_frame_seq
+from common.FrameNotifier import FrameNotifier
+from common.IOEvents import IO_EDGES, EDGE_RISING, io_event_key, get_io_event
+
+logger = config_logger("camera-service/CaptureTrigger.py")
+
+# Режим канала камеры: программный триггер серии кадров по фронту переменной io-service
+ACQUISITION_MODE_IO = "IO"
+
+
+class CaptureTriggerException(Exception):
+    """Исключение для ошибок настройки триггера захвата."""
+    pass
+
+
+class IOTrigger:
+    """
+    Триггер захвата по датчику, подключённому к модулю ввода-вывода.
+    io-service публикует фронты переменной IO.Variables в Redis, триггер ждёт их
+    через FrameNotifier и отдаёт конвейеру захвата событие с меткой времени фронта.
+    Фронты, пришедшие во время серии кадров, и устаревшие события пропускаются.
+    """
+
+    def __init__(self, redis_client, variable, edge=EDGE_RISING, burst_frames=1, burst_interval=0.0,
+                 max_event_age=0.5, metrics=None):
+        """
+        :param variable: имя переменной-входа io-service (IO.Variables), например DI0.
+        :param edge: фронт: Rising, Falling или Both.
+        :param burst_frames: количество кадров на один фронт.
+        :param burst_interval: интервал между кадрами серии, сек.
+        :param max_event_age: события старше этого значения не запускают захват, сек; 0 - без ограничения.
+        :param metrics: счётчики канала (common.Metrics) для io_triggers, missed_triggers и stale_triggers.
+        """
+        if edge not in IO_EDGES:
+            raise CaptureTriggerException(f"Неизвестный фронт {edge}, доступны: {IO_EDGES}")
+        self.variable = variable
+        self.edge = edge
+        self.burst_frames = max(1, int(burst_frames))
+        self.burst_interval = max(0.0, float(burst_interval))
+        self.__max_event_age = float(max_event_age or 0)
+        self.__metrics = metrics
+        self.__redis_client = redis_client
+        key = io_event_key(variable, edge)
+        # Событие, опубликованное до запуска камеры, захват не запускает
+        self.__last_seq = get_frame_seq(redis_client, key) or 0
+        self.__notifier = FrameNotifier(redis_client, key)
+        logger.info(f"Захват по фронту {edge} переменной {variable}, кадров на фронт: {self.burst_frames}")
+
+    def __count(self, name, value=1):
+        if self.__metrics is not None:
+            self.__metrics.count(name, value)
+
+    def wait(self, timeout=None):
+        """Ждёт фронт переменной; возвращает IOEvent или None, если за timeout секунд фронта не было."""
+        seq = self.__notifier.wait_for_frame(self.__last_seq, timeout)
+        if seq is None:
+            return None
+        if seq > self.__last_seq + 1:
+            # Датчик сработал, пока снималась предыдущая серия
+            self.__count("missed_triggers", seq - self.__last_seq - 1)
+        self.__last_seq = seq
+        event = get_io_event(self.__redis_client, self.variable, self.edge)
+        if event is None:
+            return None
+        age = time.time() - event.timestamp
+        if self.__max_event_age and age > self.__max_event_age:
+            self.__count("stale_triggers")
+            logger.warning(f"Событие {event} устарело на {age:.3f} с, захват не запущен")
+            return None
+        self.__count("io_triggers")
+        return event
+
+    def close(self):
+        self.__notifier.close()
@@ -0,0 +1,222 @@
+# Системные импорты
+import os, sys, time, queue, threading
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Внутренние модули
+from common.Config import Config
+from common.Logger import config_logger
+from CameraBackend import ACQUISITION_MODE_TRIGGER
+
+logger = config_logger("camera-service/FramePipeline.py")
+
+
+class FramePipeline:
+    """
+    Конвейер захвата кадров.
+    Поток захвата получает кадр k+1 в свободный буфер, пока рабочие потоки
+    кодируют и публикуют кадр k. Пропускная способность ограничена самой
+    медленной стадией, а не суммой всех стадий.
+    """
+
+    def __init__(self, camera, publishers=None, workers=2, trigger=None, config_get=None):
+        """
+        :param camera: камера с методами borrow_frame(timeout) и is_opened().
+        :param publishers: функции publisher(frame), вызываемые для каждого кадра в рабочем потоке.
+        :param workers: количество рабочих потоков публикации.
+        :param trigger: триггер захвата с методом wait(timeout) (например, CaptureTrigger.IOTrigger);
+            в режиме программного триггера серия кадров снимается по его событиям, а не по таймеру.
+        :param config_get: чтение конфигурации камеры (CameraChannel.config_get); None - Config.get.
+        """
+        self.__camera = camera
+        self.__trigger = trigger
+        self.__config_get = config_get or Config.get
+        self.__publishers = list(publishers or [])
+        self.__workers = max(1, int(workers))
+        # Очередь не длиннее числа рабочих: остальные буферы остаются свободными для захвата
+        self.__queue = queue.Queue(maxsize=self.__workers)
+        self.__stop = threading.Event()
+        # Интервал программного триггера, заданный по заявкам потребителей; None - HikCamera.FrameInterval
+        self.__frame_interval = None
+        self.__wake = threading.Event()
+        self.__threads = []
+        self.__seq = 0
+        self.__last_frame = None
+        self.__last_lock = threading.Lock()
+        self.dropped_frames = 0
+        # Ошибки захвата подряд: по ним канал камеры обнаруживает обрыв связи
+        self.consecutive_failures = 0
+
+    def set_camera(self, camera):
+        """Замена камеры остановленного конвейера (после повторного поиска устройства)."""
+        self.__camera = camera
+
+    def set_frame_interval(self, interval):
+        """
+        Интервал программного триггера, сек; None - из конфигурации.
+        Прерывает текущее ожидание, чтобы камера сразу ускорилась при появлении потребителя.
+        """
+        self.__frame_interval = interval
+        self.__wake.set()
+
+    def get_frame_interval(self):
+        if self.__frame_interval is not None:
+            return self.__frame_interval
+        return self.__config_get("HikCamera.FrameInterval", 0.1)
+
+    def add_publisher(self, publisher):
+        """Добавляет функцию публикации кадров."""
+        self.__publishers.append(publisher)
+
+    def start(self):
+        """Запуск потока захвата и рабочих потоков."""
+        logger.info(f"Запуск конвейера захвата кадров, рабочих потоков: {self.__workers}")
+        self.__stop.clear()
+        self.consecutive_failures = 0
+        self.__threads = [threading.Thread(target=self.__capture_loop, daemon=True)]
+        for _ in range(self.__workers):
+            self.__threads.append(threading.Thread(target=self.__worker_loop, daemon=True))
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self):
+        """Остановка конвейера и возврат всех удерживаемых буферов."""
+        logger.info("Остановка конвейера захвата кадров")
+        self.__stop.set()
+        self.__wake.set()
+        for thread in self.__threads:
+            thread.join(timeout=5)
+        self.__threads = []
+        while True:
+            try:
+                self.__queue.get_nowait().release()
+            except queue.Empty:
+                break
+        with self.__last_lock:
+            if self.__last_frame is not None:
+                self.__last_frame.release()
+                self.__last_frame = None
+
+    def __capture_loop(self):
+        """Цикл захвата: только получение кадров, без кодирования и публикации."""
+        last_capture = 0
+        waiting = False
+        while not self.__stop.is_set():
+            if not self.__camera.is_opened():
+                # Переподключением занимается канал камеры, конвейер только ждёт его
+                if not waiting:
+                    logger.warning("Камера не подключена, ожидание переподключения")
+                    waiting = True
+                self.__stop.wait(0.05)
+                continue
+            waiting = False
+
+            if self.__trigger is not None and self.__camera.acquisition_mode == ACQUISITION_MODE_TRIGGER:
+                # Кадры снимаются только по событию датчика
+                event = self.__trigger.wait(timeout=1)
+                if event is not None:
+                    self.__capture_burst(event)
+                continue
+
+            if self.__camera.acquisition_mode == ACQUISITION_MODE_TRIGGER:
+                # Интервал отсчитывается от предыдущего триггера, а не от конца публикации
+                delay = last_capture + self.get_frame_interval() - time.time()
+                if delay > 0:
+                    if self.__wake.wait(delay):
+                        # Интервал изменился: ожидание пересчитывается от того же триггера
+                        self.__wake.clear()
+                        continue
+                last_capture = time.time()
+
+            try:
+                frame = self.__camera.borrow_frame(timeout=2)
+            except Exception as e:
+                self.consecutive_failures += 1
+                logger.error(f"Ошибка при получении кадра: {e}")
+                time.sleep(self.get_frame_interval())
+                continue
+            if frame is None:
+                continue
+            self.consecutive_failures = 0
+
+            self.__seq += 1
+            frame.seq = self.__seq
+            self.__put(frame)
+
+    def __capture_burst(self, event):
+        """Серия кадров по событию триггера; кадры несут метку времени фронта."""
+        for index in range(self.__trigger.burst_frames):
+            if self.__stop.is_set():
+                return
+            if index and self.__trigger.burst_interval:
+                time.sleep(self.__trigger.burst_interval)
+            try:
+                frame = self.__camera.borrow_frame(timeout=2)
+            except Exception as e:
+                self.consecutive_failures += 1
+                logger.error(f"Ошибка при получении кадра серии {event}: {e}")
+                return
+            if frame is None:
+                continue
+            self.consecutive_failures = 0
+            frame.trigger_timestamp = event.timestamp
+            self.__seq += 1
+            frame.seq = self.__seq
+            self.__put_wait(frame)
+
+    def __put_wait(self, frame):
+        """Передаёт кадр серии рабочим потокам без отбрасывания: кадры по датчику не теряются."""
+        while not self.__stop.is_set():
+            try:
+                self.__queue.put(frame, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        frame.release()
+
+    def __put(self, frame):
+        """Передаёт кадр рабочим потокам; при переполнении отбрасывает самый старый кадр."""
+        while True:
+            try:
+                self.__queue.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self.__queue.get_nowait().release()
+                    self.dropped_frames += 1
+                    logger.debug("Публикация не успевает за захватом, старый кадр отброшен")
+                except queue.Empty:
+                    pass
+
+    def __worker_loop(self):
+        """Цикл рабочего потока: публикация кадров и возврат буферов."""
+        while not self.__stop.is_set():
+            try:
+                # Короткое ожидание: остановка конвейера при переподключении камеры не ждёт рабочие потоки
+                frame = self.__queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                for publisher in self.__publishers:
+                    publisher(frame)
+                self.__set_last_frame(frame)
+            except Exception as e:
+                logger.error(f"Ошибка при публикации кадра: {e}")
+            finally:
+                frame.release()
+
+    def __set_last_frame(self, frame):
+        """Удерживает последний опубликованный кадр, чтобы его буфер не перезаписался."""
+        with self.__last_lock:
+            if self.__last_frame is not None and self.__last_frame.seq > frame.seq:
+                return
+            previous, self.__last_frame = self.__last_frame, frame.retain()
+        if previous is not None:
+            previous.release()
+
+    def get_last_frame(self):
+        """Возвращает копию последнего опубликованного кадра или None."""
+        with self.__last_lock:
+            if self.__last_frame is None:
+                return None
+            return self.__last_frame.image.copy()
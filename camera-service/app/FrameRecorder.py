@@ -0,0 +1,202 @@
+# Системные импорты
+import os, sys, threading
+from concurrent.futures import ThreadPoolExecutor
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Внешние модули
+import numpy as np
+import cv2
+
+# Внутренние модули
+from common.Logger import config_logger
+
+logger = config_logger("camera-service/FrameRecorder.py")
+
+# Поддерживаемые форматы файлов
+RECORDER_FORMATS = ("png", "jpg", "tiff", "bmp")
+
+
+class FrameRecorderException(Exception):
+    """Исключение для ошибок записи кадров."""
+    pass
+
+
+class RecordedFrame:
+    """Копия кадра в кольцевом буфере регистратора."""
+
+    def __init__(self, image):
+        self.image = image
+        self.seq = None
+        self.host_timestamp = 0.0
+        self.device_timestamp = 0
+        # Кадр передан на запись: следующая запись в этот слот выделит новый массив
+        self.lent = False
+
+
+class FrameRecorder:
+    """
+    Регистратор кадров: хранит последние кадры в ограниченном кольцевом буфере
+    в памяти и записывает их на диск в пуле потоков, не задерживая захват.
+    Сохраняемые кадры не копируются повторно: слот отдаётся писателю,
+    а новый кадр в этом слоте получает новый массив.
+    """
+
+    def __init__(self, max_frames=50, max_memory_mb=512, writers=2, image_format="png",
+                 png_compression=1, jpeg_quality=95, max_pending=200):
+        """
+        :param max_frames: максимальное количество кадров в кольцевом буфере.
+        :param max_memory_mb: ограничение памяти буфера, МБ; количество кадров уменьшается для больших кадров.
+        :param writers: количество потоков записи.
+        :param image_format: формат файлов: png, jpg, tiff или bmp.
+        :param png_compression: уровень сжатия PNG 0-9 (1 - быстрое сжатие без потерь).
+        :param jpeg_quality: качество JPEG 0-100.
+        :param max_pending: максимальное количество кадров в очереди записи.
+        """
+        if image_format not in RECORDER_FORMATS:
+            raise FrameRecorderException(f"Неподдерживаемый формат записи: {image_format}, доступны: {RECORDER_FORMATS}")
+        self.__max_frames = max(1, int(max_frames))
+        self.__max_memory = int(max_memory_mb * 1024 * 1024)
+        self.__format = image_format
+        self.__png_compression = int(png_compression)
+        self.__jpeg_quality = int(jpeg_quality)
+        self.__max_pending = int(max_pending)
+
+        self.__lock = threading.Lock()
+        self.__ring = []
+        self.__capacity = None
+        self.__frame_bytes = None
+        self.__index = 0
+        self.__latest = None
+        self.__pending = 0
+        self.__pending_lock = threading.Lock()
+        self.__executor = ThreadPoolExecutor(max_workers=max(1, int(writers)), thread_name_prefix="FrameRecorder")
+        self.saved_frames = 0
+        self.failed_frames = 0
+
+    def __allocate(self, image):
+        """
+        Размер кольца определяется по размеру кадра с учётом ограничения памяти и пересчитывается
+        при его смене (область интереса, формат пикселей): кадры прежнего размера отбрасываются.
+        """
+        capacity = min(self.__max_frames, max(1, self.__max_memory // max(1, image.nbytes)))
+        logger.info(f"Кольцевой буфер регистратора: {capacity} кадров по {image.nbytes} байт")
+        self.__capacity = capacity
+        self.__frame_bytes = image.nbytes
+        self.__ring = [None] * capacity
+        self.__index = 0
+        self.__latest = None
+
+    def record(self, frame):
+        """Копирует кадр (CameraFrame) в кольцевой буфер; вызывается рабочими потоками конвейера."""
+        image = frame.image
+        with self.__lock:
+            if image.nbytes != self.__frame_bytes:
+                self.__allocate(image)
+            entry = self.__ring[self.__index]
+            if entry is None or entry.lent or entry.image.shape != image.shape or entry.image.dtype != image.dtype:
+                entry = RecordedFrame(np.empty_like(image))
+                self.__ring[self.__index] = entry
+            np.copyto(entry.image, image)
+            entry.seq = frame.seq
+            entry.host_timestamp = frame.host_timestamp
+            entry.device_timestamp = frame.device_timestamp
+            self.__index = (self.__index + 1) % self.__capacity
+            if self.__latest is None or self.__latest.seq is None or (frame.seq or 0) >= self.__latest.seq:
+                self.__latest = entry
+
+    def __take(self, entries):
+        """Передаёт кадры писателям без копирования."""
+        for entry in entries:
+            entry.lent = True
+        return entries
+
+    def latest(self):
+        """Последний записанный кадр или None."""
+        with self.__lock:
+            return self.__take([self.__latest])[0] if self.__latest is not None else None
+
+    def frames_since(self, seconds):
+        """Кадры за последние seconds секунд в порядке номеров."""
+        with self.__lock:
+            # Отданные писателям кадры не перезаписываются, поэтому их можно отдать повторно
+            entries = [entry for entry in self.__ring if entry is not None]
+            if not entries:
+                return []
+            newest = max(entry.host_timestamp for entry in entries)
+            entries = [entry for entry in entries if entry.host_timestamp >= newest - seconds]
+            entries.sort(key=lambda entry: entry.seq or 0)
+            return self.__take(entries)
+
+    def __params(self):
+        if self.__format == "png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.__png_compression]
+        if self.__format == "jpg":
+            return [cv2.IMWRITE_JPEG_QUALITY, self.__jpeg_quality]
+        return []
+
+    def __write(self, entry, path):
+        """Запись кадра в потоке пула."""
+        try:
+            if not cv2.imwrite(path, entry.image, self.__params()):
+                raise FrameRecorderException(f"OpenCV не записал файл {path}")
+            saved = True
+            logger.debug(f"Кадр {entry.seq} сохранён: {path}")
+        except Exception as e:
+            saved = False
+            logger.error(f"Ошибка при сохранении кадра {entry.seq} в {path}: {e}")
+        with self.__pending_lock:
+            self.__pending -= 1
+            if saved:
+                self.saved_frames += 1
+            else:
+                self.failed_frames += 1
+
+    def save(self, entries, directory, name_template="frame_{seq}"):
+        """
+        Ставит кадры в очередь записи и сразу возвращает пути файлов.
+        :param name_template: имя файла без расширения, поля {seq} и {index}.
+        """
+        with self.__pending_lock:
+            if self.__pending + len(entries) > self.__max_pending:
+                raise FrameRecorderException(
+                    f"Очередь записи переполнена: {self.__pending} кадров ожидают записи"
+                )
+            self.__pending += len(entries)
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for index, entry in enumerate(entries):
+            path = os.path.join(directory, f"{name_template.format(seq=entry.seq, index=index)}.{self.__format}")
+            self.__executor.submit(self.__write, entry, path)
+            paths.append(path)
+        return paths
+
+    def save_latest(self, directory, name="frame"):
+        """Сохранение последнего кадра; возвращает путь файла или None, если кадров ещё нет."""
+        entry = self.latest()
+        if entry is None:
+            return None
+        return self.save([entry], directory, name)[0]
+
+    def dump(self, seconds, directory):
+        """Сохранение кадров за последние seconds секунд в каталог; возвращает пути файлов."""
+        entries = self.frames_since(seconds)
+        if not entries:
+            return []
+        logger.info(f"Сохранение {len(entries)} кадров за последние {seconds} с в {directory}")
+        return self.save(entries, directory, "frame_{index:04d}_{seq}")
+
+    def status(self):
+        with self.__lock:
+            stored = sum(1 for entry in self.__ring if entry is not None)
+        return {
+            "Capacity": self.__capacity,
+            "StoredFrames": stored,
+            "PendingFrames": self.__pending,
+            "SavedFrames": self.saved_frames,
+            "FailedFrames": self.failed_frames,
+        }
+
+    def close(self):
+        """Дожидается записи поставленных в очередь кадров."""
+        self.__executor.shutdown(wait=True)
@@ -1,13 +1,12 @@
 # Системные импорты
-import os, sys, time, socket, ctypes, platform
+import os, sys, time, socket, ctypes, platform, queue, csv
 from ctypes import byref, POINTER, cast, sizeof, memset
-from threading import Lock
+from threading import Lock, Thread, Event
 
 # Добавляем директорию проекта в sys.path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 # Внешние модули
-import pandas as pd
 import numpy as np
 
 # Внутренние модули
@@ -39,129 +38,254 @@ logger.debug(f"Используемый путь к библиотеке Hikvisi
 sys.path.append(os.path.join(os.path.dirname(__file__), hikpath))
 import MvCameraControl_class as MvCameraControl
 
+from HikCamera import PixelUnpack
+from CameraBackend import (
+    CameraBackend, CameraFrame, ACQUISITION_MODE_TRIGGER, ACQUISITION_MODE_CONTINUOUS, ACQUISITION_MODE_HARDWARE,
+)
+from common.CameraRoi import align_roi
+from common.Metrics import Metrics
+
 _lock_name_to_lock = {}
+_lock_name_lock = Lock()
+
+# Транспортные уровни, на которых выполняется поиск устройств
+_TLAYER_TYPES = (
+    MvCameraControl.MV_GIGE_DEVICE
+    | MvCameraControl.MV_USB_DEVICE
+    | MvCameraControl.MV_GENTL_CAMERALINK_DEVICE
+    | MvCameraControl.MV_GENTL_CXP_DEVICE
+    | MvCameraControl.MV_GENTL_XOF_DEVICE
+    | MvCameraControl.MV_VIR_GIGE_DEVICE
+)
 
 class HikCameraException(Exception):
     """Исключение для ошибок работы с камерой Hikvision."""
     pass
 
 
-class HikCamera(MvCameraControl.MvCamera):
-    """Класс для работы с камерами Hikvision через SDK MvCameraControl_class."""
+# Прежнее имя CameraFrame, оставлено для совместимости
+HikFrame = CameraFrame
+
+# Обратный вызов исключений SDK: void cb(unsigned int nMsgType, void* pUser)
+_EXCEPTION_CALLBACK = (ctypes.WINFUNCTYPE if platform.system() == "Windows" else ctypes.CFUNCTYPE)(
+    None, ctypes.c_uint, ctypes.c_void_p
+)
+
+# Фронт аппаратного триггера -> значение узла TriggerActivation
+_TRIGGER_ACTIVATIONS = {
+    "Rising": "RisingEdge",
+    "Falling": "FallingEdge",
+}
+
+
+def _int2ip(i):
+    """Преобразование целого числа в IP-адрес."""
+    return f"{(i & 0xff000000) >> 24}.{(i & 0x00ff0000) >> 16}.{(i & 0x0000ff00) >> 8}.{i & 0x000000ff}"
+
+
+def _c_string(array):
+    """Строка из массива байт SDK, завершённого нулём."""
+    return bytes(array).split(b"\0", 1)[0].decode("ascii", errors="ignore")
 
-    def __get_setting_df():
-        """Получение DataFrame с настройками камеры Hikvision из CSV-файла."""
 
-        data = pd.read_csv(
-            os.path.join(os.path.dirname(__file__), hikpath + "/MvCameraNode-CH.csv")
+def _enum_device_infos():
+    """Копии структур MV_CC_DEVICE_INFO всех найденных устройств."""
+    device_list = MvCameraControl.MV_CC_DEVICE_INFO_LIST()
+    ret = MvCameraControl.MvCamera.MV_CC_EnumDevices(_TLAYER_TYPES, device_list)
+    if ret != 0:
+        raise HikCameraException(f"Поиск устройств Hikvision не удался! ret[0x{ret:x}]")
+    # Структуры копируются: память списка принадлежит SDK и переиспользуется при следующем поиске
+    return [
+        MvCameraControl.MV_CC_DEVICE_INFO.from_buffer_copy(
+            cast(device_list.pDeviceInfo[i], POINTER(MvCameraControl.MV_CC_DEVICE_INFO)).contents
         )
-        setting_df = pd.DataFrame()
+        for i in range(device_list.nDeviceNum)
+    ]
 
-        def to_key(key):
-            if "[" in key:
-                key = key[: key.index("[")]
-            return key.strip()
 
-        def get_depend(key):
-            key = key.strip()
-            if "[" in key:
-                return key[key.index("[") + 1 : -1]
-            return ""
+def _describe_device(dev_info):
+    """Серийный номер, модель, IP-адрес и транспортный уровень устройства."""
+    if dev_info.nTLayerType == MvCameraControl.MV_USB_DEVICE:
+        info = dev_info.SpecialInfo.stUsb3VInfo
+        ip, layer = None, "USB"
+    else:
+        info = dev_info.SpecialInfo.stGigEInfo
+        ip, layer = _int2ip(info.nCurrentIp), "GigE"
+    return {
+        "SerialNumber": _c_string(info.chSerialNumber),
+        "DeviceName": _c_string(info.chModelName),
+        "IPAddress": ip,
+        "TransportLayer": layer,
+    }
+
+
+def enumerate_devices():
+    """Список подключённых камер Hikvision (GigE и USB): SerialNumber, DeviceName, IPAddress, TransportLayer."""
+    return [_describe_device(dev_info) for dev_info in _enum_device_infos()]
+
 
-        setting_df["key"] = data[list(data)[1]].map(to_key)
-        setting_df["depend"] = data[list(data)[1]].map(get_depend)
-        setting_df["dtype"] = data[list(data)[2]].map(lambda x: x.strip().lower())
-        return setting_df
+class HikCamera(MvCameraControl.MvCamera, CameraBackend):
+    """Класс для работы с камерами Hikvision через SDK MvCameraControl_class."""
+
+    def __load_nodes():
+        """
+        Разбор таблицы узлов камеры из CSV-файла SDK.
+        Возвращает словарь: имя узла -> (тип данных, узел-селектор).
+        """
+        nodes = {}
+        path = os.path.join(os.path.dirname(__file__), hikpath + "/MvCameraNode-CH.csv")
+        with open(path, encoding="utf-8", newline="") as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            for row in reader:
+                if len(row) < 3 or not row[1].strip() or not row[2].strip():
+                    continue
+                # Формат имени: "A[B]" - узел A зависит от селектора B
+                name = row[1].strip()
+                depend = ""
+                if "[" in name:
+                    name, depend = name[: name.index("[")].strip(), name[name.index("[") + 1 : -1]
+                nodes.setdefault(name, (row[2].strip().lower(), depend))
+        return nodes
 
     high_speed_lock = Lock()
-    setting_df = __get_setting_df()
+    nodes = __load_nodes()
+
+    # Установка значения: тип узла -> функция (камера, ключ, значение) -> код возврата SDK
+    _SETTERS = {
+        "iboolean": lambda cam, key, value: cam.MV_CC_SetBoolValue(key, bool(value)),
+        "icommand": lambda cam, key, value: cam.MV_CC_SetCommandValue(key),
+        "ienumeration": lambda cam, key, value: (
+            cam.MV_CC_SetEnumValueByString(key, value) if isinstance(value, str) else cam.MV_CC_SetEnumValue(key, value)
+        ),
+        "ifloat": lambda cam, key, value: cam.MV_CC_SetFloatValue(key, float(value)),
+        "iinteger": lambda cam, key, value: cam.MV_CC_SetIntValue(key, int(value)),
+        "istring": lambda cam, key, value: cam.MV_CC_SetStringValue(key, value),
+    }
+
+    # Чтение значения: тип узла -> (структура SDK, функция чтения, извлечение значения)
+    _GETTERS = {
+        "iboolean": (ctypes.c_bool, "MV_CC_GetBoolValue", lambda v: v.value),
+        "ienumeration": (MvCameraControl.MVCC_ENUMVALUE, "MV_CC_GetEnumValue", lambda v: v.nCurValue),
+        "ifloat": (MvCameraControl.MVCC_FLOATVALUE, "MV_CC_GetFloatValue", lambda v: v.fCurValue),
+        "iinteger": (MvCameraControl.MVCC_INTVALUE, "MV_CC_GetIntValue", lambda v: v.nCurValue),
+        "istring": (MvCameraControl.MVCC_STRINGVALUE, "MV_CC_GetStringValue", lambda v: v.chCurValue.decode("ascii", "ignore")),
+    }
+
+    @classmethod
+    def __get_dtype(cls, key, value=None):
+        """Тип узла по таблице; для узлов вне таблицы определяется по типу значения."""
+        node = cls.nodes.get(key)
+        if node is not None:
+            return node[0]
+        if isinstance(value, bool):
+            return "iboolean"
+        if isinstance(value, int):
+            return "iinteger"
+        if isinstance(value, float):
+            return "ifloat"
+        if isinstance(value, str):
+            return "ienumeration"
+        raise HikCameraException(f"Неизвестный параметр камеры '{key}'")
+
+    def __set_item_unlocked(self, key, value):
+        """Установка значения параметра камеры без захвата блокировки."""
+        setter = self._SETTERS.get(self.__get_dtype(key, value))
+        if setter is None:
+            raise HikCameraException(f"Параметр '{key}' не поддерживает установку значения")
+        ret = setter(self, key, value)
+        if ret != 0:
+            logger.error(
+                f"Установка параметра '{key}' со значением {value} не удалась! ret[0x{ret}]"
+            )
+            raise HikCameraException(
+                f"Установка параметра '{key}' со значением {value} не удалась! ret[0x{ret}]"
+            )
 
     def __set_item(self, key, value):
         """Установка значения параметра камеры по ключу."""
-
-        df = self.setting_df
-        dtype = df[df.key == key]["dtype"].iloc[0]
-        if dtype == "iboolean":
-            set_func = self.MV_CC_SetBoolValue
-        if dtype == "icommand":
-            set_func = self.MV_CC_SetCommandValue
-        if dtype == "ienumeration":
-            if isinstance(value, str):
-                set_func = self.MV_CC_SetEnumValueByString
-            else:
-                set_func = self.MV_CC_SetEnumValue
-        if dtype == "ifloat":
-            set_func = self.MV_CC_SetFloatValue
-        if dtype == "iinteger":
-            set_func = self.MV_CC_SetIntValue
-        if dtype == "istring":
-            set_func = self.MV_CC_SetStringValue
-        if dtype == "register":
-            set_func = self.MV_CC_RegisterEventCallBackEx
         with self.__lock:
-            ret = set_func(key, value)
-            if ret != 0:
-                logger.error(
-                    f"Установка параметра '{key}' со значением {value} не удалась! ret[0x{ret}]"
-                )
-                raise HikCameraException(
-                    f"Установка параметра '{key}' со значением {value} не удалась! ret[0x{ret}]"
-                )
+            self.__set_item_unlocked(key, value)
 
     def __get_item(self, key):
         """Получение значения параметра камеры по ключу."""
-
-        df = self.setting_df
-        dtype = df[df.key == key]["dtype"].iloc[0]
-        if dtype == "iboolean":
-            get_func = self.MV_CC_GetBoolValue
-            value = ctypes.c_bool()
-        if dtype == "icommand":
-            get_func = self.MV_CC_GetCommandValue
-        if dtype == "ienumeration":
-            get_func = self.MV_CC_GetEnumValue
-            value = ctypes.c_uint32()
-        if dtype == "ifloat":
-            get_func = self.MV_CC_GetFloatValue
-            value = ctypes.c_float()
-        if dtype == "iinteger":
-            get_func = self.MV_CC_GetIntValue
-            value = ctypes.c_int()
-        if dtype == "istring":
-            get_func = self.MV_CC_GetStringValue
-            value = (ctypes.c_char * 50)()
-        if dtype == "register":
-            get_func = self.MV_CC_RegisterEventCallBackEx
+        getter = self._GETTERS.get(self.__get_dtype(key))
+        if getter is None:
+            raise HikCameraException(f"Параметр '{key}' не поддерживает чтение значения")
+        struct, get_name, extract = getter
+        value = struct()
         with self.__lock:
-            ret = get_func(key, byref(value))
+            ret = getattr(self, get_name)(key, value)
             if ret != 0:
                 logger.error(f"Получение параметра '{key}' не удалось! ret[0x{ret}]")
                 raise HikCameraException(
                     f"Получение параметра '{key}' не удалось! ret[0x{ret}]"
                 )
 
-        return value.value
+        return extract(value)
+
+    def __apply(self, parameters, stop_on_error=False):
+        """Установка нескольких параметров камеры за один захват блокировки, возвращает словарь ошибок."""
+        items = parameters.items() if isinstance(parameters, dict) else parameters
+        errors = {}
+        with self.__lock:
+            for key, value in items:
+                try:
+                    self.__set_item_unlocked(key, value)
+                except HikCameraException as e:
+                    errors[key] = str(e)
+                    if stop_on_error:
+                        raise
+        return errors
+
+    def apply_parameters(self, parameters, stop_on_error=False):
+        """
+        Установка нескольких параметров камеры за один захват блокировки.
+        Установленные параметры запоминаются и восстанавливаются при следующем открытии.
+        :param parameters: словарь или список пар (ключ, значение), применяется по порядку.
+        :param stop_on_error: прервать установку на первой ошибке.
+        :return: словарь ошибок: ключ -> текст ошибки.
+        """
+        items = list(parameters.items() if isinstance(parameters, dict) else parameters)
+        errors = self.__apply(items, stop_on_error)
+        for key, value in items:
+            if key not in errors and self.__get_dtype(key, value) != "icommand":
+                # Порядок восстановления - порядок последней установки
+                self.__setting_items.pop(key, None)
+                self.__setting_items[key] = value
+        return errors
 
     __getitem__ = __get_item
     __setitem__ = __set_item
 
-    def __init__(self, ip=None, host_ip=None):
+    def __init__(self, ip=None, host_ip=None, serial=None, lock_name=None, heartbeat_timeout_ms=None,
+                 wait_for_device=True):
         """Инициализация камеры Hikvision.
         :param ip: IP-адрес камеры. Если не указан, будет найден автоматически.
         :param host_ip: IP-адрес хоста, на котором запущена камера. Если не указан, будет определен автоматически.
+        :param serial: серийный номер камеры при поиске; если не указан, используется первое найденное устройство.
+        :param lock_name: имя общей блокировки триггера; камеры с одним именем (например, на одном
+            сетевом канале) захватывают кадры по очереди, без имени камера захватывает независимо.
+        :param heartbeat_timeout_ms: тайм-аут контрольных сообщений GigE (GevHeartbeatTimeout), мс;
+            чем он меньше, тем быстрее SDK сообщает об обрыве связи. None - значение камеры.
+        :param wait_for_device: ждать появления устройства при поиске; False - исключение,
+            если устройство не найдено (повторы выполняет вызывающий код).
         """
         super().__init__()
-        logger.info("Инициализация камеры Hikvision")
+        logger.info(f"Инициализация камеры Hikvision{f' {serial}' if serial else ''}")
 
         self.mvcc_dev_info = None
         self.__lock = Lock()
         self.TIMEOUT_MS = 2000
         if ip is None:
             logger.debug("IP камеры не указан, будет найден автоматически")
-            ip = self.__find_ip()
+            ip = self.__find_ip(serial, wait_for_device)
         self.__ip = ip
 
-        if host_ip is None:
+        if ip is None:
+            # USB-камера: IP-адреса и сетевого интерфейса хоста нет
+            pass
+        elif host_ip is None:
             logger.debug("IP хоста не указан, будет определен автоматически")
             host_ip = self.__get_host_ip(ip)
             logger.debug(f"Определен IP хоста: {host_ip}")
@@ -170,11 +294,44 @@ class HikCamera(MvCameraControl.MvCamera):
         self.__host_ip = host_ip
 
         self.__last_time_get_frame = 0
-        self.__setting_items = None
-        self.__config = None
+        # Параметры, заданные через set_exposure/apply_parameters: применяются одним вызовом
+        # при каждом открытии, чтобы переподключённая камера снимала с прежними настройками
+        self.__setting_items = {}
+        self.__heartbeat_timeout_ms = heartbeat_timeout_ms
+        # Аргументы последнего open() для переподключения и признак обрыва связи из обратного вызова SDK
+        self.__open_args = None
+        self.__device_lost = False
+        self.__exception_callback = None
+        self.__config = {"lock_name": lock_name} if lock_name else None
+        if lock_name:
+            with _lock_name_lock:
+                self.__trigger_lock = _lock_name_to_lock.setdefault(lock_name, Lock())
+        else:
+            self.__trigger_lock = Lock()
         self.__create_camera_handle()
 
         self.__is_opened = False
+        self.acquisition_mode = ACQUISITION_MODE_TRIGGER
+        self.__frame_queue = None
+        self.__buffer_pool = None
+        self.__roi = None
+        # Текущая серия кадров аппаратного триггера: номер триггера, оставшиеся кадры и метка времени фронта
+        self.__burst_frames = 1
+        self.__burst_index = None
+        self.__burst_left = 0
+        self.__burst_timestamp = 0.0
+        self.__grab_thread = None
+        self.__grab_stop = Event()
+
+        # Предвыделенные выходные буферы распаковки: (h, w, dtype) -> свободные массивы
+        self.__output_pool = {}
+        self.__output_lock = Lock()
+        self.__tone_map = False
+        self.__tone_gamma = 1.0
+        self.__tone_precise = False
+        self.__tone_luts = {}
+        # Счётчики и задержки стадий захвата: trigger, transfer, trigger_to_frame, frame_wait, unpack
+        self.metrics = Metrics()
 
         # self.open()
 
@@ -182,62 +339,48 @@ class HikCamera(MvCameraControl.MvCamera):
         """Освобождение ресурсов при удалении объекта камеры Hikvision."""
         self.MV_CC_DestroyHandle()
 
-    def __find_ip(self):
-        """Поиск IP-адреса устройства."""
+    def __find_ip(self, serial=None, wait=True):
+        """
+        Поиск устройства (по серийному номеру, если задан) и его IP-адреса.
+        :param wait: повторять поиск, пока устройство не найдено; False - исключение после первой попытки.
+        """
 
         logger.debug("Поиск IP-адреса устройства Hikvision")
         while True:
-            self.deviceList = MvCameraControl.MV_CC_DEVICE_INFO_LIST()
-            tlayerType = (
-                MvCameraControl.MV_GIGE_DEVICE
-                | MvCameraControl.MV_USB_DEVICE
-                | MvCameraControl.MV_GENTL_CAMERALINK_DEVICE
-                | MvCameraControl.MV_GENTL_CXP_DEVICE
-                | MvCameraControl.MV_GENTL_XOF_DEVICE
-                | MvCameraControl.MV_VIR_GIGE_DEVICE
-            )
-            ret = MvCameraControl.MvCamera.MV_CC_EnumDevices(
-                tlayerType, self.deviceList
-            )
-            if ret != 0:
-                logger.error(
-                    f"Поиск устройств Hikvision не удалась! ret[0x{ret}]. Повтор через 10 секунд."
-                )
+            try:
+                devices = _enum_device_infos()
+            except HikCameraException as e:
+                if not wait:
+                    raise
+                logger.error(f"{e}. Повтор через 10 секунд.")
                 time.sleep(10)
                 continue
 
-            if self.deviceList.nDeviceNum > 0:
-                self.mvcc_dev_info = cast(
-                    self.deviceList.pDeviceInfo[0],
-                    POINTER(MvCameraControl.MV_CC_DEVICE_INFO),
-                ).contents
-                ip = self.__int2ip(self.mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp)
-                self.device_name = self.__get_device_name()
-                logger.info(
-                    f"Найдено устройство Hikvision: {self.device_name}, IP: {ip}"
-                )
-                return ip
+            for dev_info in devices:
+                description = _describe_device(dev_info)
+                if serial is None or description["SerialNumber"] == serial:
+                    self.mvcc_dev_info = dev_info
+                    self.device_name = description["DeviceName"]
+                    logger.info(
+                        f"Найдено устройство Hikvision: {self.device_name}, "
+                        f"серийный номер: {description['SerialNumber']}, IP: {description['IPAddress']}"
+                    )
+                    return description["IPAddress"]
+            if not wait:
+                raise HikCameraException(f"Устройство Hikvision {serial or ''} не найдено среди {len(devices)} устройств")
+            if devices:
+                logger.error(f"Устройство Hikvision {serial} не найдено среди {len(devices)} устройств! Повтор поиска через 10 секунд.")
             else:
                 logger.error(
                     "Устройство Hikvision не найдено! Повтор поиска через 10 секунд."
                 )
-                time.sleep(10)
-
-    def __int2ip(self, i):
-        """Преобразование целого числа в IP-адрес."""
-
-        return f"{(i & 0xff000000) >> 24}.{(i & 0x00ff0000) >> 16}.{(i & 0x0000ff00) >> 8}.{i & 0x000000ff}"
+            time.sleep(10)
 
     def __get_device_name(self):
         """Получение имени устройства Hikvision."""
 
         if self.mvcc_dev_info:
-            device_name = ""
-            for byte in self.mvcc_dev_info.SpecialInfo.stGigEInfo.chModelName:
-                if byte == 0:
-                    break
-                device_name += chr(byte)
-            return device_name
+            return _describe_device(self.mvcc_dev_info)["DeviceName"]
         return ""
 
     def __ip2int(self, ip):
@@ -279,30 +422,78 @@ class HikCamera(MvCameraControl.MvCamera):
         return ret
 
     def MV_CC_CreateHandle(self):
-        self.__ip = self.__int2ip(self.mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp)
+        self.__ip = _describe_device(self.mvcc_dev_info)["IPAddress"]
         return super().MV_CC_CreateHandle(self.mvcc_dev_info)
 
-    def open(self):
-        """Открытие камеры Hikvision и настройка параметров."""
+    def open(self, acquisition_mode=ACQUISITION_MODE_TRIGGER, frame_rate=None, buffer_count=4, pixel_format="Mono8",
+             roi=None, hardware_trigger=None):
+        """Открытие камеры Hikvision и настройка параметров.
+        :param acquisition_mode: режим захвата: Trigger (программный триггер), Continuous (непрерывный)
+            или Hardware (серия кадров по фронту на входе камеры).
+        :param frame_rate: частота кадров AcquisitionFrameRate для непрерывного режима, 0/None - максимальная.
+        :param buffer_count: количество буферов кадров: пул программного триггера
+            или очередь непрерывного режима.
+        :param pixel_format: формат пикселей камеры: Mono8, Mono10, Mono10Packed, Mono12, Mono12Packed, Mono16.
+        :param roi: область интереса: словарь Left, Top, Right, Bottom (пиксели сенсора) и Binning;
+            None - весь сенсор. Границы расширяются до шагов узлов OffsetX/OffsetY/Width/Height.
+        :param hardware_trigger: параметры режима Hardware: Line (вход Line0-Line3), Edge (Rising/Falling),
+            BurstFrames (кадров на фронт), DelayUs (задержка триггера, мкс).
+        """
 
-        logger.debug("Открытие камеры Hikvision")
+        logger.debug(f"Открытие камеры Hikvision, режим захвата: {acquisition_mode}")
+        if acquisition_mode not in (ACQUISITION_MODE_TRIGGER, ACQUISITION_MODE_CONTINUOUS, ACQUISITION_MODE_HARDWARE):
+            raise HikCameraException(f"Неизвестный режим захвата: {acquisition_mode}")
+        if acquisition_mode == ACQUISITION_MODE_HARDWARE:
+            hardware_trigger = hardware_trigger or {}
+            edge = hardware_trigger.get("Edge", "Rising")
+            if edge not in _TRIGGER_ACTIVATIONS:
+                raise HikCameraException(
+                    f"Фронт аппаратного триггера {edge} не поддерживается, доступны: {list(_TRIGGER_ACTIVATIONS)}"
+                )
 
+        self.__open_args = dict(
+            acquisition_mode=acquisition_mode, frame_rate=frame_rate, buffer_count=buffer_count,
+            pixel_format=pixel_format, roi=roi, hardware_trigger=hardware_trigger,
+        )
         ret = self.MV_CC_OpenDevice(MvCameraControl.MV_ACCESS_Exclusive, 0)
         if ret != 0:
             logger.error(f"Открытие камеры не удалось! ret[0x{ret}]")
             raise HikCameraException(f"Открытие камеры не удалось! ret[0x{ret}]")
-
-        if self.__setting_items is not None:
-            if isinstance(self.__setting_items, dict):
-                self.__setting_items = self.__setting_items.values()
-            for key, value in self.__setting_items:
-                self.__set_item(key, value)
-
-        self.__set_item("TriggerMode", MvCameraControl.MV_TRIGGER_MODE_ON)
-        self.__set_item("TriggerSource", MvCameraControl.MV_TRIGGER_SOURCE_SOFTWARE)
-        self.__set_item("AcquisitionFrameRateEnable", False)
-        self.__set_item("PixelFormat", "Mono8")
-        self.__set_item("ExposureAuto", "Off")
+        self.__device_lost = False
+        self.__register_exception_callback()
+
+        parameters = []
+        if self.__heartbeat_timeout_ms and self.mvcc_dev_info.nTLayerType == MvCameraControl.MV_GIGE_DEVICE:
+            parameters.append(("GevHeartbeatTimeout", int(self.__heartbeat_timeout_ms)))
+
+        if acquisition_mode == ACQUISITION_MODE_CONTINUOUS:
+            parameters.append(("TriggerMode", MvCameraControl.MV_TRIGGER_MODE_OFF))
+            parameters.extend(self.__frame_rate_parameters(frame_rate))
+        elif acquisition_mode == ACQUISITION_MODE_HARDWARE:
+            # Фронт на входе запускает серию из AcquisitionBurstFrameCount кадров с максимальной частотой
+            self.__burst_frames = max(1, int(hardware_trigger.get("BurstFrames", 1)))
+            self.__burst_index = None
+            self.__burst_left = 0
+            parameters.append(("TriggerSelector", "FrameBurstStart"))
+            parameters.append(("TriggerMode", MvCameraControl.MV_TRIGGER_MODE_ON))
+            parameters.append(("TriggerSource", hardware_trigger.get("Line", "Line0")))
+            parameters.append(("TriggerActivation", _TRIGGER_ACTIVATIONS[edge]))
+            parameters.append(("TriggerDelay", float(hardware_trigger.get("DelayUs", 0))))
+            parameters.append(("AcquisitionBurstFrameCount", self.__burst_frames))
+            parameters.append(("AcquisitionFrameRateEnable", False))
+        else:
+            parameters.append(("TriggerMode", MvCameraControl.MV_TRIGGER_MODE_ON))
+            parameters.append(("TriggerSource", MvCameraControl.MV_TRIGGER_SOURCE_SOFTWARE))
+            parameters.append(("AcquisitionFrameRateEnable", False))
+        parameters.append(("PixelFormat", pixel_format))
+        parameters.append(("ExposureAuto", "Off"))
+        self.__apply(parameters, stop_on_error=True)
+        if self.__setting_items:
+            # Сохранённые параметры применяются последними, поверх параметров режима
+            errors = self.__apply(list(self.__setting_items.items()))
+            if errors:
+                logger.warning(f"Не удалось восстановить параметры камеры: {errors}")
+        self.__apply_roi(roi)
 
         stParam = MvCameraControl.MVCC_INTVALUE()
         memset(byref(stParam), 0, sizeof(MvCameraControl.MVCC_INTVALUE))
@@ -315,25 +506,285 @@ class HikCamera(MvCameraControl.MvCamera):
                 f"Получение размера полезной нагрузки не удалось! ret[0x{ret}]"
             )
         self.nPayloadSize = stParam.nCurValue
-        self.data_buf = (ctypes.c_ubyte * self.nPayloadSize)()
-        self.stFrameInfo = MvCameraControl.MV_FRAME_OUT_INFO_EX()
-        memset(byref(self.stFrameInfo), 0, sizeof(self.stFrameInfo))
+        if acquisition_mode == ACQUISITION_MODE_TRIGGER:
+            self.__allocate_buffers(buffer_count)
+
+        if acquisition_mode in (ACQUISITION_MODE_CONTINUOUS, ACQUISITION_MODE_HARDWARE):
+            # Буферов SDK должно хватать на очередь и на кадры, которые сейчас обрабатываются
+            ret = self.MV_CC_SetImageNodeNum(buffer_count + 2)
+            if ret != 0:
+                logger.warning(f"Не удалось установить количество буферов SDK! ret[0x{ret}]")
 
         ret = self.MV_CC_StartGrabbing()
         if ret != 0:
             logger.error(f"Запуск захвата кадров не удался! ret[0x{ret}]")
             raise HikCameraException(f"Запуск захвата кадров не удался! ret[0x{ret}]")
+        self.acquisition_mode = acquisition_mode
         self.__is_opened = True
 
+        if acquisition_mode in (ACQUISITION_MODE_CONTINUOUS, ACQUISITION_MODE_HARDWARE):
+            self.__start_grab_thread(buffer_count)
+
         logger.debug("Камера Hikvision успешно проинициализирована и открыта")
 
+    def __register_exception_callback(self):
+        """
+        Подписка на исключения SDK после открытия устройства: об обрыве связи SDK сообщает
+        по истечении тайм-аута контрольных сообщений, не дожидаясь ошибок захвата.
+        """
+        def on_exception(msg_type, user):
+            if msg_type == MvCameraControl.MV_EXCEPTION_DEV_DISCONNECT:
+                self.__device_lost = True
+                logger.error(f"Потеряна связь с камерой Hikvision {self.__ip}")
+
+        # Ссылка на обратный вызов хранится в объекте, иначе сборщик мусора освободит его раньше SDK
+        self.__exception_callback = _EXCEPTION_CALLBACK(on_exception)
+        ret = self.MV_CC_RegisterExceptionCallBack(self.__exception_callback, None)
+        if ret != 0:
+            logger.warning(f"Не удалось подписаться на исключения SDK! ret[0x{ret:x}]")
+
+    def reconnect(self):
+        """
+        Быстрое переподключение к тому же устройству: без поиска устройств, по сохранённым
+        сведениям об устройстве, с параметрами последнего open() и сохранёнными параметрами камеры.
+        """
+        if self.__open_args is None:
+            raise HikCameraException("Камера не открывалась, переподключение невозможно")
+        logger.info(f"Переподключение к камере Hikvision {self.__ip}")
+        self.__release_device()
+        # После обрыва связи дескриптор создаётся заново, прежний остаётся в состоянии ошибки
+        self.MV_CC_DestroyHandle()
+        self.__create_camera_handle()
+        self.open(**self.__open_args)
+
+    def __allocate_buffers(self, buffer_count):
+        """
+        Создание пула буферов для режима программного триггера.
+        Следующий кадр захватывается в свободный буфер, пока предыдущие ещё обрабатываются.
+        """
+        self.__buffer_pool = queue.Queue()
+        for _ in range(max(1, buffer_count)):
+            data_buf = (ctypes.c_ubyte * self.nPayloadSize)()
+            stFrameInfo = MvCameraControl.MV_FRAME_OUT_INFO_EX()
+            memset(byref(stFrameInfo), 0, sizeof(stFrameInfo))
+            self.__buffer_pool.put((data_buf, stFrameInfo))
+
+    def __get_int_node(self, key):
+        """Текущее значение и ограничения целочисленного узла (MVCC_INTVALUE)."""
+        stParam = MvCameraControl.MVCC_INTVALUE()
+        memset(byref(stParam), 0, sizeof(MvCameraControl.MVCC_INTVALUE))
+        with self.__lock:
+            ret = self.MV_CC_GetIntValue(key, stParam)
+        if ret != 0:
+            logger.error(f"Получение параметра '{key}' не удалось! ret[0x{ret}]")
+            raise HikCameraException(f"Получение параметра '{key}' не удалось! ret[0x{ret}]")
+        return stParam
+
+    def __apply_roi(self, roi):
+        """Программирование области интереса и объединения пикселей сенсора."""
+        binning = max(1, int(roi.get("Binning", 1))) if roi else 1
+        # Объединение и нулевые смещения задаются первыми: от них зависят допустимые Width/Height
+        errors = self.__apply([("BinningHorizontal", binning), ("BinningVertical", binning)])
+        if errors and binning != 1:
+            logger.warning(f"Объединение пикселей {binning}x{binning} не поддерживается камерой: {errors}")
+            binning = 1
+            self.__apply([("BinningHorizontal", 1), ("BinningVertical", 1)])
+        self.__apply([("OffsetX", 0), ("OffsetY", 0)], stop_on_error=True)
+
+        width, height = self.__get_int_node("Width"), self.__get_int_node("Height")
+        if roi is None:
+            aligned = {"OffsetX": 0, "OffsetY": 0, "Width": width.nMax, "Height": height.nMax, "Binning": 1}
+        else:
+            offset_x, offset_y = self.__get_int_node("OffsetX"), self.__get_int_node("OffsetY")
+            aligned = align_roi(
+                roi["Left"], roi["Top"], roi["Right"], roi["Bottom"], width.nMax, height.nMax, binning,
+                width.nInc or 1, height.nInc or 1, offset_x.nInc or 1, offset_y.nInc or 1,
+                width.nMin or 1, height.nMin or 1,
+            )
+
+        b = aligned["Binning"]
+        self.__apply([
+            ("Width", aligned["Width"] // b),
+            ("Height", aligned["Height"] // b),
+            ("OffsetX", aligned["OffsetX"] // b),
+            ("OffsetY", aligned["OffsetY"] // b),
+        ], stop_on_error=True)
+        self.__roi = aligned
+        logger.info(f"Область интереса камеры: {aligned}")
+
+    def get_roi(self):
+        """Фактическая область интереса в пикселях сенсора."""
+        return dict(self.__roi) if self.__roi else None
+
+    @staticmethod
+    def __frame_rate_parameters(frame_rate):
+        """Параметры частоты кадров непрерывного режима. 0/None - максимальная частота сенсора."""
+        if frame_rate:
+            return [("AcquisitionFrameRateEnable", True), ("AcquisitionFrameRate", float(frame_rate))]
+        return [("AcquisitionFrameRateEnable", False)]
+
+    def __apply_frame_rate(self, frame_rate):
+        """Установка частоты кадров непрерывного режима."""
+        self.__apply(self.__frame_rate_parameters(frame_rate), stop_on_error=True)
+
+    def set_frame_rate(self, frame_rate):
+        """Изменение частоты кадров непрерывного режима."""
+        logger.debug(f"Установка частоты кадров: {frame_rate}")
+        self.__apply_frame_rate(frame_rate)
+
+    def __start_grab_thread(self, buffer_count):
+        """Запуск потока, забирающего кадры из буферов SDK в очередь."""
+        self.__frame_queue = queue.Queue(maxsize=max(1, buffer_count))
+        self.__grab_stop.clear()
+        self.__grab_thread = Thread(target=self.__grab_loop, daemon=True)
+        self.__grab_thread.start()
+
+    def __stop_grab_thread(self):
+        """Остановка потока захвата и возврат всех буферов SDK."""
+        if self.__grab_thread is None:
+            return
+        self.__grab_stop.set()
+        self.__grab_thread.join(timeout=self.TIMEOUT_MS / 1000 * 2)
+        self.__grab_thread = None
+        self.__drain_frame_queue()
+
+    def __drain_frame_queue(self):
+        """Освобождает кадры, оставшиеся в очереди."""
+        while True:
+            try:
+                self.__frame_queue.get_nowait().release()
+            except queue.Empty:
+                break
+
+    def __grab_loop(self):
+        """Цикл непрерывного захвата: буферы SDK попадают в очередь без копирования."""
+        logger.debug("Запуск потока непрерывного захвата кадров")
+        while not self.__grab_stop.is_set():
+            stFrame = MvCameraControl.MV_FRAME_OUT()
+            memset(byref(stFrame), 0, sizeof(stFrame))
+            wait_start = time.perf_counter()
+            ret = self.MV_CC_GetImageBuffer(stFrame, self.TIMEOUT_MS)
+            if ret != 0 and self.__device_lost:
+                # Связи нет, ошибки захвата ожидаемы до переподключения
+                self.__grab_stop.wait(0.1)
+                continue
+            if ret != 0 and self.acquisition_mode == ACQUISITION_MODE_HARDWARE:
+                # Без фронтов на входе кадров нет, это не ошибка
+                continue
+            if ret != 0:
+                self.metrics.count("frame_timeouts")
+                logger.warning(f"Кадр не получен за {self.TIMEOUT_MS} мс! ret[0x{ret:x}]")
+                continue
+            self.metrics.observe("frame_wait", time.perf_counter() - wait_start)
+            try:
+                frame = self.__borrow_sdk_buffer(stFrame)
+            except HikCameraException:
+                self.MV_CC_FreeImageBuffer(stFrame)
+                continue
+            self.metrics.mark("frames")
+
+            # При переполнении отбрасываем самый старый кадр, чтобы потребитель получал свежие
+            while True:
+                try:
+                    self.__frame_queue.put_nowait(frame)
+                    break
+                except queue.Full:
+                    try:
+                        self.__frame_queue.get_nowait().release()
+                        self.metrics.count("dropped_frames")
+                    except queue.Empty:
+                        pass
+        logger.debug("Поток непрерывного захвата кадров остановлен")
+
+    def __borrow_sdk_buffer(self, stFrame):
+        """Оборачивает буфер SDK в HikFrame, который вернёт буфер при release()."""
+        info = stFrame.stFrameInfo
+        h, w = info.nHeight, info.nWidth
+        buf = np.ctypeslib.as_array(stFrame.pBufAddr, shape=(info.nFrameLen,))
+
+        def release():
+            self.MV_CC_FreeImageBuffer(stFrame)
+
+        try:
+            with self.metrics.timer("unpack"):
+                image, recycle = self.__to_image(buf, info.enPixelType, h, w, info.nFrameLen)
+        except Exception:
+            release()
+            raise
+        self.last_time_get_frame = time.time()
+
+        if recycle is not None:
+            # Изображение распаковано в буфер пула, буфер SDK можно вернуть сразу
+            release()
+            return self.__make_frame(image, info, recycle)
+        return self.__make_frame(image, info, release)
+
+    def __make_frame(self, image, info, release_callback=None):
+        """Создаёт HikFrame с метками времени из MV_FRAME_OUT_INFO_EX и положением на сенсоре."""
+        device_timestamp = (info.nDevTimeStampHigh << 32) | info.nDevTimeStampLow
+        # nHostTimeStamp заполняется SDK в миллисекундах, старые версии SDK оставляют 0
+        host_timestamp = info.nHostTimeStamp / 1000 if info.nHostTimeStamp else time.time()
+        roi = self.__roi or {}
+        trigger_timestamp = 0.0
+        if self.acquisition_mode == ACQUISITION_MODE_HARDWARE:
+            trigger_timestamp = self.__burst_trigger_timestamp(info.nTriggerIndex, host_timestamp)
+        return HikFrame(
+            image, info.nFrameNum, release_callback, device_timestamp, host_timestamp,
+            roi.get("OffsetX", 0), roi.get("OffsetY", 0), roi.get("Binning", 1), trigger_timestamp,
+        )
+
+    def __burst_trigger_timestamp(self, trigger_index, host_timestamp):
+        """
+        Метка времени фронта для кадра серии аппаратного триггера: время первого кадра серии.
+        Серия определяется по счётчику триггеров nTriggerIndex; камеры, которые его не заполняют,
+        делятся на серии по BurstFrames кадров.
+        """
+        if trigger_index != self.__burst_index or self.__burst_left <= 0:
+            self.__burst_index = trigger_index
+            self.__burst_left = self.__burst_frames
+            self.__burst_timestamp = host_timestamp
+            self.metrics.mark("hardware_triggers")
+        self.__burst_left -= 1
+        return self.__burst_timestamp
+
+    def borrow_frame(self, timeout=None):
+        """
+        Получение кадра без копирования.
+        В непрерывном режиме кадр берётся из очереди буферов SDK, в режиме
+        программного триггера - захватывается в свободный буфер пула.
+        Возвращает HikFrame или None, если за timeout секунд кадр не получен.
+        """
+        if self.acquisition_mode in (ACQUISITION_MODE_CONTINUOUS, ACQUISITION_MODE_HARDWARE):
+            try:
+                return self.__frame_queue.get(timeout=timeout)
+            except queue.Empty:
+                return None
+        return self.__trigger_frame(timeout)
+
     def close(self):
         """Закрытие камеры Hikvision и освобождение ресурсов."""
 
         logger.debug("Закрытие камеры Hikvision")
-
-        self.__set_item("TriggerMode", MvCameraControl.MV_TRIGGER_MODE_OFF)
-        self.__set_item("AcquisitionFrameRateEnable", True)
+        if self.__device_lost:
+            # Связи нет: параметры не записать, освобождаются только ресурсы SDK
+            self.__release_device()
+            return
+
+        self.__stop_grab_thread()
+        with self.__output_lock:
+            self.__output_pool = {}
+        self.__apply([
+            ("TriggerMode", MvCameraControl.MV_TRIGGER_MODE_OFF),
+            ("AcquisitionFrameRateEnable", True),
+        ], stop_on_error=True)
+        if self.acquisition_mode == ACQUISITION_MODE_HARDWARE:
+            # Серия из нескольких кадров сломала бы программный триггер при следующем открытии
+            errors = self.__apply([
+                ("TriggerSource", "Software"),
+                ("AcquisitionBurstFrameCount", 1),
+            ])
+            if errors:
+                logger.warning(f"Не удалось сбросить параметры аппаратного триггера: {errors}")
 
         ret = self.MV_CC_StopGrabbing()
         if ret != 0:
@@ -346,84 +797,197 @@ class HikCamera(MvCameraControl.MvCamera):
         self.__is_opened = False
         logger.debug("Камера Hikvision успешно закрыта")
 
+    def __release_device(self):
+        """Остановка захвата и закрытие устройства без записи параметров и без проверки ошибок SDK."""
+        self.__stop_grab_thread()
+        with self.__output_lock:
+            self.__output_pool = {}
+        self.MV_CC_StopGrabbing()
+        self.MV_CC_CloseDevice()
+        self.__is_opened = False
+
     def get_frame(self):
-        """Получение кадра с камеры."""
+        """Получение копии кадра с камеры."""
         logger.debug("Получение кадра с камеры Hikvision")
-        stFrameInfo = self.stFrameInfo
+        frame = self.borrow_frame(timeout=self.TIMEOUT_MS / 1000)
+        if frame is None:
+            logger.error("Не удалось получить кадр с камеры.")
+            raise HikCameraException("Не удалось получить кадр с камеры.")
+        with frame:
+            self.last_frame = frame.image.copy()
+        return self.last_frame
 
-        config = self.__config or {}
-        lock_name = config.get("lock_name")
-        repeat_trigger = config.get("repeat_trigger", 1)
+    def __trigger_frame(self, timeout=None):
+        """Программный триггер и захват кадра в свободный буфер пула."""
+        try:
+            data_buf, stFrameInfo = self.__buffer_pool.get(timeout=timeout)
+        except queue.Empty:
+            logger.warning("Нет свободных буферов кадров, все кадры ещё обрабатываются")
+            return None
 
-        # Получаем или создаём lock для данного lock_name
-        if lock_name not in _lock_name_to_lock:
-            _lock_name_to_lock[lock_name] = Lock()
-        lock = _lock_name_to_lock[lock_name]
-
-        frame_received = False
-        with lock:
-            for _ in range(repeat_trigger):
-                with self.__lock:
-                    ret = self.MV_CC_SetCommandValue("TriggerSoftware")
-                    if ret != 0:
-                        logger.error(f"Программная команда триггера не удалась! ret[0x{ret}]")
-                        raise HikCameraException(f"Программная команда триггера не удалась! ret[0x{ret}]")
-                    ret = self.MV_CC_GetOneFrameTimeout(
-                        byref(self.data_buf),
-                        self.nPayloadSize,
-                        self.stFrameInfo,
-                        self.TIMEOUT_MS,
-                    )
-                    if ret == 0:
-                        frame_received = True
-                        self.last_time_get_frame = time.time()
-                        break  # получили кадр, выходим из цикла
+        # Буфер возвращается в пул, из которого взят: после переоткрытия камеры пул новый
+        pool = self.__buffer_pool
 
-        if not frame_received:
-            logger.error("Не удалось получить кадр с камеры после всех попыток.")
-            raise HikCameraException("Не удалось получить кадр с камеры.")
+        def release():
+            pool.put((data_buf, stFrameInfo))
 
-        h, w = stFrameInfo.nHeight, stFrameInfo.nWidth
+        config = self.__config or {}
+        repeat_trigger = config.get("repeat_trigger", 1)
+
+        # Общая блокировка для камер с одним lock_name или собственная блокировка камеры
+        lock = self.__trigger_lock
+
+        try:
+            frame_received = False
+            metrics = self.metrics
+            with lock:
+                for _ in range(repeat_trigger):
+                    with self.__lock:
+                        trigger_start = time.perf_counter()
+                        ret = self.MV_CC_SetCommandValue("TriggerSoftware")
+                        if ret != 0:
+                            metrics.count("trigger_failures")
+                            logger.error(f"Программная команда триггера не удалась! ret[0x{ret}]")
+                            raise HikCameraException(f"Программная команда триггера не удалась! ret[0x{ret}]")
+                        transfer_start = time.perf_counter()
+                        ret = self.MV_CC_GetOneFrameTimeout(
+                            byref(data_buf),
+                            self.nPayloadSize,
+                            stFrameInfo,
+                            self.TIMEOUT_MS,
+                        )
+                        transfer_end = time.perf_counter()
+                        metrics.observe("trigger", transfer_start - trigger_start)
+                        if ret == 0:
+                            metrics.observe("transfer", transfer_end - transfer_start)
+                            metrics.observe("trigger_to_frame", transfer_end - trigger_start)
+                            frame_received = True
+                            self.last_time_get_frame = time.time()
+                            break  # получили кадр, выходим из цикла
+                        metrics.count("frame_timeouts")
+
+            if not frame_received:
+                logger.error("Не удалось получить кадр с камеры после всех попыток.")
+                raise HikCameraException("Не удалось получить кадр с камеры.")
+
+            h, w = stFrameInfo.nHeight, stFrameInfo.nWidth
+            buf = np.frombuffer(data_buf, dtype=np.uint8)
+            frame_len = stFrameInfo.nFrameLen or self.nPayloadSize
+            with metrics.timer("unpack"):
+                image, recycle = self.__to_image(buf, stFrameInfo.enPixelType, h, w, frame_len)
+            metrics.mark("frames")
+        except Exception:
+            release()
+            raise
+
+        if recycle is not None:
+            release()
+            return self.__make_frame(image, stFrameInfo, recycle)
+        return self.__make_frame(image, stFrameInfo, release)
+
+    def set_tone_mapping(self, enabled, gamma=1.0, precise=False):
+        """
+        Преобразование кадров 10/12/16 бит в 8 бит при распаковке.
+        :param enabled: включить преобразование.
+        :param gamma: гамма-коррекция, 1.0 - линейное преобразование (старшие 8 бит).
+        :param precise: гамма по всем битам пикселя (медленнее), иначе по старшим 8 битам.
+        """
+        self.__tone_map = bool(enabled)
+        self.__tone_gamma = float(gamma)
+        self.__tone_precise = bool(precise)
+        self.__tone_luts = {}
+
+    def __get_tone_lut(self, pixel_type):
+        """Таблица тонального преобразования для формата или None для линейного."""
+        if self.__tone_gamma == 1.0:
+            return None
+        bits = PixelUnpack.pixel_type_bits(pixel_type) if self.__tone_precise else 8
+        lut = self.__tone_luts.get(bits)
+        if lut is None:
+            lut = self.__tone_luts[bits] = PixelUnpack.make_tone_lut(bits, self.__tone_gamma)
+        return lut
+
+    def __take_output(self, h, w, dtype):
+        """Берёт выходной буфер распаковки из пула. Возвращает (буфер, функция возврата в пул)."""
+        key = (h, w, np.dtype(dtype).str)
+        with self.__output_lock:
+            free = self.__output_pool.setdefault(key, [])
+            out = free.pop() if free else np.empty((h, w), dtype=dtype)
+        pool = self.__output_pool
+
+        def recycle():
+            with self.__output_lock:
+                # После close() пул пересоздаётся, старые буферы не возвращаются
+                if pool is self.__output_pool:
+                    pool.setdefault(key, []).append(out)
+
+        return out, recycle
+
+    def __to_image(self, buf, pixel_type, h, w, frame_len):
+        """
+        Преобразование сырого буфера кадра в изображение по формату пикселя.
+        Возвращает (изображение, recycle): recycle возвращает выходной буфер в пул,
+        None - изображение ссылается на исходный буфер без копирования.
+        """
         if h == 0 or w == 0:
             logger.error("Некорректные размеры кадра: h=0 или w=0")
             raise HikCameraException("Некорректные размеры кадра: h=0 или w=0")
 
-        self.bit = bit = self.nPayloadSize * 8 // h // w
         self.shape = h, w
-
-        buf = np.frombuffer(self.data_buf, dtype=np.uint8)
-
-        if bit == 8:
-            frame = buf.reshape(self.shape)
-        elif bit == 24:
+        buf = buf[: frame_len]
+
+        if PixelUnpack.is_supported(pixel_type):
+            self.bit = PixelUnpack.pixel_type_bits(pixel_type)
+            tone_map = self.__tone_map and self.bit > 8
+            if pixel_type == PixelUnpack.PIXEL_TYPE_MONO8 or (
+                not tone_map and PixelUnpack.PIXEL_TYPES[pixel_type][2] == 16
+            ):
+                frame = PixelUnpack.unpack(buf, pixel_type, h, w)
+                logger.debug(f"Получен кадр: {self.shape}, битность: {self.bit}")
+                return frame, None
+
+            out, recycle = self.__take_output(h, w, np.uint8 if tone_map else np.uint16)
+            try:
+                if tone_map:
+                    lut = self.__get_tone_lut(pixel_type)
+                    if lut is None or lut.size == 256:
+                        PixelUnpack.unpack_to_8bit(buf, pixel_type, h, w, out, lut)
+                    else:
+                        scratch, recycle_scratch = self.__take_output(h, w, np.uint16)
+                        try:
+                            PixelUnpack.unpack_to_8bit(buf, pixel_type, h, w, out, lut, scratch)
+                        finally:
+                            recycle_scratch()
+                else:
+                    PixelUnpack.unpack(buf, pixel_type, h, w, out)
+            except Exception as e:
+                recycle()
+                logger.error(f"Ошибка распаковки кадра: {e}")
+                raise HikCameraException(f"Ошибка распаковки кадра: {e}")
+            logger.debug(f"Получен кадр: {self.shape}, битность: {self.bit}")
+            return out, recycle
+
+        # Прочие форматы определяются по размеру кадра
+        self.bit = bit = frame_len * 8 // h // w
+        if bit == 24:
             self.shape = (h, w, 3)
-            frame = buf.reshape(self.shape)
-        elif bit == 16:
-            raw = buf.reshape(h, w, 2)
-            frame = raw[..., 1].astype(np.uint16) * 256 + raw[..., 0]
-        elif bit == 12:
-            self.shape = h, w
-            arr = buf.astype(np.uint16)
-            arr2 = arr[1::3]
-            arrl = (arr[::3] << 4) + ((arr2 & ~np.uint16(15)) >> 4)
-            arrr = (arr[2::3] << 4) + (arr2 & np.uint16(15))
-            frame = np.concatenate([arrl[..., None], arrr[..., None]], 1).reshape(self.shape)
+            frame = buf[: h * w * 3].reshape(self.shape)
         else:
-            logger.error(f"Неподдерживаемая битность кадра: {bit}")
-            raise HikCameraException(f"Неподдерживаемая битность кадра: {bit}")
+            logger.error(f"Неподдерживаемый формат кадра: 0x{pixel_type:08X}, битность: {bit}")
+            raise HikCameraException(f"Неподдерживаемый формат кадра: 0x{pixel_type:08X}, битность: {bit}")
 
         logger.debug(f"Получен кадр: {self.shape}, битность: {bit}")
-        self.last_frame = frame
-        return frame
+        return frame, None
     
     def is_opened(self):
-        return self.__is_opened
+        """Камера открыта и SDK не сообщал об обрыве связи."""
+        return self.__is_opened and not self.__device_lost
 
     def get_ip(self):
         """Получение IP-адреса камеры Hikvision."""
         if self.mvcc_dev_info is None:
             raise HikCameraException("Камера не инициализирована.")
-        return self.__int2ip(self.mvcc_dev_info.SpecialInfo.stGigEInfo.nCurrentIp)
+        return _describe_device(self.mvcc_dev_info)["IPAddress"]
 
     def get_device_name(self):
         """Получение имени устройства камеры Hikvision."""
@@ -431,8 +995,56 @@ class HikCamera(MvCameraControl.MvCamera):
             raise HikCameraException("Камера не инициализирована.")
         return self.__get_device_name()
 
+    def get_serial_number(self):
+        """Получение серийного номера камеры Hikvision."""
+        if self.mvcc_dev_info is None:
+            raise HikCameraException("Камера не инициализирована.")
+        return _describe_device(self.mvcc_dev_info)["SerialNumber"]
+
+    def get_stream_statistics(self):
+        """
+        Статистика потока SDK: для GigE - принятые байты, потерянные пакеты и кадры,
+        запросы повторной передачи и размер пакета; для USB - принятые и ошибочные кадры.
+        """
+        if not self.__is_opened or self.mvcc_dev_info is None:
+            return {}
+        usb = self.mvcc_dev_info.nTLayerType == MvCameraControl.MV_USB_DEVICE
+        info = MvCameraControl.MV_MATCH_INFO_USB_DETECT() if usb else MvCameraControl.MV_MATCH_INFO_NET_DETECT()
+        match = MvCameraControl.MV_ALL_MATCH_INFO()
+        match.nType = MvCameraControl.MV_MATCH_TYPE_USB_DETECT if usb else MvCameraControl.MV_MATCH_TYPE_NET_DETECT
+        match.pInfo = ctypes.addressof(info)
+        match.nInfoSize = sizeof(info)
+        with self.__lock:
+            ret = self.MV_CC_GetAllMatchInfo(match)
+        if ret != 0:
+            logger.warning(f"Получение статистики потока не удалось! ret[0x{ret:x}]")
+            return {"Error": f"ret[0x{ret:x}]"}
+        if usb:
+            return {
+                "ReceivedBytes": info.nReceiveDataSize,
+                "ReceivedFrames": info.nReceivedFrameCount,
+                "ErrorFrames": info.nErrorFrameCount,
+            }
+        statistics = {
+            "ReceivedBytes": info.nReceiveDataSize,
+            "ReceivedFrames": info.nNetRecvFrameCount,
+            "LostFrames": info.nLostFrameCount,
+            "LostPackets": info.nLostPacketCount,
+            "RequestedResendPackets": info.nRequestResendPacketCount,
+            "ResendPackets": info.nResendPacketCount,
+        }
+        # Размер пакета GigE нужен для подбора GevSCPSPacketSize по потерям пакетов
+        stParam = MvCameraControl.MVCC_INTVALUE()
+        with self.__lock:
+            if self.MV_CC_GetIntValue("GevSCPSPacketSize", stParam) == 0:
+                statistics["PacketSize"] = stParam.nCurValue
+        return statistics
+
     def set_exposure(self, exposure_value):
-        """Установка значения экспозиции камеры Hikvision."""
+        """Установка значения экспозиции камеры Hikvision; значение восстанавливается при переподключении."""
+        if exposure_value is not None:
+            self.__setting_items.pop("ExposureTime", None)
+            self.__setting_items["ExposureTime"] = float(exposure_value)
         self.MV_CC_SetFloatValue("ExposureTime", exposure_value)
 
     def reboot(self):
@@ -0,0 +1,345 @@
+# Системные импорты
+import os, sys, time, queue, glob
+from threading import Lock, Thread, Event
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Внешние модули
+import numpy as np
+import cv2
+
+# Внутренние модули
+from common.Logger import config_logger
+from common.CameraRoi import align_roi
+from common.Metrics import Metrics
+from CameraBackend import CameraBackend, CameraFrame, ACQUISITION_MODE_TRIGGER, ACQUISITION_MODE_CONTINUOUS
+
+logger = config_logger("camera-service/ReplayCamera.py")
+
+IMAGE_EXTENSIONS = (".png", ".bmp", ".jpg", ".jpeg", ".tif", ".tiff")
+REPLAY_PIXEL_FORMATS = ("Mono8", "Mono16", "BGR8")
+
+
+class ReplayCameraException(Exception):
+    """Исключение для ошибок воспроизведения кадров."""
+    pass
+
+
+class ReplayCamera(CameraBackend):
+    """
+    Камера без оборудования: воспроизводит каталог изображений, видеофайл
+    или синтетические кадры с заданной частотой и форматом пикселей.
+    Кадры получают номера и метки времени так же, как кадры HikCamera.
+    """
+
+    def __init__(self, source="", fps=10.0, pixel_format="Mono8", loop=True, width=1280, height=1024, preload=True):
+        """
+        :param source: каталог изображений, видеофайл или пустая строка для синтетических кадров.
+        :param fps: частота кадров непрерывного режима, 0 - максимальная.
+        :param pixel_format: формат выходных кадров: Mono8, Mono16 или BGR8.
+        :param loop: воспроизводить источник по кругу.
+        :param width: ширина синтетических кадров.
+        :param height: высота синтетических кадров.
+        :param preload: декодировать изображения каталога заранее, чтобы чтение с диска не влияло на замеры.
+        """
+        logger.info(f"Инициализация камеры воспроизведения, источник: {source or 'синтетические кадры'}")
+        self.__source = source
+        self.__fps = float(fps or 0)
+        self.__pixel_format = pixel_format
+        self.__loop = loop
+        self.__size = (int(width), int(height))
+        self.__preload = preload
+
+        self.__lock = Lock()
+        self.__files = []
+        self.__images = None
+        self.__video = None
+        self.__position = 0
+        self.__frame_num = 0
+        self.__parameters = {}
+        # Запрошенная и фактическая область интереса; фактическая зависит от размера исходных кадров
+        self.__roi_request = None
+        self.__roi = None
+        self.__roi_sensor = None
+        # Аргументы последнего open() для переподключения
+        self.__open_args = None
+
+        self.__is_opened = False
+        self.acquisition_mode = ACQUISITION_MODE_TRIGGER
+        self.__frame_queue = None
+        self.__grab_thread = None
+        self.__grab_stop = Event()
+        self.__start_time = time.monotonic_ns()
+        self.last_frame = None
+        # Счётчики и задержки: read - чтение и преобразование кадра источника
+        self.metrics = Metrics()
+
+    def __open_source(self):
+        """Подготовка источника кадров."""
+        source = self.__source
+        if not source:
+            return
+        if os.path.isdir(source):
+            self.__files = sorted(
+                path for path in glob.glob(os.path.join(source, "*")) if path.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            if not self.__files:
+                raise ReplayCameraException(f"В каталоге {source} нет изображений")
+            if self.__preload:
+                self.__images = [self.__convert(self.__read_image(path)) for path in self.__files]
+            logger.info(f"Воспроизведение каталога {source}: {len(self.__files)} кадров")
+        elif os.path.isfile(source):
+            self.__video = cv2.VideoCapture(source)
+            if not self.__video.isOpened():
+                raise ReplayCameraException(f"Не удалось открыть видеофайл {source}")
+            logger.info(f"Воспроизведение видеофайла {source}")
+        else:
+            raise ReplayCameraException(f"Источник кадров {source} не найден")
+
+    @staticmethod
+    def __read_image(path):
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ReplayCameraException(f"Не удалось прочитать изображение {path}")
+        return image
+
+    def __convert(self, image):
+        """Приведение изображения к формату пикселей камеры."""
+        if image.ndim == 3 and image.shape[2] == 4:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        if self.__pixel_format == "BGR8":
+            if image.dtype == np.uint16:
+                image = (image >> 8).astype(np.uint8)
+            if image.ndim == 2:
+                image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        else:
+            if image.ndim == 3:
+                image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            if self.__pixel_format == "Mono16" and image.dtype == np.uint8:
+                image = image.astype(np.uint16) << 8
+            elif self.__pixel_format == "Mono8" and image.dtype == np.uint16:
+                image = (image >> 8).astype(np.uint8)
+        image = np.ascontiguousarray(image)
+        # Кадры отдаются потребителям без копирования и не должны изменяться
+        image.flags.writeable = False
+        return image
+
+    def __synthetic_image(self):
+        """Синтетический кадр: движущийся градиент с номером кадра."""
+        width, height = self.__size
+        shift = self.__frame_num * 8
+        row = ((np.arange(width, dtype=np.uint32) + shift) % 256).astype(np.uint8)
+        image = np.broadcast_to(row, (height, width)).copy()
+        cv2.putText(image, f"{self.__frame_num}", (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, 255, 3)
+        return self.__convert(image)
+
+    def __next_image(self):
+        """Следующее изображение источника или None, если источник закончился."""
+        if self.__video is not None:
+            ok, image = self.__video.read()
+            if not ok and self.__loop:
+                self.__video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, image = self.__video.read()
+            return self.__convert(image) if ok else None
+        if self.__files:
+            if self.__position >= len(self.__files):
+                if not self.__loop:
+                    return None
+                self.__position = 0
+            index = self.__position
+            self.__position += 1
+            if self.__images is not None:
+                return self.__images[index]
+            return self.__convert(self.__read_image(self.__files[index]))
+        return self.__synthetic_image()
+
+    def __crop(self, image):
+        """Вырезание области интереса и объединение пикселей, как это сделал бы сенсор."""
+        h, w = image.shape[:2]
+        if self.__roi is None or self.__roi_sensor != (w, h):
+            request = self.__roi_request
+            if request is None:
+                self.__roi = {"OffsetX": 0, "OffsetY": 0, "Width": w, "Height": h, "Binning": 1}
+            else:
+                b = max(1, int(request.get("Binning", 1)))
+                self.__roi = align_roi(request["Left"], request["Top"], request["Right"], request["Bottom"], w // b, h // b, b)
+            self.__roi_sensor = (w, h)
+            logger.info(f"Область интереса воспроизведения: {self.__roi}")
+
+        roi = self.__roi
+        if roi["Width"] == w and roi["Height"] == h:
+            return image
+        x, y, b = roi["OffsetX"], roi["OffsetY"], roi["Binning"]
+        crop = image[y : y + roi["Height"], x : x + roi["Width"]]
+        if b > 1:
+            crop = cv2.resize(crop, (roi["Width"] // b, roi["Height"] // b), interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+        crop.flags.writeable = False
+        return crop
+
+    def __capture(self):
+        """Захват следующего кадра с номером, метками времени и положением на сенсоре."""
+        with self.__lock:
+            with self.metrics.timer("read"):
+                image = self.__next_image()
+                if image is None:
+                    return None
+                image = self.__crop(image)
+            self.metrics.mark("frames")
+            self.__frame_num += 1
+            roi = self.__roi
+            return CameraFrame(
+                image,
+                self.__frame_num,
+                device_timestamp=time.monotonic_ns() - self.__start_time,
+                host_timestamp=time.time(),
+                offset_x=roi["OffsetX"],
+                offset_y=roi["OffsetY"],
+                binning=roi["Binning"],
+            )
+
+    def open(self, acquisition_mode=ACQUISITION_MODE_TRIGGER, frame_rate=None, buffer_count=4, pixel_format=None,
+             roi=None, hardware_trigger=None):
+        """
+        Открытие источника кадров и запуск воспроизведения.
+        Аппаратного входа у воспроизведения нет, захват по датчику проверяется в режиме IO.
+        """
+        logger.debug(f"Открытие камеры воспроизведения, режим захвата: {acquisition_mode}")
+        if acquisition_mode not in (ACQUISITION_MODE_TRIGGER, ACQUISITION_MODE_CONTINUOUS):
+            raise ReplayCameraException(f"Режим захвата {acquisition_mode} не поддерживается воспроизведением")
+        if pixel_format is not None:
+            self.__pixel_format = pixel_format
+        if self.__pixel_format not in REPLAY_PIXEL_FORMATS:
+            raise ReplayCameraException(f"Неподдерживаемый формат пикселей воспроизведения: {self.__pixel_format}")
+        if frame_rate is not None:
+            self.__fps = float(frame_rate)
+        self.__roi_request = roi
+        self.__roi = None
+        self.__open_args = dict(
+            acquisition_mode=acquisition_mode, frame_rate=frame_rate, buffer_count=buffer_count,
+            pixel_format=pixel_format, roi=roi,
+        )
+
+        self.__open_source()
+        self.acquisition_mode = acquisition_mode
+        self.__is_opened = True
+        if acquisition_mode == ACQUISITION_MODE_CONTINUOUS:
+            self.__frame_queue = queue.Queue(maxsize=max(1, buffer_count))
+            self.__grab_stop.clear()
+            self.__grab_thread = Thread(target=self.__grab_loop, daemon=True)
+            self.__grab_thread.start()
+        logger.debug("Камера воспроизведения открыта")
+
+    def __grab_loop(self):
+        """Непрерывная выдача кадров с заданной частотой; при переполнении очереди старый кадр отбрасывается."""
+        next_time = time.monotonic()
+        while not self.__grab_stop.is_set():
+            if self.__fps > 0:
+                delay = next_time - time.monotonic()
+                if delay > 0 and self.__grab_stop.wait(delay):
+                    break
+                # Отставание не накапливается: следующий кадр отсчитывается от текущего момента
+                next_time = max(next_time, time.monotonic() - 1 / self.__fps) + 1 / self.__fps
+            frame = self.__capture()
+            if frame is None:
+                logger.info("Источник кадров закончился")
+                break
+            while True:
+                try:
+                    self.__frame_queue.put_nowait(frame)
+                    break
+                except queue.Full:
+                    try:
+                        self.__frame_queue.get_nowait().release()
+                        self.metrics.count("dropped_frames")
+                    except queue.Empty:
+                        pass
+
+    def borrow_frame(self, timeout=None):
+        """Кадр без копирования или None, если за timeout секунд кадр не получен."""
+        if not self.__is_opened:
+            return None
+        if self.acquisition_mode == ACQUISITION_MODE_CONTINUOUS:
+            try:
+                return self.__frame_queue.get(timeout=timeout)
+            except queue.Empty:
+                return None
+        return self.__capture()
+
+    def get_frame(self):
+        """Получение копии кадра."""
+        frame = self.borrow_frame(timeout=2)
+        if frame is None:
+            raise ReplayCameraException("Не удалось получить кадр воспроизведения.")
+        with frame:
+            self.last_frame = frame.image.copy()
+        return self.last_frame
+
+    def close(self):
+        """Остановка воспроизведения."""
+        logger.debug("Закрытие камеры воспроизведения")
+        self.__grab_stop.set()
+        if self.__grab_thread is not None:
+            self.__grab_thread.join(timeout=2)
+            self.__grab_thread = None
+        if self.__video is not None:
+            self.__video.release()
+            self.__video = None
+        self.__is_opened = False
+
+    def is_opened(self):
+        return self.__is_opened
+
+    def reconnect(self):
+        """Переоткрытие источника с параметрами последнего open()."""
+        if self.__open_args is None:
+            raise ReplayCameraException("Камера воспроизведения не открывалась, переподключение невозможно")
+        self.close()
+        self.open(**self.__open_args)
+
+    def get_ip(self):
+        return "0.0.0.0"
+
+    def get_device_name(self):
+        return f"Replay: {self.__source or 'synthetic'}"
+
+    def get_serial_number(self):
+        return ""
+
+    def get_stream_statistics(self):
+        """Транспортного потока нет."""
+        return {}
+
+    def get_roi(self):
+        """Фактическая область интереса; до первого кадра размер сенсора неизвестен."""
+        return dict(self.__roi) if self.__roi else None
+
+    def set_exposure(self, exposure_value):
+        """Экспозиция не влияет на воспроизводимые кадры, значение только сохраняется."""
+        self.__parameters["ExposureTime"] = exposure_value
+
+    def set_frame_rate(self, frame_rate):
+        logger.debug(f"Установка частоты кадров воспроизведения: {frame_rate}")
+        self.__fps = float(frame_rate or 0)
+
+    def set_tone_mapping(self, enabled, gamma=1.0, precise=False):
+        """Кадры воспроизведения уже в выходном формате, преобразование не требуется."""
+        pass
+
+    def apply_parameters(self, parameters, stop_on_error=False):
+        """Параметры сохраняются без применения, ошибок не бывает."""
+        items = parameters.items() if isinstance(parameters, dict) else parameters
+        self.__parameters.update(items)
+        return {}
+
+
+if __name__ == "__main__":
+    camera = ReplayCamera(fps=30)
+    camera.open(ACQUISITION_MODE_CONTINUOUS)
+    start = time.time()
+    for _ in range(60):
+        with camera.borrow_frame(timeout=1) as frame:
+            pass
+    logger.info(f"Получено 60 кадров за {time.time() - start:.2f} с, последний кадр {frame.frame_num}, {frame.image.shape}")
+    camera.close()
@@ -7,11 +7,98 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from common.Config import Config
 
 base_settings = {
+    "Camera": {
+        "Backend": "Hik",  # Hik - камера Hikvision, Replay - воспроизведение файлов или синтетических кадров
+        "Roi": None,  # Область интереса {Left, Top, Right, Bottom, Binning} в пикселях сенсора, None - весь сенсор
+        "AcceptRoiRequests": True,  # Применять области интереса, запрошенные cv-service после калибровки
+        "MultiCamera": False,  # Обслуживать все найденные камеры Hikvision (или камеры раздела Cameras для Replay)
+        "PrimarySerial": None,  # Серийный номер основной камеры (прежние ключи Redis и разделы конфигурации)
+        "Reconnect": {
+            "InitialDelayMs": 50,  # Первая задержка между попытками подключения, удваивается после каждой неудачи
+            "MaxDelayMs": 2000,  # Наибольшая задержка между попытками
+            "RediscoverAfterMs": 5000,  # Сколько повторять подключение к известному устройству до повторного поиска
+            "CheckIntervalMs": 50,  # Период проверки связи с камерой
+            "FailedFrames": 5,  # Ошибок захвата подряд, после которых связь считается потерянной, 0 - не учитывать
+        },
+    },
+    # Разделы остальных камер: {"<id>": {"HikCamera": {...}, "Replay": {...}, ...}},
+    # значения перекрывают разделы основной камеры; кадры публикуются в ключи с суффиксом _<id>
+    "Cameras": {},
+    "Replay": {
+        "Source": "",  # Каталог изображений, видеофайл или пустая строка для синтетических кадров
+        "FPS": 10.0,  # Частота кадров непрерывного режима, 0 - максимальная
+        "PixelFormat": "Mono8",  # Mono8, Mono16, BGR8
+        "Loop": True,  # Воспроизведение по кругу
+        "Width": 1280,  # Размер синтетических кадров
+        "Height": 1024,
+    },
     "HikCamera": {
         "IPAddress": "255.255.255.255",
         "DeviceName": "HikVision Camera",
+        "SerialNumber": "",
+        "TriggerLockGroup": None,  # Камеры с одинаковым именем группы (общий сетевой канал) захватывают кадры по очереди
+        "HeartbeatTimeoutMs": 1000,  # Тайм-аут контрольных сообщений GigE: через него SDK сообщает об обрыве связи
         "ExposureValue": 50000,
         "FrameInterval": 0.5,
+        # Trigger - программный триггер каждые FrameInterval, Continuous - непрерывный захват,
+        # IO - серия кадров по фронту переменной io-service, Hardware - серия кадров по фронту на входе камеры
+        "AcquisitionMode": "Trigger",
+        "AcquisitionFrameRate": 10.0,  # Частота кадров непрерывного режима, 0 - максимальная
+        "BufferCount": 4,  # Количество буферов кадров (пул триггера / очередь непрерывного режима)
+        "PixelFormat": "Mono8",  # Mono8, Mono10, Mono10Packed, Mono12, Mono12Packed, Mono16
+        "ToneMap8Bit": False,  # Преобразование кадров 10/12/16 бит в 8 бит при распаковке
+        "ToneMapGamma": 1.0,  # Гамма преобразования в 8 бит, 1.0 - линейное
+        "ToneMapPrecise": False,  # Гамма по всем битам пикселя (медленнее), иначе по старшим 8 битам
+        "PublishWorkers": 2,  # Количество потоков кодирования и публикации кадров
+    },
+    "AutoExposure": {
+        "Enabled": False,  # Программная автоэкспозиция по яркости кадров; начальное значение - HikCamera.ExposureValue
+        "TargetMean": 0.45,  # Целевая средняя яркость в долях полной шкалы
+        "Tolerance": 0.05,  # Допустимое относительное отклонение яркости
+        "Damping": 0.5,  # Доля нужного изменения экспозиции за один шаг (0-1]
+        "MaxStepRatio": 2.0,  # Наибольшее изменение экспозиции за шаг, раз
+        "MinExposure": 50.0,  # Границы экспозиции, мкс
+        "MaxExposure": 200000.0,
+        "MaxClipped": 0.01,  # Допустимая доля пересвеченных пикселей
+        "Subsample": 8,  # Замер по каждому N-му пикселю строк и столбцов
+        "Interval": 0.2,  # Наименьший интервал между замерами, сек
+        "SettleFrames": 2,  # Кадров после изменения экспозиции, не участвующих в замере
+        "Region": None,  # Область замера {Left, Top, Right, Bottom} в пикселях сенсора, None - откалиброванная область
+    },
+    "CaptureTrigger": {
+        "Variable": "DI0",  # Переменная IO.Variables io-service, запускающая захват в режиме IO
+        "Line": "Line0",  # Вход камеры в режиме Hardware
+        "Edge": "Rising",  # Rising, Falling (Both - любое изменение, только в режиме IO)
+        "BurstFrames": 1,  # Кадров на один фронт
+        "BurstInterval": 0.0,  # Интервал между кадрами серии в режиме IO, сек
+        "DelayUs": 0,  # Задержка аппаратного триггера, мкс
+        "MaxEventAge": 0.5,  # События io-service старше этого не запускают захват, сек; 0 - без ограничения
+    },
+    "Leases": {
+        "Enabled": True,  # Частота захвата и варианты публикации по заявкам потребителей (common.FrameLease)
+        "IdleFPS": 1.0,  # Частота захвата без заявок
+        "RefreshInterval": 1.0,  # Период проверки истёкших заявок, сек
+    },
+    "Preview": {
+        "Enabled": True,  # Публикация уменьшенной копии кадра для браузера (streaming-service)
+        "Scale": 0.5,  # Коэффициент уменьшения
+        "JpegQuality": 70,  # Качество JPEG уменьшенной копии
+        "MaxFPS": 0,  # Ограничение частоты уменьшенных копий, 0 - каждый кадр
+    },
+    "Recorder": {
+        "Enabled": True,  # Хранение последних кадров в памяти для /save_frame и /dump_frames
+        "BufferFrames": 50,  # Количество кадров в кольцевом буфере
+        "MaxMemoryMB": 512,  # Ограничение памяти кольцевого буфера, МБ
+        "Writers": 2,  # Количество потоков записи на диск
+        "Format": "png",  # png, jpg, tiff, bmp
+        "PngCompression": 1,  # Сжатие PNG 0-9, без потерь
+        "JpegQuality": 95,  # Качество JPEG
+        "MaxPendingFrames": 200,  # Ограничение очереди записи
+    },
+    "FrameBus": {
+        "Enabled": True,  # Публикация несжатых кадров в разделяемую память
+        "Slots": 4,  # Количество слотов кольцевого буфера
+        "PublishJpeg": True,  # Дополнительная публикация JPEG в Redis для удалённых потребителей
     },
 }
 
@@ -11,8 +11,10 @@ from fastapi.concurrency import asynccontextmanager
 import cv2
 
 # Внутренние модули
+import configuration
 from common.Logger import config_logger
-from HikCamera.HikCamera import HikCamera
+from CameraBackend import ACQUISITION_MODE_CONTINUOUS
+from CameraManager import CameraManager, PRIMARY_CAMERA_ID
 from common.Config import Config
 from common.Redis import get_redis_client
 from common.Utils import is_docker
@@ -21,45 +23,20 @@ if is_docker():
    FRAMES_DIR = "/data/captured_frames"
 else:
    FRAMES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "captured_frames")
-REDIS_CAMERA_FRAME_KEY = os.getenv("REDIS_CAMERA_FRAME_KEY", "camera_frame")
 
 redis_client = get_redis_client()
 logger = config_logger("camera-service/main.py")
 
-def background_frame_sender():
-    """Бесконечно получает кадры с камеры и отправляет их в Redis."""
-    while True:
-        try:
-            if hik_camera.is_opened():
-                frame = hik_camera.get_frame()
-                if frame is not None:
-                    _, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 100])
-                    redis_client.set(REDIS_CAMERA_FRAME_KEY, buffer.tobytes())
-            else:
-                logger.warning("Камера не подключена, повторная попытка через 2 секунды")
-        except Exception as e:
-            logger.error(f"Ошибка при получении/отправке кадра: {e}")
-        time.sleep(Config.get("HikCamera.FrameInterval", 0.1))  # интервал между кадрами, можно уменьшить
-
-
-while True:
-    """Попытка подключения к камере Hikvision."""
-    try:
-        hik_camera = HikCamera()
-        Config.set("HikCamera.IPAddress", hik_camera.get_ip())
-        Config.set("HikCamera.DeviceName", hik_camera.get_device_name())
-        Config.save() 
-        hik_camera.open()
-        hik_camera.set_exposure(Config.get("HikCamera.ExposureValue"))
-        if hik_camera.is_opened():
-            logger.info("Камера успешно подключена")
-            break
-    except Exception as e:
-        logger.error(f"Ошибка при подключении к камере: {e}. Попытка повторного подключения через 10 секунд.")
-        time.sleep(10)
+# Каждая камера работает со своим конвейером захвата, шиной кадров и ключами Redis
+camera_manager = CameraManager(redis_client)
+camera_manager.start()
 
-# Запуск фонового потока при старте приложения
-threading.Thread(target=background_frame_sender, daemon=True).start()
+def get_channel(camera_id):
+    """Канал камеры по идентификатору или None."""
+    channel = camera_manager.get(camera_id)
+    if channel is None:
+        logger.error(f"Камера {camera_id} не найдена")
+    return channel
 
 @asynccontextmanager
 async def lifespan(app: FastAPIOffline):
@@ -67,12 +44,7 @@ async def lifespan(app: FastAPIOffline):
     try:
         yield
     finally:
-        try:
-            if hik_camera.is_opened():
-                hik_camera.close()
-                logger.info("Камера закрыта при остановке сервиса")
-        except Exception as e:
-            logger.error(f"Ошибка при закрытии камеры при остановке: {e}")
+        camera_manager.stop()
         logger.info("Сервис получения кадров камеры Hikvision остановлен")
     
 app = FastAPIOffline(
@@ -108,40 +80,180 @@ def reboot():
     threading.Thread(target=delayed_exit).start()
     return {"Status": "Reboot"}
 
+@app.get("/cameras")
+def get_cameras():
+    """ Список камер сервиса, их состояние и ключи публикации кадров """
+    logger.debug("Запрос /cameras")
+    return {"Status": "OK",
+            "Cameras": camera_manager.status()}
+
+@app.get("/status")
+def get_status():
+    """ Состояние подключения камер: отвечает и во время переподключения камеры """
+    logger.debug("Запрос /status")
+    return {"Status": "OK",
+            "Cameras": camera_manager.status()}
+
+@app.get("/cameras/{camera_id}/status")
+def get_camera_status(camera_id: str):
+    """ Состояние подключения камеры """
+    logger.debug(f"Запрос /status: {camera_id}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    return {"Status": "OK",
+            **channel.status()}
+
+@app.get("/metrics")
+def get_metrics():
+    """ Счётчики производительности захвата и публикации всех камер """
+    logger.debug("Запрос /metrics")
+    return {"Status": "OK",
+            "Cameras": camera_manager.get_metrics()}
+
+@app.get("/cameras/{camera_id}/metrics")
+def get_camera_metrics(camera_id: str):
+    """ Счётчики производительности захвата и публикации камеры """
+    logger.debug(f"Запрос /metrics: {camera_id}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    return {"Status": "OK",
+            **channel.get_metrics()}
+
+# Эндпоинты ниже доступны для основной камеры по прежним путям и для любой камеры по /cameras/{camera_id}/...
+
 @app.post("/set_exposure")
-def set_exposure(exposure_value: int):
+@app.post("/cameras/{camera_id}/set_exposure")
+def set_exposure(exposure_value: int, camera_id: str = PRIMARY_CAMERA_ID):
     """ Установка значения экспозиции камеры Hikvision """
-    logger.debug(f"Запрос /set_exposure: {exposure_value}")
-    hik_camera.set_exposure(exposure_value)
-    Config.set("HikCamera.ExposureValue", exposure_value)
+    logger.debug(f"Запрос /set_exposure: {camera_id}, {exposure_value}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    if channel.camera is not None:
+        # Без связи значение запоминается камерой и применяется при переподключении
+        channel.camera.set_exposure(exposure_value)
+    if channel.auto_exposure is not None:
+        # Автоэкспозиция продолжает подбор от заданного значения
+        channel.auto_exposure.exposure = float(exposure_value)
+    channel.config_set("HikCamera.ExposureValue", exposure_value)
     Config.save()
     return {"Status": "OK",
             "ExposureValue": exposure_value}
 
 @app.post("/set_frame_interval")
-def set_frame_interval(frame_interval: float):
+@app.post("/cameras/{camera_id}/set_frame_interval")
+def set_frame_interval(frame_interval: float, camera_id: str = PRIMARY_CAMERA_ID):
     """ Установка значения интервала кадров камеры Hikvision, сек"""
-    logger.debug(f"Запрос /set_frame_interval: {frame_interval}")
-    Config.set("HikCamera.FrameInterval", frame_interval)
+    logger.debug(f"Запрос /set_frame_interval: {camera_id}, {frame_interval}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    channel.config_set("HikCamera.FrameInterval", frame_interval)
     Config.save()
+    # Интервал из конфигурации - нижняя граница интервала, выбранного по заявкам потребителей
+    channel.refresh_leases(force=True)
     return {"Status": "OK",
             "FrameInterval": frame_interval}
 
+@app.post("/set_frame_rate")
+@app.post("/cameras/{camera_id}/set_frame_rate")
+def set_frame_rate(frame_rate: float, camera_id: str = PRIMARY_CAMERA_ID):
+    """ Установка частоты кадров непрерывного режима камеры Hikvision, кадров/сек (0 - максимальная)"""
+    logger.debug(f"Запрос /set_frame_rate: {camera_id}, {frame_rate}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    if channel.is_connected() and channel.camera.acquisition_mode == ACQUISITION_MODE_CONTINUOUS:
+        channel.camera.set_frame_rate(frame_rate)
+    channel.config_set(channel.frame_rate_key(), frame_rate)
+    Config.save()
+    channel.refresh_leases(force=True)
+    return {"Status": "OK",
+            "AcquisitionFrameRate": frame_rate}
+
+@app.post("/set_roi")
+@app.post("/cameras/{camera_id}/set_roi")
+def set_roi(left: int, top: int, right: int, bottom: int, binning: int = 1, camera_id: str = PRIMARY_CAMERA_ID):
+    """ Установка области интереса камеры, границы в пикселях сенсора """
+    logger.debug(f"Запрос /set_roi: {camera_id}, {left}, {top}, {right}, {bottom}, {binning}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    if right <= left or bottom <= top:
+        return {"Error": "Пустая область интереса"}, 400
+    try:
+        roi = channel.reconfigure({"Left": left, "Top": top, "Right": right, "Bottom": bottom, "Binning": binning})
+    except Exception as e:
+        logger.error(f"Ошибка при установке области интереса: {e}")
+        return {"Error": str(e)}, 500
+    return {"Status": "OK",
+            "Roi": roi}
+
+@app.post("/reset_roi")
+@app.post("/cameras/{camera_id}/reset_roi")
+def reset_roi(camera_id: str = PRIMARY_CAMERA_ID):
+    """ Сброс области интереса камеры на весь сенсор """
+    logger.debug(f"Запрос /reset_roi: {camera_id}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    try:
+        roi = channel.reconfigure(None)
+    except Exception as e:
+        logger.error(f"Ошибка при сбросе области интереса: {e}")
+        return {"Error": str(e)}, 500
+    return {"Status": "OK",
+            "Roi": roi}
+
+@app.get("/get_roi")
+@app.get("/cameras/{camera_id}/get_roi")
+def get_roi(camera_id: str = PRIMARY_CAMERA_ID):
+    """ Текущая область интереса камеры """
+    logger.debug(f"Запрос /get_roi: {camera_id}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    if not channel.is_connected():
+        return {"Error": "Камера не подключена"}, 503
+    return {"Status": "OK",
+            "Roi": channel.camera.get_roi()}
+
 @app.post("/save_frame")
-def save_frame():
+@app.post("/cameras/{camera_id}/save_frame")
+def save_frame(camera_id: str = PRIMARY_CAMERA_ID):
     """ Сохранение текущего кадра камеры Hikvision"""
-    logger.debug("Запрос /save_frame")
-    if not hik_camera.is_opened():
+    logger.debug(f"Запрос /save_frame: {camera_id}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    if not channel.is_connected() or channel.pipeline is None:
         logger.error("Камера не подключена")
         return {"Error": "Камера не подключена"}, 503
 
-    frame = hik_camera.last_frame
+    timestamp = time.strftime("%Y_%d_%m_%H_%M_%S")
+    suffix = "" if channel.primary else f"_{camera_id}"
+    name = f"frame{suffix}_{timestamp}"
+    if channel.recorder is not None:
+        # Кадр берётся из кольцевого буфера регистратора, запись выполняется в фоне
+        try:
+            filename = channel.recorder.save_latest(FRAMES_DIR, name)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении кадра: {e}")
+            return {"Error": str(e)}, 503
+        if filename is None:
+            logger.error("Не удалось получить кадр с камеры")
+            return {"Error": "Не удалось получить кадр с камеры"}, 500
+        return {"Status": "OK",
+                "Filename": filename}
+
+    frame = channel.pipeline.get_last_frame()
     if frame is None:
         logger.error("Не удалось получить кадр с камеры")
         return {"Error": "Не удалось получить кадр с камеры"}, 500
 
-    timestamp = time.strftime("%Y_%d_%m_%H_%M_%S")
-    filename = f"{FRAMES_DIR}/frame_{timestamp}.png"
+    filename = f"{FRAMES_DIR}/{name}.png"
     if not os.path.exists(FRAMES_DIR):
         os.makedirs(FRAMES_DIR)
     cv2.imwrite(filename, frame, [cv2.IMWRITE_PNG_COMPRESSION, 0])
@@ -149,6 +261,29 @@ def save_frame():
     return {"Status": "OK",
             "Filename": filename}
 
+@app.post("/dump_frames")
+@app.post("/cameras/{camera_id}/dump_frames")
+def dump_frames(seconds: float = 5.0, camera_id: str = PRIMARY_CAMERA_ID):
+    """ Сохранение кадров камеры за последние seconds секунд из кольцевого буфера """
+    logger.debug(f"Запрос /dump_frames: {camera_id}, {seconds}")
+    channel = get_channel(camera_id)
+    if channel is None:
+        return {"Error": f"Камера {camera_id} не найдена"}, 404
+    if channel.recorder is None:
+        return {"Error": "Регистратор кадров отключён (Recorder.Enabled)"}, 503
+
+    timestamp = time.strftime("%Y_%d_%m_%H_%M_%S")
+    suffix = "" if channel.primary else f"_{camera_id}"
+    directory = os.path.join(FRAMES_DIR, f"dump{suffix}_{timestamp}")
+    try:
+        filenames = channel.recorder.dump(seconds, directory)
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении кадров: {e}")
+        return {"Error": str(e)}, 503
+    return {"Status": "OK",
+            "Directory": directory,
+            "Frames": len(filenames)}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=6500)
\ No newline at end of file
@@ -0,0 +1,77 @@
+# Системные импорты
+import os, sys, json, math
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внутренние модули
+from common.Logger import config_logger
+from common.FrameMeta import seq_key, notify_channel
+
+logger = config_logger("CameraRoi.py")
+
+REDIS_CAMERA_ROI_KEY = os.getenv("REDIS_CAMERA_ROI_KEY", "camera_roi")
+
+
+def align_roi(left, top, right, bottom, max_width, max_height, binning=1,
+              width_inc=1, height_inc=1, offset_x_inc=1, offset_y_inc=1, min_width=1, min_height=1):
+    """
+    Выравнивание области интереса по шагам узлов сенсора.
+    Границы задаются в пикселях сенсора без объединения, ограничения сенсора
+    (max_*, *_inc, min_*) - в единицах узлов Width/Height/OffsetX/OffsetY при заданном binning.
+    Область только расширяется: выровненная область всегда содержит исходную.
+    Возвращает словарь OffsetX, OffsetY, Width, Height (пиксели сенсора) и Binning.
+    """
+    b = max(1, int(binning))
+
+    def axis(start, end, size_max, size_inc, offset_inc, size_min):
+        start = max(0, math.floor(start / b))
+        end = min(size_max, math.ceil(end / b))
+        offset = start // offset_inc * offset_inc
+        size = math.ceil(max(end - offset, size_min) / size_inc) * size_inc
+        size = min(size, size_max // size_inc * size_inc)
+        if offset + size > size_max:
+            offset = (size_max - size) // offset_inc * offset_inc
+        return offset, size
+
+    x, w = axis(left, right, max_width, width_inc, offset_x_inc, min_width)
+    y, h = axis(top, bottom, max_height, height_inc, offset_y_inc, min_height)
+    return {"OffsetX": x * b, "OffsetY": y * b, "Width": w * b, "Height": h * b, "Binning": b}
+
+
+def roi_bounds(roi):
+    """Границы (left, top, right, bottom) области интереса в пикселях сенсора."""
+    return (
+        roi["OffsetX"],
+        roi["OffsetY"],
+        roi["OffsetX"] + roi["Width"],
+        roi["OffsetY"] + roi["Height"],
+    )
+
+
+def request_roi(redis_client, roi, key=REDIS_CAMERA_ROI_KEY):
+    """
+    Запрос области интереса у camera-service.
+    :param roi: словарь Left, Top, Right, Bottom (пиксели сенсора) и Binning; None - весь сенсор.
+    :param key: ключ запросов камеры (у каждой камеры camera-service свой ключ).
+    """
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.set(key, json.dumps(roi))
+    pipe.incr(seq_key(key))
+    seq = pipe.execute()[1]
+    redis_client.publish(notify_channel(key), seq)
+    logger.info(f"Запрошена область интереса камеры {key}: {roi}")
+
+
+def get_roi_request(redis_client, key=REDIS_CAMERA_ROI_KEY):
+    """Последний запрос области интереса или None (весь сенсор)."""
+    data = redis_client.get(key)
+    return json.loads(data) if data else None
+
+
+if __name__ == "__main__":
+    roi = align_roi(101.5, 57.2, 900.1, 700.9, max_width=2448, max_height=2048,
+                    width_inc=16, height_inc=2, offset_x_inc=16, offset_y_inc=2, min_width=64, min_height=64)
+    logger.info(f"Выровненная область: {roi}")
+    roi = align_roi(101.5, 57.2, 900.1, 700.9, max_width=1224, max_height=1024, binning=2,
+                    width_inc=16, height_inc=2, offset_x_inc=16, offset_y_inc=2)
+    logger.info(f"Выровненная область с объединением 2x2: {roi}")
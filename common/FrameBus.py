@@ -0,0 +1,411 @@
+# Системные импорты
+import os, sys, json, time, threading
+from multiprocessing import shared_memory
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внешние модули
+import numpy as np
+
+# Внутренние модули
+from common.Logger import config_logger
+from common.FrameMeta import notify_channel, seq_key
+
+logger = config_logger("FrameBus.py")
+
+FRAME_BUS_NAME = os.getenv("FRAME_BUS_NAME", "alku_camera_frames")
+REDIS_CAMERA_FRAME_BUS_KEY = os.getenv("REDIS_CAMERA_FRAME_BUS_KEY", "camera_frame_bus")
+
+FRAME_BUS_MAGIC = 0x414C4B55  # "ALKU"
+FRAME_BUS_VERSION = 4
+FRAME_BUS_ALIGN = 64
+# Без Redis читатель не чаще этого интервала (с) проверяет, не пересоздан ли сегмент писателем
+FRAME_BUS_REATTACH_INTERVAL = 1.0
+
+# Поддерживаемые форматы пикселей: код -> (имя, dtype, число каналов)
+PIXEL_FORMATS = {
+    1: ("Mono8", np.uint8, 1),
+    2: ("Mono16", np.uint16, 1),
+    3: ("BGR8", np.uint8, 3),
+}
+PIXEL_FORMAT_CODES = {name: code for code, (name, _, _) in PIXEL_FORMATS.items()}
+
+# Заголовок шины в начале сегмента
+_BUS_HEADER_DTYPE = np.dtype(
+    {
+        "names": ["magic", "version", "slots", "latest_slot", "generation", "slot_size", "latest_seq"],
+        "formats": ["<u4", "<u4", "<u4", "<i4", "<u8", "<u8", "<u8"],
+        "offsets": [0, 4, 8, 12, 16, 24, 32],
+        "itemsize": FRAME_BUS_ALIGN,
+    }
+)
+
+# Заголовок слота. seq == 0 означает, что слот пуст или в него идёт запись
+_SLOT_HEADER_DTYPE = np.dtype(
+    {
+        "names": ["seq", "width", "height", "pixel_format", "nbytes", "host_timestamp", "device_timestamp",
+                  "offset_x", "offset_y", "binning", "trigger_timestamp"],
+        "formats": ["<u8", "<u4", "<u4", "<u4", "<u8", "<f8", "<u8", "<u4", "<u4", "<u4", "<f8"],
+        "offsets": [0, 8, 12, 16, 24, 32, 40, 48, 52, 56, 64],
+        "itemsize": 2 * FRAME_BUS_ALIGN,
+    }
+)
+
+
+class FrameBusException(Exception):
+    """Исключение для ошибок шины кадров."""
+    pass
+
+
+def pixel_format_from_array(frame: np.ndarray) -> str:
+    """Определяет формат пикселей по форме и типу массива кадра."""
+    if frame.ndim == 2 and frame.dtype == np.uint8:
+        return "Mono8"
+    if frame.ndim == 2 and frame.dtype == np.uint16:
+        return "Mono16"
+    if frame.ndim == 3 and frame.shape[2] == 3 and frame.dtype == np.uint8:
+        return "BGR8"
+    raise FrameBusException(f"Неподдерживаемый формат кадра: {frame.shape}, {frame.dtype}")
+
+
+def _align(value: int) -> int:
+    """Выравнивает размер по границе FRAME_BUS_ALIGN."""
+    return (value + FRAME_BUS_ALIGN - 1) // FRAME_BUS_ALIGN * FRAME_BUS_ALIGN
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Подключается к существующему сегменту, не передавая его resource_tracker,
+    иначе читатель удалит сегмент писателя при своём завершении.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class _FrameBusLayout:
+    """Разметка сегмента: заголовок шины, заголовки слотов и данные кадров."""
+
+    def __init__(self, buf, slots: int, slot_size: int):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.header = np.ndarray((1,), dtype=_BUS_HEADER_DTYPE, buffer=buf, offset=0)[0]
+        self.slot_headers = np.ndarray(
+            (slots,), dtype=_SLOT_HEADER_DTYPE, buffer=buf, offset=FRAME_BUS_ALIGN
+        )
+        self.data_offset = FRAME_BUS_ALIGN + _align(slots * _SLOT_HEADER_DTYPE.itemsize)
+        self.data = np.ndarray((slots, slot_size), dtype=np.uint8, buffer=buf, offset=self.data_offset)
+
+    @staticmethod
+    def segment_size(slots: int, slot_size: int) -> int:
+        return FRAME_BUS_ALIGN + _align(slots * _SLOT_HEADER_DTYPE.itemsize) + slots * slot_size
+
+
+class FrameBusFrame:
+    """Кадр из шины: NumPy-представление слота без копирования и его метаданные."""
+
+    def __init__(self, image, seq, slot, generation, pixel_format, host_timestamp=0.0, device_timestamp=0,
+                 offset_x=0, offset_y=0, binning=1, trigger_timestamp=0.0):
+        self.image = image
+        self.seq = seq
+        self.slot = slot
+        self.generation = generation
+        self.pixel_format = pixel_format
+        self.host_timestamp = host_timestamp
+        self.device_timestamp = device_timestamp
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+        self.binning = binning
+        self.trigger_timestamp = trigger_timestamp
+
+    @property
+    def width(self):
+        return self.image.shape[1]
+
+    @property
+    def height(self):
+        return self.image.shape[0]
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}("
+            f"seq={self.seq}, slot={self.slot}, "
+            f"size={self.width}x{self.height}, format={self.pixel_format})"
+        )
+
+
+class FrameBusWriter:
+    """
+    Писатель кольцевого буфера кадров в разделяемой памяти.
+    Кадры копируются в слоты фиксированного размера без кодирования,
+    в Redis публикуется только указатель на последний записанный слот.
+    """
+
+    def __init__(self, name=FRAME_BUS_NAME, slots=4, slot_size=0, redis_client=None,
+                 redis_key=REDIS_CAMERA_FRAME_BUS_KEY):
+        self.name = name
+        self.__slots = max(2, int(slots))
+        self.__min_slot_size = int(slot_size)
+        self.__redis_client = redis_client
+        self.__redis_key = redis_key
+        self.__shm = None
+        self.__layout = None
+        self.__generation = 0
+        self.__seq = 0
+        self.__lock = threading.Lock()
+
+    def __create(self, slot_size: int):
+        """Создаёт (или пересоздаёт) сегмент разделяемой памяти под заданный размер слота."""
+        self.__release()
+        slot_size = _align(max(slot_size, self.__min_slot_size))
+        size = _FrameBusLayout.segment_size(self.__slots, slot_size)
+        try:
+            self.__shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        except FileExistsError:
+            # Остался сегмент от предыдущего запуска сервиса
+            logger.warning(f"Сегмент шины кадров {self.name} уже существует, пересоздаём")
+            stale = _attach_shared_memory(self.name)
+            stale.close()
+            stale.unlink()
+            self.__shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+
+        # Поколение уникально и между перезапусками сервиса, чтобы читатели переподключились
+        self.__generation = max(self.__generation + 1, time.time_ns() // 1000)
+        self.__layout = _FrameBusLayout(self.__shm.buf, self.__slots, slot_size)
+        self.__layout.slot_headers["seq"] = 0
+        header = self.__layout.header
+        header["magic"] = FRAME_BUS_MAGIC
+        header["version"] = FRAME_BUS_VERSION
+        header["slots"] = self.__slots
+        header["slot_size"] = slot_size
+        header["generation"] = self.__generation
+        header["latest_slot"] = -1
+        header["latest_seq"] = 0
+        logger.info(
+            f"Создана шина кадров {self.name}: {self.__slots} слотов по {slot_size} байт, поколение {self.__generation}"
+        )
+
+    def __release(self):
+        """Освобождает текущий сегмент."""
+        if self.__shm is None:
+            return
+        self.__layout = None
+        try:
+            self.__shm.unlink()
+            self.__shm.close()
+        except Exception as e:
+            logger.error(f"Ошибка при освобождении шины кадров {self.name}: {e}")
+        self.__shm = None
+
+    def write(self, frame: np.ndarray, seq: int = None, host_timestamp: float = None, device_timestamp: int = 0,
+              offset_x: int = 0, offset_y: int = 0, binning: int = 1, trigger_timestamp: float = 0.0) -> int:
+        """
+        Записывает кадр с метками времени захвата и триггера и положением на сенсоре
+        в следующий слот и возвращает его порядковый номер.
+        """
+        pixel_format = pixel_format_from_array(frame)
+        with self.__lock:
+            if self.__layout is None or frame.nbytes > self.__layout.slot_size:
+                self.__create(frame.nbytes)
+            layout = self.__layout
+
+            self.__seq = self.__seq + 1 if seq is None else int(seq)
+            slot = self.__seq % layout.slots
+            slot_header = layout.slot_headers[slot]
+
+            # Помечаем слот как записываемый, чтобы читатели не взяли половину кадра
+            slot_header["seq"] = 0
+            target = layout.data[slot, :frame.nbytes].view(frame.dtype).reshape(frame.shape)
+            np.copyto(target, frame, casting="no")
+            slot_header["width"] = frame.shape[1]
+            slot_header["height"] = frame.shape[0]
+            slot_header["pixel_format"] = PIXEL_FORMAT_CODES[pixel_format]
+            slot_header["nbytes"] = frame.nbytes
+            slot_header["host_timestamp"] = time.time() if host_timestamp is None else host_timestamp
+            slot_header["device_timestamp"] = device_timestamp
+            slot_header["offset_x"] = offset_x
+            slot_header["offset_y"] = offset_y
+            slot_header["binning"] = binning
+            slot_header["trigger_timestamp"] = trigger_timestamp
+            slot_header["seq"] = self.__seq
+
+            layout.header["latest_slot"] = slot
+            layout.header["latest_seq"] = self.__seq
+
+            if self.__redis_client is not None:
+                pipe = self.__redis_client.pipeline(transaction=True)
+                pipe.set(
+                    self.__redis_key,
+                    json.dumps({
+                        "name": self.name,
+                        "generation": self.__generation,
+                        "slot": slot,
+                        "seq": self.__seq,
+                    }),
+                )
+                pipe.set(seq_key(self.__redis_key), self.__seq)
+                pipe.publish(notify_channel(self.__redis_key), self.__seq)
+                pipe.execute()
+            return self.__seq
+
+    def close(self):
+        """Закрывает и удаляет сегмент шины."""
+        with self.__lock:
+            self.__release()
+        if self.__redis_client is not None:
+            try:
+                self.__redis_client.delete(self.__redis_key, seq_key(self.__redis_key))
+            except Exception as e:
+                logger.error(f"Ошибка при удалении указателя шины кадров из Redis: {e}")
+
+
+class FrameBusReader:
+    """
+    Читатель кольцевого буфера кадров.
+    Возвращает NumPy-представления слотов без копирования; пока писатель
+    не сделал полный круг по кольцу, представление остаётся корректным.
+    """
+
+    def __init__(self, name=FRAME_BUS_NAME, redis_client=None, redis_key=REDIS_CAMERA_FRAME_BUS_KEY):
+        self.name = name
+        self.__redis_client = redis_client
+        self.__redis_key = redis_key
+        self.__shm = None
+        self.__layout = None
+        self.__generation = None
+        self.__checked = 0.0
+
+    def __attach(self, name: str):
+        """Подключается к сегменту шины и проверяет его заголовок."""
+        self.close()
+        shm = _attach_shared_memory(name)
+        header = np.ndarray((1,), dtype=_BUS_HEADER_DTYPE, buffer=shm.buf, offset=0)[0]
+        if int(header["magic"]) != FRAME_BUS_MAGIC or int(header["version"]) != FRAME_BUS_VERSION:
+            shm.close()
+            raise FrameBusException(f"Сегмент {name} не является шиной кадров версии {FRAME_BUS_VERSION}")
+        slots, slot_size = int(header["slots"]), int(header["slot_size"])
+        if shm.size < _FrameBusLayout.segment_size(slots, slot_size):
+            shm.close()
+            raise FrameBusException(f"Размер сегмента {name} не соответствует заголовку")
+        self.__shm = shm
+        self.name = name
+        self.__layout = _FrameBusLayout(shm.buf, slots, slot_size)
+        self.__generation = int(header["generation"])
+        logger.info(f"Подключено к шине кадров {name}: {slots} слотов, поколение {self.__generation}")
+
+    def __get_pointer(self):
+        """Возвращает (имя, поколение, слот, номер кадра) последнего кадра."""
+        if self.__redis_client is not None:
+            data = self.__redis_client.get(self.__redis_key)
+            if not data:
+                return None
+            pointer = json.loads(data)
+            return pointer["name"], pointer["generation"], pointer["slot"], pointer["seq"]
+
+        if self.__layout is None:
+            self.__attach(self.name)
+            self.__checked = time.monotonic()
+        elif time.monotonic() - self.__checked >= FRAME_BUS_REATTACH_INTERVAL:
+            self.__refresh()
+        header = self.__layout.header
+        slot = int(header["latest_slot"])
+        if slot < 0:
+            return None
+        return self.name, int(header["generation"]), slot, int(header["latest_seq"])
+
+    def __refresh(self):
+        """
+        Переподключается к сегменту с именем шины, если писатель пересоздал его (больший кадр,
+        перезапуск сервиса): заголовок прежнего сегмента после этого не обновляется.
+        """
+        self.__checked = time.monotonic()
+        try:
+            probe = _attach_shared_memory(self.name)
+        except FileNotFoundError:
+            # Писатель пересоздаёт сегмент, пока остаётся прежний
+            return
+        try:
+            header = np.frombuffer(bytes(probe.buf[:_BUS_HEADER_DTYPE.itemsize]), dtype=_BUS_HEADER_DTYPE)[0]
+        finally:
+            probe.close()
+        if int(header["generation"]) != self.__generation:
+            self.__attach(self.name)
+
+    def latest_seq(self):
+        """Возвращает номер последнего записанного кадра или None, если кадров нет."""
+        pointer = self.__get_pointer()
+        return pointer[3] if pointer is not None else None
+
+    def read_latest(self, copy: bool = False, after_seq: int = None):
+        """
+        Возвращает последний кадр шины или None, если кадров нет,
+        слот уже перезаписан или номер кадра не изменился с after_seq.
+        """
+        pointer = self.__get_pointer()
+        if pointer is None:
+            return None
+        name, generation, slot, seq = pointer
+        if after_seq is not None and seq == after_seq:
+            return None
+
+        if self.__layout is None or name != self.name or generation != self.__generation:
+            self.__attach(name)
+            if generation != self.__generation:
+                return None
+        layout = self.__layout
+
+        slot_header = layout.slot_headers[slot].copy()
+        if int(slot_header["seq"]) != seq:
+            return None
+        format_name, dtype, channels = PIXEL_FORMATS[int(slot_header["pixel_format"])]
+        height, width = int(slot_header["height"]), int(slot_header["width"])
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        image = layout.data[slot, :int(slot_header["nbytes"])].view(dtype).reshape(shape)
+        frame = FrameBusFrame(
+            image, seq, slot, generation, format_name,
+            float(slot_header["host_timestamp"]), int(slot_header["device_timestamp"]),
+            int(slot_header["offset_x"]), int(slot_header["offset_y"]), int(slot_header["binning"]),
+            float(slot_header["trigger_timestamp"]),
+        )
+
+        if copy:
+            frame.image = image.copy()
+            if not self.is_valid(frame):
+                return None
+        return frame
+
+    def is_valid(self, frame: FrameBusFrame) -> bool:
+        """Проверяет, что слот кадра не был перезаписан писателем."""
+        if self.__layout is None or frame.generation != self.__generation:
+            return False
+        return int(self.__layout.slot_headers[frame.slot]["seq"]) == frame.seq
+
+    def close(self):
+        """Отключается от сегмента шины."""
+        if self.__shm is None:
+            return
+        self.__layout = None
+        try:
+            self.__shm.close()
+        except BufferError:
+            # Снаружи ещё живут представления кадров, сегмент закроется сборщиком мусора
+            pass
+        self.__shm = None
+        self.__generation = None
+
+
+if __name__ == "__main__":
+    writer = FrameBusWriter(name="alku_frame_bus_test", slots=3)
+    reader = FrameBusReader(name="alku_frame_bus_test")
+    for i in range(5):
+        frame = np.full((480, 640), i, dtype=np.uint8)
+        seq = writer.write(frame)
+        latest = reader.read_latest()
+        logger.info(f"Записан кадр {seq}, прочитан {latest}, значение {latest.image[0, 0]}")
+    reader.close()
+    writer.close()
@@ -0,0 +1,194 @@
+# Системные импорты
+import os, sys, json, time, math, threading
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внутренние модули
+from common.Logger import config_logger
+from common.FrameMeta import seq_key, notify_channel
+
+logger = config_logger("FrameLease.py")
+
+REDIS_CAMERA_LEASES_KEY = os.getenv("REDIS_CAMERA_LEASES_KEY", "camera_leases")
+
+# Варианты публикации кадра камеры
+RENDITION_FRAME = "Frame"         # JPEG полного кадра в Redis
+RENDITION_FRAME_BUS = "FrameBus"  # Несжатый кадр в разделяемой памяти
+RENDITION_PREVIEW = "Preview"     # Уменьшенная копия для браузера
+RENDITIONS = (RENDITION_FRAME, RENDITION_FRAME_BUS, RENDITION_PREVIEW)
+
+
+class FrameLease:
+    """
+    Заявка потребителя на кадры камеры: нужные варианты публикации и частота.
+    Заявка действует до expires и продлевается потребителем.
+    """
+
+    def __init__(self, consumer, fps=0.0, renditions=(RENDITION_FRAME,), expires=0.0):
+        """
+        :param consumer: имя потребителя, например cv-service.
+        :param fps: нужная частота кадров, 0 - каждый кадр камеры.
+        :param renditions: варианты публикации из RENDITIONS.
+        :param expires: момент окончания заявки (секунды Unix).
+        """
+        self.consumer = consumer
+        self.fps = float(fps or 0)
+        self.renditions = [rendition for rendition in renditions if rendition in RENDITIONS]
+        self.expires = float(expires)
+
+    def is_expired(self, now=None) -> bool:
+        return (time.time() if now is None else now) >= self.expires
+
+    def to_dict(self) -> dict:
+        return {
+            "Consumer": self.consumer,
+            "FPS": self.fps,
+            "Renditions": self.renditions,
+            "Expires": self.expires,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            consumer=data.get("Consumer", ""),
+            fps=data.get("FPS", 0),
+            renditions=data.get("Renditions", [RENDITION_FRAME]),
+            expires=data.get("Expires", 0),
+        )
+
+    @classmethod
+    def from_json(cls, data):
+        return cls.from_dict(json.loads(data))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(consumer={self.consumer!r}, fps={self.fps}, renditions={self.renditions})"
+
+
+def register_lease(redis_client, consumer, fps=0.0, renditions=(RENDITION_FRAME,), ttl=5.0,
+                   key=REDIS_CAMERA_LEASES_KEY) -> FrameLease:
+    """
+    Регистрирует или продлевает заявку потребителя на ttl секунд и оповещает камеру.
+    Номер изменения заявок публикуется по правилам FrameMeta, поэтому камера ждёт изменений через FrameNotifier.
+    """
+    lease = FrameLease(consumer, fps, renditions, time.time() + ttl)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(key, consumer, lease.to_json())
+    pipe.incr(seq_key(key))
+    seq = pipe.execute()[1]
+    redis_client.publish(notify_channel(key), seq)
+    return lease
+
+
+def release_lease(redis_client, consumer, key=REDIS_CAMERA_LEASES_KEY):
+    """Снимает заявку потребителя и оповещает камеру."""
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hdel(key, consumer)
+    pipe.incr(seq_key(key))
+    seq = pipe.execute()[1]
+    redis_client.publish(notify_channel(key), seq)
+
+
+def get_active_leases(redis_client, key=REDIS_CAMERA_LEASES_KEY):
+    """Действующие заявки; истёкшие заявки (потребитель остановлен без снятия заявки) удаляются."""
+    now = time.time()
+    leases, expired = [], []
+    for consumer, data in redis_client.hgetall(key).items():
+        try:
+            lease = FrameLease.from_json(data)
+        except ValueError:
+            lease = None
+        if lease is None or lease.is_expired(now):
+            expired.append(consumer)
+        else:
+            leases.append(lease)
+    if expired:
+        redis_client.hdel(key, *expired)
+    return leases
+
+
+def lease_demand(leases, substitutes=None) -> dict:
+    """
+    Сводная потребность по заявкам: вариант публикации -> частота кадров.
+    Частота варианта - наибольшая из заявок, 0 (каждый кадр) перекрывает любую частоту.
+    :param substitutes: замена вариантов, которые издатель не публикует: вариант -> заменяющий вариант.
+    """
+    substitutes = substitutes or {}
+    demand = {}
+    for lease in leases:
+        fps = lease.fps if lease.fps > 0 else math.inf
+        for rendition in lease.renditions:
+            rendition = substitutes.get(rendition, rendition)
+            demand[rendition] = max(demand.get(rendition, 0.0), fps)
+    return {rendition: 0.0 if math.isinf(fps) else fps for rendition, fps in demand.items()}
+
+
+class FrameLeaseKeeper:
+    """
+    Заявка потребителя, продлеваемая в фоновом потоке.
+    Потребитель вызывает acquire() с нужной частотой и вариантами публикации,
+    когда кадры нужны, и release(), когда перестают быть нужны.
+    """
+
+    def __init__(self, redis_client, consumer, ttl=5.0, key=REDIS_CAMERA_LEASES_KEY):
+        self.consumer = consumer
+        self.__redis_client = redis_client
+        self.__ttl = float(ttl)
+        self.__key = key
+        self.__lease = None
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__renew_loop, daemon=True)
+        self.__thread.start()
+
+    @property
+    def active(self) -> bool:
+        return self.__lease is not None
+
+    def acquire(self, fps=0.0, renditions=(RENDITION_FRAME,)):
+        """Регистрирует заявку; повторный вызов с теми же параметрами ничего не отправляет."""
+        with self.__lock:
+            lease = self.__lease
+            if lease is not None and lease.fps == float(fps or 0) and lease.renditions == list(renditions):
+                return
+            # Заявка запоминается до отправки: при ошибке Redis её повторит поток продления
+            self.__lease = FrameLease(self.consumer, fps, renditions)
+            try:
+                self.__lease = register_lease(
+                    self.__redis_client, self.consumer, fps, renditions, self.__ttl, self.__key
+                )
+                logger.info(f"Заявка на кадры камеры {self.__key}: {self.__lease}")
+            except Exception as e:
+                logger.warning(f"Не удалось зарегистрировать заявку {self.consumer} на кадры камеры: {e}")
+
+    def release(self):
+        """Снимает заявку: камера может снизить частоту захвата."""
+        with self.__lock:
+            if self.__lease is None:
+                return
+            self.__lease = None
+            try:
+                release_lease(self.__redis_client, self.consumer, self.__key)
+                logger.info(f"Заявка {self.consumer} на кадры камеры {self.__key} снята")
+            except Exception as e:
+                logger.warning(f"Не удалось снять заявку {self.consumer} на кадры камеры: {e}")
+
+    def __renew_loop(self):
+        """Продление заявки на трети срока действия, чтобы одна неудачная попытка не прерывала заявку."""
+        while not self.__stop.wait(self.__ttl / 3):
+            with self.__lock:
+                lease = self.__lease
+                if lease is None:
+                    continue
+                try:
+                    self.__lease = register_lease(
+                        self.__redis_client, self.consumer, lease.fps, lease.renditions, self.__ttl, self.__key
+                    )
+                except Exception as e:
+                    logger.warning(f"Не удалось продлить заявку {self.consumer} на кадры камеры: {e}")
+
+    def close(self):
+        self.__stop.set()
+        self.release()
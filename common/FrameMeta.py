@@ -0,0 +1,120 @@
+# Системные импорты
+import os, sys, json, time
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внутренние модули
+from common.Logger import config_logger
+
+logger = config_logger("FrameMeta.py")
+
+
+class FrameMeta:
+    """Метаданные опубликованного кадра: порядковый номер и метки времени захвата."""
+
+    def __init__(self, seq, host_timestamp=None, device_timestamp=0, width=0, height=0, pixel_format="",
+                 offset_x=0, offset_y=0, binning=1, trigger_timestamp=0.0):
+        self.seq = int(seq)
+        self.host_timestamp = time.time() if host_timestamp is None else float(host_timestamp)
+        self.device_timestamp = int(device_timestamp)
+        self.width = int(width)
+        self.height = int(height)
+        self.pixel_format = pixel_format
+        # Положение кадра на сенсоре: пиксель (u, v) кадра - это пиксель сенсора (offset + u * binning)
+        self.offset_x = int(offset_x)
+        self.offset_y = int(offset_y)
+        self.binning = int(binning)
+        # Момент фронта датчика или входа камеры, запустившего захват; 0 - кадр без внешнего триггера
+        self.trigger_timestamp = float(trigger_timestamp or 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "Seq": self.seq,
+            "HostTimestamp": self.host_timestamp,
+            "DeviceTimestamp": self.device_timestamp,
+            "Width": self.width,
+            "Height": self.height,
+            "PixelFormat": self.pixel_format,
+            "OffsetX": self.offset_x,
+            "OffsetY": self.offset_y,
+            "Binning": self.binning,
+            "TriggerTimestamp": self.trigger_timestamp,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            seq=data.get("Seq", 0),
+            host_timestamp=data.get("HostTimestamp", 0),
+            device_timestamp=data.get("DeviceTimestamp", 0),
+            width=data.get("Width", 0),
+            height=data.get("Height", 0),
+            pixel_format=data.get("PixelFormat", ""),
+            offset_x=data.get("OffsetX", 0),
+            offset_y=data.get("OffsetY", 0),
+            binning=data.get("Binning", 1),
+            trigger_timestamp=data.get("TriggerTimestamp", 0),
+        )
+
+    @classmethod
+    def from_json(cls, data):
+        return cls.from_dict(json.loads(data))
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}("
+            f"seq={self.seq}, host_ts={self.host_timestamp:.3f}, dev_ts={self.device_timestamp}, "
+            f"size={self.width}x{self.height}, format={self.pixel_format!r}, "
+            f"offset=({self.offset_x}, {self.offset_y}), binning={self.binning}, "
+            f"trigger_ts={self.trigger_timestamp:.3f})"
+        )
+
+
+def meta_key(frame_key: str) -> str:
+    """Ключ Redis с метаданными кадра."""
+    return f"{frame_key}:meta"
+
+
+def seq_key(frame_key: str) -> str:
+    """Ключ Redis с номером последнего кадра (для дешёвой проверки новизны)."""
+    return f"{frame_key}:seq"
+
+
+def notify_channel(frame_key: str) -> str:
+    """Канал Redis pub/sub с номерами новых кадров."""
+    return f"{frame_key}:notify"
+
+
+def publish_frame(redis_client, frame_key: str, data: bytes, meta: FrameMeta):
+    """Атомарно публикует кадр, его метаданные и номер в Redis и оповещает подписчиков."""
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.set(frame_key, data)
+    pipe.set(meta_key(frame_key), meta.to_json())
+    pipe.set(seq_key(frame_key), meta.seq)
+    pipe.publish(notify_channel(frame_key), meta.seq)
+    pipe.execute()
+
+
+def get_frame_seq(redis_client, frame_key: str):
+    """Возвращает номер последнего опубликованного кадра или None, если издатель его не публикует."""
+    value = redis_client.get(seq_key(frame_key))
+    return int(value) if value is not None else None
+
+
+def is_new_frame(seq, last_seq) -> bool:
+    """Проверяет, изменился ли кадр с номера last_seq. Кадры без номера считаются новыми."""
+    return seq is None or last_seq is None or seq != last_seq
+
+
+def get_frame(redis_client, frame_key: str, after_seq=None):
+    """
+    Возвращает (данные, метаданные) последнего кадра.
+    Если номер кадра не изменился с after_seq, возвращает (None, None) без чтения самого кадра.
+    """
+    if after_seq is not None and not is_new_frame(get_frame_seq(redis_client, frame_key), after_seq):
+        return None, None
+    data, meta = redis_client.mget(frame_key, meta_key(frame_key))
+    return data, FrameMeta.from_json(meta) if meta else None
@@ -0,0 +1,141 @@
+# Системные импорты
+import os, sys, time, threading
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внутренние модули
+from common.Logger import config_logger
+from common.FrameMeta import get_frame_seq, is_new_frame, notify_channel
+
+logger = config_logger("FrameNotifier.py")
+
+
+def notify_frame(redis_client, frame_key: str, seq: int):
+    """Оповещает подписчиков о публикации кадра с номером seq."""
+    redis_client.publish(notify_channel(frame_key), seq)
+
+
+class FrameNotifier:
+    """
+    Ожидание новых кадров без опроса с фиксированным интервалом.
+    Номера кадров приходят через Redis pub/sub в фоновом потоке; издатель
+    в том же процессе может оповещать напрямую через notify(). Пока подписка
+    недоступна, ожидание переходит на частый опрос номера кадра в Redis.
+    """
+
+    def __init__(self, redis_client=None, frame_key=None, poll_interval=0.01):
+        """
+        :param redis_client: клиент Redis; без него работают только локальные оповещения.
+        :param frame_key: ключ кадра, номера которого отслеживаются.
+        :param poll_interval: интервал опроса, пока подписка Redis недоступна, сек.
+        """
+        self.frame_key = frame_key
+        self.__redis_client = redis_client
+        self.__poll_interval = poll_interval
+        self.__condition = threading.Condition()
+        self.__seq = None
+        self.__subscribed = False
+        self.__stop = threading.Event()
+        self.__thread = None
+        if redis_client is not None and frame_key is not None:
+            self.__thread = threading.Thread(target=self.__listen, daemon=True)
+            self.__thread.start()
+
+    @property
+    def seq(self):
+        """Номер последнего известного кадра."""
+        return self.__seq
+
+    def notify(self, seq: int):
+        """Сообщает ожидающим потокам о новом кадре."""
+        with self.__condition:
+            self.__seq = int(seq)
+            self.__condition.notify_all()
+
+    def __listen(self):
+        """Фоновый поток подписки на оповещения Redis с переподключением."""
+        while not self.__stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.__redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(notify_channel(self.frame_key))
+                self.__subscribed = True
+                logger.debug(f"Подписка на оповещения о кадрах {self.frame_key}")
+                # Кадр мог быть опубликован до подписки
+                seq = get_frame_seq(self.__redis_client, self.frame_key)
+                if seq is not None:
+                    self.notify(seq)
+                while not self.__stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None and message["type"] == "message":
+                        self.notify(int(message["data"]))
+            except Exception as e:
+                if self.__stop.is_set():
+                    break
+                logger.warning(f"Подписка на оповещения о кадрах {self.frame_key} прервана: {e}")
+                self.__subscribed = False
+                self.__stop.wait(1)
+            finally:
+                self.__subscribed = False
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    def __poll(self):
+        """Читает номер кадра из Redis, пока подписка недоступна."""
+        try:
+            seq = get_frame_seq(self.__redis_client, self.frame_key)
+        except Exception as e:
+            logger.debug(f"Не удалось прочитать номер кадра {self.frame_key}: {e}")
+            return
+        if seq is not None and is_new_frame(seq, self.__seq):
+            self.notify(seq)
+
+    def wait_for_frame(self, after_seq=None, timeout=None):
+        """
+        Ждёт кадр с номером, отличным от after_seq.
+        Возвращает номер нового кадра или None, если за timeout секунд кадров не было.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            polling = self.__redis_client is not None and self.frame_key is not None and not self.__subscribed
+            if polling:
+                self.__poll()
+            with self.__condition:
+                if self.__seq is not None and (after_seq is None or is_new_frame(self.__seq, after_seq)):
+                    return self.__seq
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                if polling:
+                    remaining = self.__poll_interval if remaining is None else min(remaining, self.__poll_interval)
+                self.__condition.wait(remaining)
+
+    def close(self):
+        """Остановка фонового потока подписки."""
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout=2)
+            self.__thread = None
+        with self.__condition:
+            self.__condition.notify_all()
+
+
+_notifiers = {}
+_notifiers_lock = threading.Lock()
+
+
+def get_frame_notifier(redis_client, frame_key: str) -> FrameNotifier:
+    """Возвращает общий для процесса FrameNotifier для ключа кадра."""
+    with _notifiers_lock:
+        notifier = _notifiers.get(frame_key)
+        if notifier is None:
+            notifier = _notifiers[frame_key] = FrameNotifier(redis_client, frame_key)
+        return notifier
+
+
+def wait_for_frame(redis_client, frame_key: str, after_seq=None, timeout=None):
+    """Ждёт новый кадр по ключу frame_key, см. FrameNotifier.wait_for_frame."""
+    return get_frame_notifier(redis_client, frame_key).wait_for_frame(after_seq, timeout)
@@ -0,0 +1,103 @@
+# Системные импорты
+import os, sys, json, time
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внутренние модули
+from common.Logger import config_logger
+from common.FrameMeta import seq_key, notify_channel
+
+logger = config_logger("IOEvents.py")
+
+REDIS_IO_EVENT_KEY = os.getenv("REDIS_IO_EVENT_KEY", "io_event")
+
+# Фронты входов
+EDGE_RISING = "Rising"    # 0 -> 1
+EDGE_FALLING = "Falling"  # 1 -> 0
+EDGE_BOTH = "Both"        # Любое изменение
+IO_EDGES = (EDGE_RISING, EDGE_FALLING, EDGE_BOTH)
+
+
+class IOEvent:
+    """Изменение входа io-service: переменная, новое значение, фронт и момент обнаружения."""
+
+    def __init__(self, variable, value, timestamp=None, seq=0):
+        self.variable = variable
+        self.value = int(value)
+        # Момент чтения регистра, в котором обнаружено изменение (секунды Unix)
+        self.timestamp = time.time() if timestamp is None else float(timestamp)
+        self.seq = int(seq)
+
+    @property
+    def edge(self):
+        return EDGE_RISING if self.value else EDGE_FALLING
+
+    def matches(self, edge) -> bool:
+        """Подходит ли событие под фронт edge."""
+        return edge == EDGE_BOTH or edge == self.edge
+
+    def to_dict(self) -> dict:
+        return {
+            "Variable": self.variable,
+            "Value": self.value,
+            "Edge": self.edge,
+            "Timestamp": self.timestamp,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(
+            variable=data.get("Variable", ""),
+            value=data.get("Value", 0),
+            timestamp=data.get("Timestamp", 0),
+        )
+
+    @classmethod
+    def from_json(cls, data):
+        return cls.from_dict(json.loads(data))
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}("
+            f"seq={self.seq}, variable={self.variable!r}, edge={self.edge}, ts={self.timestamp:.3f})"
+        )
+
+
+def io_event_key(variable: str, edge: str = EDGE_BOTH) -> str:
+    """
+    Ключ Redis с последним событием переменной (EDGE_BOTH) или с последним фронтом edge.
+    Отдельные ключи фронтов не дают короткому импульсу затереть передний фронт задним.
+    Номер события и оповещения публикуются по правилам FrameMeta, поэтому ждать события
+    можно через FrameNotifier.
+    """
+    key = f"{REDIS_IO_EVENT_KEY}:{variable}"
+    return key if edge == EDGE_BOTH else f"{key}:{edge}"
+
+
+def publish_io_event(redis_client, event: IOEvent):
+    """Атомарно публикует событие в ключ переменной и ключ его фронта и оповещает подписчиков."""
+    keys = (io_event_key(event.variable), io_event_key(event.variable, event.edge))
+    pipe = redis_client.pipeline(transaction=True)
+    for key in keys:
+        pipe.set(key, event.to_json())
+        pipe.incr(seq_key(key))
+    result = pipe.execute()
+    event.seq = result[1]
+    pipe = redis_client.pipeline(transaction=False)
+    for key, seq in zip(keys, result[1::2]):
+        pipe.publish(notify_channel(key), seq)
+    pipe.execute()
+
+
+def get_io_event(redis_client, variable: str, edge: str = EDGE_BOTH):
+    """Последнее событие переменной (или её фронта edge) с номером или None."""
+    key = io_event_key(variable, edge)
+    data, seq = redis_client.mget(key, seq_key(key))
+    if not data:
+        return None
+    event = IOEvent.from_json(data)
+    event.seq = int(seq or 0)
+    return event
@@ -0,0 +1,151 @@
+# Системные импорты
+import os, sys, time, threading
+from collections import deque
+from contextlib import contextmanager
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внешние модули
+import numpy as np
+
+# Внутренние модули
+from common.Logger import config_logger
+
+logger = config_logger("Metrics.py")
+
+# Границы корзин гистограммы задержек, мс
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """
+    Гистограмма задержек стадии: накопленные корзины с момента запуска
+    и скользящее окно последних значений для среднего и процентилей.
+    """
+
+    def __init__(self, window=1000):
+        self.__buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.__window = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        ms = seconds * 1000.0
+        self.__window.append(ms)
+        self.count += 1
+        self.total += ms
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.__buckets[index] += 1
+                return
+        self.__buckets[-1] += 1
+
+    def to_dict(self):
+        window = np.fromiter(self.__window, dtype=np.float64, count=len(self.__window))
+        buckets = {f"<={bound}": count for bound, count in zip(LATENCY_BUCKETS_MS, self.__buckets)}
+        buckets["+Inf"] = self.__buckets[-1]
+        result = {"Count": self.count, "TotalMs": round(self.total, 3), "Buckets": buckets}
+        if window.size:
+            p50, p95, p99 = np.percentile(window, (50, 95, 99))
+            result.update({
+                "MeanMs": round(float(window.mean()), 3),
+                "MinMs": round(float(window.min()), 3),
+                "MaxMs": round(float(window.max()), 3),
+                "P50Ms": round(float(p50), 3),
+                "P95Ms": round(float(p95), 3),
+                "P99Ms": round(float(p99), 3),
+            })
+        return result
+
+
+class Metrics:
+    """
+    Счётчики производительности: накопленные счётчики событий, частоты за
+    скользящее окно (например, кадров в секунду), гистограммы задержек стадий
+    и текущие значения. Потокобезопасны, обновление стоит несколько микросекунд.
+    """
+
+    def __init__(self, rate_window=5.0, latency_window=1000):
+        """
+        :param rate_window: окно расчёта частот, сек.
+        :param latency_window: количество последних значений для процентилей задержек.
+        """
+        self.__rate_window = rate_window
+        self.__latency_window = latency_window
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.__lock:
+            self.__started = time.time()
+            self.__counters = {}
+            self.__events = {}
+            self.__stages = {}
+            self.__gauges = {}
+
+    def count(self, name, value=1):
+        """Увеличение накопленного счётчика."""
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def mark(self, name):
+        """Событие для расчёта частоты (и накопленного счётчика с тем же именем)."""
+        now = time.monotonic()
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + 1
+            events = self.__events.get(name)
+            if events is None:
+                events = self.__events[name] = deque(maxlen=100000)
+            events.append(now)
+
+    def observe(self, stage, seconds):
+        """Длительность стадии, сек."""
+        with self.__lock:
+            histogram = self.__stages.get(stage)
+            if histogram is None:
+                histogram = self.__stages[stage] = LatencyHistogram(self.__latency_window)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """Измерение длительности блока кода как стадии stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def set_gauge(self, name, value):
+        """Текущее значение величины (размер очереди, отброшенные кадры и т.п.)."""
+        with self.__lock:
+            self.__gauges[name] = value
+
+    def __rate(self, events, now):
+        while events and events[0] < now - self.__rate_window:
+            events.popleft()
+        if len(events) < 2:
+            return 0.0
+        # Частота по интервалу между первым и последним событием окна, без занижения в начале работы
+        span = max(events[-1] - events[0], 1e-9)
+        return round((len(events) - 1) / span, 3)
+
+    def snapshot(self):
+        """Все метрики в виде словаря для эндпоинта /metrics."""
+        now = time.monotonic()
+        with self.__lock:
+            return {
+                "UptimeSec": round(time.time() - self.__started, 3),
+                "Counters": dict(self.__counters),
+                "Rates": {name: self.__rate(events, now) for name, events in self.__events.items()},
+                "Stages": {stage: histogram.to_dict() for stage, histogram in self.__stages.items()},
+                "Gauges": dict(self.__gauges),
+            }
+
+
+if __name__ == "__main__":
+    metrics = Metrics()
+    for i in range(1000):
+        with metrics.timer("sleep"):
+            time.sleep(0.001)
+        metrics.mark("frames")
+    logger.info(f"Метрики: {metrics.snapshot()}")
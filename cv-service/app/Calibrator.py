@@ -26,9 +26,13 @@ class Calibrator:
 
     def __init__(self):
         logger.debug("Инициализация калибратора")
+        # Преобразование кадра в рабочую область и карты remap для последнего положения кадра на сенсоре
+        self.__transform = None
+        self.__maps = None
         self.__load_calibration_data()
 
     def __load_calibration_data(self):
+        self.__reset_transform()
         self.Calibrated = Config.get("CalibrationData.Calibrated", "null")
         self.Calibrated = json.loads(Config.get(
             "CalibrationData.Calibrated", "null"))
@@ -72,7 +76,12 @@ class Calibrator:
         Config.set("CalibrationData.ScaleY", float(self.ScaleY) if self.ScaleY is not None else None)
         Config.save()
 
+    def __reset_transform(self):
+        self.__transform = None
+        self.__maps = None
+
     def uncalibrate(self):
+        self.__reset_transform()
         self.Calibrated = False
         self.Theta = None
         self.Origin = None
@@ -82,7 +91,83 @@ class Calibrator:
         self.ScaleY = None
         self.__save_calibration_data()
 
-    def calibrate(self, markers):
+    def work_area_bounds(self, margin=0):
+        """
+        Границы (left, top, right, bottom) области сенсора, нужной для обработки
+        калиброванного кадра: повёрнутая рабочая область и прямоугольник, который
+        вырезается из кадра после поворота вокруг Origin. None, если калибровки нет.
+        """
+        if not self.Calibrated or self.Origin is None or self.Size is None or self.Theta is None:
+            return None
+        origin = np.asarray(self.Origin, dtype=np.float64)
+        width, height = self.Size
+        axis_x = width * np.array([np.cos(self.Theta), np.sin(self.Theta)])
+        axis_y = height * np.array([-np.sin(self.Theta), np.cos(self.Theta)])
+        corners = np.array([
+            origin, origin + axis_x, origin + axis_y, origin + axis_x + axis_y,
+            origin + (width, 0), origin + (0, height), origin + (width, height),
+        ])
+        left, top = corners.min(axis=0) - margin
+        right, bottom = corners.max(axis=0) + margin
+        return (max(0.0, left), max(0.0, top), right, bottom)
+
+    def frame_transform(self, frame_size, offset=(0, 0), binning=1):
+        """
+        Преобразование кадра в рабочую область за один проход warpAffine: поворот вокруг Origin
+        со сдвигом на начало рабочей области, поэтому вычисляются только пиксели результата.
+        Считается один раз для калибровки и положения кадра на сенсоре.
+        :param frame_size: (ширина, высота) кадра.
+        :param offset: смещение кадра на сенсоре (область интереса камеры), пиксели сенсора.
+        :param binning: объединение пикселей кадра.
+        :return: (M, (width, height)) - матрица 2x3 и размер результата; None, если калибровки нет.
+        """
+        if not self.Calibrated or self.Origin is None or self.Size is None or self.Theta is None:
+            return None
+        key = (tuple(frame_size), tuple(offset), binning)
+        transform = self.__transform
+        if transform is not None and transform[0] == key:
+            return transform[1]
+        w, h = frame_size
+        # Калибровка в пикселях сенсора переводится в координаты кадра области интереса
+        center = (self.Origin - offset) / binning
+        M = cv2.getRotationMatrix2D(tuple(map(float, center)), float(np.degrees(self.Theta)), 1.0)
+        x, y = map(int, center)
+        width, height = map(int, self.Size / binning)
+        # Рабочая область, как и прежде, не выходит за границы кадра
+        M[:, 2] -= (x, y)
+        size = (max(1, min(width, w - x)), max(1, min(height, h - y)))
+        self.__transform = (key, (M, size))
+        self.__maps = None
+        logger.debug(f"Преобразование кадра {w}x{h} в рабочую область {size[0]}x{size[1]} пересчитано")
+        return M, size
+
+    def frame_maps(self, frame_size, offset=(0, 0), binning=1):
+        """
+        Карты cv2.remap для того же преобразования: координаты исходного кадра для каждого пикселя
+        рабочей области в формате с фиксированной точкой (CV_16SC2). Строятся один раз, затем
+        кадр преобразуется без пересчёта координат. None, если калибровки нет.
+        """
+        transform = self.frame_transform(frame_size, offset, binning)
+        if transform is None:
+            return None
+        maps = self.__maps
+        if maps is not None and maps[0] is self.__transform:
+            return maps[1]
+        M, (width, height) = transform
+        inverse = cv2.invertAffineTransform(M)
+        xs, ys = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+        map_x = inverse[0, 0] * xs + inverse[0, 1] * ys + inverse[0, 2]
+        map_y = inverse[1, 0] * xs + inverse[1, 1] * ys + inverse[1, 2]
+        result = cv2.convertMaps(map_x.astype(np.float32), map_y.astype(np.float32), cv2.CV_16SC2)
+        self.__maps = (self.__transform, result)
+        return result
+
+    def calibrate(self, markers, offset=(0, 0), binning=1):
+        """
+        Калибровка по маркерам ArUco.
+        :param offset: смещение кадра на сенсоре (область интереса камеры), пиксели сенсора.
+        :param binning: объединение пикселей кадра; результаты калибровки хранятся в пикселях сенсора.
+        """
 
         if markers and len(markers) < 4:
             logger.warning(
@@ -112,6 +197,8 @@ class Calibrator:
                     markers[marker0y_id].corners[marker0y_point],
                 ]
             )
+            # Координаты кадра переводятся в пиксели сенсора, чтобы калибровка не зависела от области интереса
+            pp = pp * binning + np.float32(offset)
 
             self.Size = np.array(
                 [
@@ -157,6 +244,7 @@ class Calibrator:
 
             self.RST = RST
             self.Calibrated = True
+            self.__reset_transform()
             self.__save_calibration_data()
 
             logger.info(
@@ -179,16 +267,30 @@ class Calibrator:
 if __name__ == "__main__":
     from Aruco import Aruco
 
+    from common.FrameMeta import get_frame
+    from common.FrameNotifier import FrameNotifier
+
     aruco = Aruco()
     cv2.namedWindow("Frame", cv2.WINDOW_FREERATIO)
     calibrator = Calibrator()
+    notifier = FrameNotifier(redis_client, REDIS_CAMERA_FRAME_KEY)
+    last_seq = None
+    frame = None
 
     while True:
 
-        frame_data = redis_client.get(REDIS_CAMERA_FRAME_KEY)
-        if frame_data:
-            np_arr = np.frombuffer(frame_data, np.uint8)
-            img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        # Короткое ожидание, чтобы окно продолжало обрабатывать нажатия клавиш
+        seq = notifier.wait_for_frame(last_seq, timeout=0.05)
+        if seq is not None or frame is None:
+            frame_data, meta = get_frame(redis_client, REDIS_CAMERA_FRAME_KEY)
+            if frame_data:
+                np_arr = np.frombuffer(frame_data, np.uint8)
+                frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+                last_seq = meta.seq if meta else seq
+        if frame is None:
+            cv2.waitKey(1)
+            continue
+        img = frame.copy()
 
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         markers = aruco.detectMarkers(gray)
@@ -0,0 +1,201 @@
+# Внешние модули
+import numpy as np
+
+
+class DetectionBatch:
+    """
+    Объекты одного кадра в виде непрерывных массивов NumPy (структура массивов) вместо объекта на деталь:
+    масштабирование, отбор и постобработка выполняются над всеми объектами сразу.
+    Невычисленные точка и угол забора хранятся как NaN.
+    Для совместимости с кодом, написанным для YoloData, индексация и итерация дают
+    лёгкие представления строк (DetectionRow) с теми же полями.
+    """
+
+    __slots__ = ("model_name", "names", "xyxy", "conf", "class_id", "keypoints", "pick_point", "pick_angle")
+
+    def __init__(self, model_name, names, xyxy, conf, class_id, keypoints=None, pick_point=None, pick_angle=None):
+        """
+        :param names: словарь номер класса -> имя.
+        :param xyxy: (N, 4) - рамки объектов.
+        :param conf: (N,) - уверенность.
+        :param class_id: (N,) - номера классов.
+        :param keypoints: (N, K, 3) - ключевые точки (x, y, видимость) или None.
+        :param pick_point: (N, 2) - точки забора, None - не вычислены.
+        :param pick_angle: (N,) - углы забора, None - не вычислены.
+        """
+        count = len(conf)
+        self.model_name = model_name
+        self.names = names
+        self.xyxy = np.asarray(xyxy, dtype=np.float64).reshape(count, 4)
+        self.conf = np.asarray(conf, dtype=np.float64)
+        self.class_id = np.asarray(class_id, dtype=np.int64)
+        self.keypoints = np.asarray(keypoints, dtype=np.float64) if keypoints is not None else None
+        self.pick_point = (
+            np.asarray(pick_point, dtype=np.float64).reshape(count, 2) if pick_point is not None
+            else np.full((count, 2), np.nan)
+        )
+        self.pick_angle = (
+            np.asarray(pick_angle, dtype=np.float64).reshape(count) if pick_angle is not None
+            else np.full(count, np.nan)
+        )
+
+    @classmethod
+    def from_yolo_data(cls, model_name, names, yolo_data):
+        """Набор из списка YoloData (результат постобработки, написанной для отдельных объектов)."""
+        def value(data, name, default):
+            item = getattr(data, name)
+            return default if item is None else item
+
+        return cls(
+            model_name, names,
+            [data.xyxy for data in yolo_data],
+            [data.conf for data in yolo_data],
+            [data.class_id for data in yolo_data],
+            [data.keypoints for data in yolo_data] if yolo_data and all(data.keypoints is not None for data in yolo_data) else None,
+            [value(data, "pick_point", (np.nan, np.nan)) for data in yolo_data],
+            [value(data, "pick_angle", np.nan) for data in yolo_data],
+        )
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __iter__(self):
+        return (DetectionRow(self, index) for index in range(len(self)))
+
+    def __getitem__(self, index):
+        """Номер - представление строки; срез, маска или список номеров - новый набор."""
+        if isinstance(index, (int, np.integer)):
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError(f"Номер объекта {index} вне набора из {len(self)}")
+            return DetectionRow(self, int(index))
+        return self.select(index)
+
+    def select(self, selection):
+        """Набор из отобранных объектов: маска, срез или номера."""
+        return DetectionBatch(
+            self.model_name, self.names,
+            self.xyxy[selection], self.conf[selection], self.class_id[selection],
+            self.keypoints[selection] if self.keypoints is not None else None,
+            self.pick_point[selection], self.pick_angle[selection],
+        )
+
+    def scaled(self, scale_x, scale_y):
+        """Новый набор с координатами, умноженными на масштабы по осям (рамки, точки забора, ключевые точки)."""
+        scale = np.array([scale_x, scale_y])
+        keypoints = None
+        if self.keypoints is not None:
+            keypoints = self.keypoints.copy()
+            keypoints[..., :2] *= scale
+        return DetectionBatch(
+            self.model_name, self.names,
+            self.xyxy * np.tile(scale, 2), self.conf, self.class_id, keypoints,
+            self.pick_point * scale, self.pick_angle,
+        )
+
+    def centers(self):
+        """Центры рамок (N, 2)."""
+        return (self.xyxy[:, :2] + self.xyxy[:, 2:]) / 2
+
+    def to_list(self):
+        """Список словарей с полями YoloData для ответа API."""
+        xyxy = self.xyxy.tolist()
+        conf = self.conf.tolist()
+        class_id = self.class_id.tolist()
+        keypoints = self.keypoints.tolist() if self.keypoints is not None else [None] * len(self)
+        pick_set = ~np.isnan(self.pick_point).any(axis=1)
+        pick_point = self.pick_point.tolist()
+        pick_angle = self.pick_angle.tolist()
+        return [
+            {
+                "model_name": self.model_name,
+                "xyxy": xyxy[i],
+                "conf": conf[i],
+                "class_id": float(class_id[i]),
+                "class_name": self.names[class_id[i]],
+                "keypoints": keypoints[i],
+                "pick_point": pick_point[i] if pick_set[i] else None,
+                "pick_angle": None if np.isnan(pick_angle[i]) else pick_angle[i],
+            }
+            for i in range(len(self))
+        ]
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(Модель={self.model_name!r}, объектов={len(self)})"
+
+
+class DetectionRow:
+    """Представление одного объекта DetectionBatch с полями YoloData; изменения записываются в массивы набора."""
+
+    __slots__ = ("batch", "index")
+
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    @property
+    def model_name(self):
+        return self.batch.model_name
+
+    @property
+    def xyxy(self):
+        return self.batch.xyxy[self.index].tolist()
+
+    @xyxy.setter
+    def xyxy(self, value):
+        self.batch.xyxy[self.index] = value
+
+    @property
+    def conf(self):
+        return float(self.batch.conf[self.index])
+
+    @property
+    def class_id(self):
+        return float(self.batch.class_id[self.index])
+
+    @property
+    def class_name(self):
+        return self.batch.names[int(self.batch.class_id[self.index])]
+
+    @property
+    def keypoints(self):
+        keypoints = self.batch.keypoints
+        return keypoints[self.index].tolist() if keypoints is not None else None
+
+    @property
+    def pick_point(self):
+        point = self.batch.pick_point[self.index]
+        return None if np.isnan(point).any() else tuple(point.tolist())
+
+    @pick_point.setter
+    def pick_point(self, value):
+        self.batch.pick_point[self.index] = (np.nan, np.nan) if value is None else value
+
+    @property
+    def pick_angle(self):
+        angle = self.batch.pick_angle[self.index]
+        return None if np.isnan(angle) else float(angle)
+
+    @pick_angle.setter
+    def pick_angle(self, value):
+        self.batch.pick_angle[self.index] = np.nan if value is None else value
+
+    def keys(self):
+        """Поля объекта: dict(row) и сериализация ответа API как у YoloData."""
+        return ("model_name", "xyxy", "conf", "class_id", "class_name", "keypoints", "pick_point", "pick_angle")
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}("
+            f"Модель={self.model_name!r}, "
+            f"XYXY={self.xyxy!r}, "
+            f"Вероятность={self.conf:.2f}, "
+            f"Класс={self.class_id}, "
+            f"Название класса={self.class_name!r}, "
+            f"Точка забора={self.pick_point!r}, "
+            f"Угол забора={self.pick_angle!r})"
+        )
@@ -1,5 +1,5 @@
 # Системные импорты
-import os, sys, json, threading, time
+import os, sys, json, threading, time, copy
 import importlib.util
 from pathlib import Path
 # Добавляем директорию проекта в sys.path
@@ -9,7 +9,6 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import numpy as np
 import cv2
 import torch
-from ultralytics import YOLO
 
 # Внутренние модули
 from common.Config import Config
@@ -17,7 +16,13 @@ from common.Logger import config_logger
 from common.Redis import get_redis_client
 from common.Utils import is_docker
 from YoloModel import YoloModel
-from YoloData import YoloData
+from DetectionBatch import DetectionBatch
+from InferenceBackend import create_backend
+from ModelCache import ModelCache, ModelBundle
+from ModelLoader import (
+    ModelLoader, ACTION_CHANGE, ACTION_ADD, ACTION_PRELOAD,
+    JOB_VALIDATING, JOB_LOADING, JOB_WARMING_UP, JOB_BENCHMARKING,
+)
 
 logger = config_logger("cv-service/Detector.py")
 redis_client = get_redis_client()
@@ -41,7 +46,15 @@ class Detector:
         logger.info(f"Используемое устройство: {self.__device}")
 
         self.__load_models_list()
-        self.__yolo, self.__modelfun = self.__load_default_model()
+        # Загруженные и прогретые модели: смена модели из кэша не читает файл и не прогревает модель
+        self.__cache = ModelCache(Config.get("ModelCache.MemoryBudgetMB", 2048) * 2**20)
+        # Загрузка по запросам API выполняется в фоне, обработка кадров продолжается на прежней модели
+        self.__loader = ModelLoader()
+        # Активный набор (модель, постобработка, конфигурация) - одна ссылка, которую кадр читает один раз
+        self.__bundle = self.__load_default_model()
+        self.__requested_model = self.__current_model
+        if Config.get("ModelCache.Preload", False):
+            self.__preload_models()
         logger.debug("Обработчик кадров успешно инициализирован")
 
     def __load_models_list(self):
@@ -59,6 +72,11 @@ class Detector:
             confidence_threshold = model_config.get("ConfidenceThreshold", 0.5)
             model_type = model_config.get("ModelType", "yolo-pose")
             processor_file = model_config.get("ModelProcessor", None)
+            backend = model_config.get("Backend", "torch")
+            threads = model_config.get("Threads", 0)
+            precision = model_config.get("Precision", "fp32")
+            class_thresholds = model_config.get("ClassThresholds", {})
+            classes = model_config.get("Classes", [])
 
             if not all([model_name, model_file_name, confidence_threshold, model_type]):
                 logger.error(f"Некорректная конфигурация модели: {model}")
@@ -70,6 +88,11 @@ class Detector:
                 confidence_threshold=confidence_threshold,
                 model_type=model_type,
                 processor_file=processor_file,
+                backend=backend,
+                threads=threads,
+                precision=precision,
+                class_thresholds=class_thresholds,
+                classes=classes,
             )
             self.__models[model] = yolo_model
 
@@ -96,28 +119,99 @@ class Detector:
     def __load_default_model(self):
         """Загрузка модели по умолчанию из конфигурации."""
         model_name = Config.get("Process.LastModel", "LongDetails")
-        return self.__load_model(model_name)
-
-    def __load_model(self, model_name):
-        """Загрузка модели по имени."""
         if model_name not in self.__models:
             logger.error(f"Модель {model_name} не найдена")
             return None
+        try:
+            return self.__get_bundle(self.__models[model_name])
+        except Exception as e:
+            logger.error(f"Не удалось загрузить модель {model_name}: {e}")
+            return None
 
-        model_config = self.__models[model_name]
+    def __preload_models(self):
+        """Фоновая загрузка в кэш всех моделей из конфигурации, пока позволяет бюджет памяти."""
+        for model_name, model_config in list(self.__models.items()):
+            if model_name not in self.__cache:
+                self.__loader.submit(model_name, ACTION_PRELOAD, lambda job, config=model_config: self.__get_bundle(config, job))
+
+    def __get_bundle(self, model_config, job=None, reload=False):
+        """Набор модели из кэша или загрузка; активная модель из кэша не вытесняется."""
+        if not reload:
+            bundle = self.__cache.get(model_config.model_name)
+            if bundle is not None:
+                return bundle
+        bundle = self.__load_bundle(model_config, job)
+        self.__release(self.__cache.put(bundle, pinned=[self.__current_model]))
+        return bundle
+
+    def __release(self, evicted):
+        """Освобождение памяти видеокарты после вытеснения моделей из кэша."""
+        if evicted and self.__device == "cuda":
+            torch.cuda.empty_cache()
+
+    def __load_bundle(self, model_config, job=None):
+        """
+        Загрузка модели по шагам: проверка файлов, загрузка, прогрев и пробный замер скорости.
+        Возвращает ModelBundle или вызывает исключение с причиной ошибки.
+        """
+        def set_state(state):
+            if job is not None:
+                job.state = state
+
+        set_state(JOB_VALIDATING)
         model_file = os.path.join(MODELS_DIR, model_config.model_file_name)
         if not os.path.isfile(model_file):
-            logger.error(f"Файл модели {model_file} не найден")
-            return None
-
-        yolo = YOLO(model_file)
-        yolo.to(self.__device)
-        logger.info(f"Модель {model_name} успешно загружена")
-        self.__current_model = model_name
+            raise FileNotFoundError(f"Файл модели {model_file} не найден")
+        processor_file = os.path.join(POSTPROCESSORS_DIR, model_config.processor_file or "")
+        if not os.path.isfile(processor_file):
+            raise FileNotFoundError(f"Файл постобработки {processor_file} не найден")
+
+        set_state(JOB_LOADING)
+        start = time.perf_counter()
+        backend = create_backend(MODELS_DIR, model_config, self.__device)
+        postprocessor = self.__import_module_from_path(processor_file)
+        if not any(callable(getattr(postprocessor, name, None)) for name in ("process_batch", "process")):
+            raise AttributeError(f"В {model_config.processor_file} отсутствует функция process_batch или process")
+
+        set_state(JOB_WARMING_UP)
+        imgsz = Config.get("Process.ModelInputSize", 640)
+        backend.warmup(imgsz)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        set_state(JOB_BENCHMARKING)
+        runs = max(1, Config.get("ModelCache.BenchmarkRuns", 3))
+        image = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        start = time.perf_counter()
+        for _ in range(runs):
+            backend.predict(image)
+        benchmark_ms = (time.perf_counter() - start) * 1000 / runs
+        logger.info(
+            f"Модель {model_config.model_name} загружена и прогрета за {load_ms:.0f} мс ({backend.name}), "
+            f"инференс {benchmark_ms:.1f} мс"
+        )
 
-        modelfun = self.__import_module_from_path(os.path.join(POSTPROCESSORS_DIR, model_config.processor_file))
+        return ModelBundle(
+            model_config.model_name, backend, postprocessor, copy.copy(model_config),
+            backend.memory_bytes(), load_ms, benchmark_ms,
+        )
 
-        return yolo, modelfun
+    def __activate(self, bundle):
+        """
+        Публикация набора модели: замена одной ссылкой, кадр обрабатывается целиком прежней или новой моделью.
+        Возвращает False, если за время загрузки активной запрошена другая модель.
+        """
+        if bundle.name != self.__requested_model:
+            # Пока модель загружалась, запрошена другая: загруженная остаётся в кэше
+            logger.info(f"Модель {bundle.name} загружена в кэш, активной запрошена {self.__requested_model}")
+            return False
+        self.__bundle = bundle
+        self.__current_model = bundle.name
+        # Прежняя активная модель больше не закреплена и вытесняется, если кэш превышает бюджет
+        self.__release(self.__cache.trim(pinned=[bundle.name]))
+        Config.set("Process.LastModel", bundle.name)
+        Config.save()
+        logger.info(f"Модель {bundle.name} активна")
+        return True
 
     def __import_module_from_path(self, file_path):
         """Импорт модуля из указанного пути."""
@@ -127,27 +221,50 @@ class Detector:
         spec.loader.exec_module(module)
         return module
 
-    def __format_predictions(self, predictions):
-        ''' Форматирует предсказания '''
-
-        result = []
-
-        model_name = self.__current_model
-        for data in predictions:
-            conf = data.boxes.conf.cpu().tolist()[0]
-            if conf < self.__models[model_name].confidence_threshold:
-                continue
-            xyxy = data.boxes.xyxy.cpu().tolist()[0]
-            class_id = data.boxes.cls.cpu().tolist()[0]
-            class_name = data.names[int(class_id)]
-            if data.keypoints is not None:
-                keypoints = data.keypoints.data.cpu().tolist()[0]
-            else:
-                keypoints = None
-
-            result.append(YoloData(model_name, xyxy, conf, class_id, class_name, keypoints))
-
-        return result
+    def __model_input(self, frame):
+        '''
+        Вход модели. Одноканальный кадр сначала уменьшается до размера входа модели
+        и только затем размножается в 3 канала: полноразмерная цветная копия не создаётся.
+        Возвращает (вход модели, масштаб входа относительно кадра).
+        '''
+        if frame.ndim == 3:
+            return frame, 1.0
+        (h, w) = frame.shape[:2]
+        imgsz = Config.get("Process.ModelInputSize", 640)
+        scale = min(1.0, imgsz / max(h, w))
+        if scale < 1.0:
+            frame = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR), scale
+
+    @staticmethod
+    def __class_filters(bundle):
+        '''
+        Фильтры классов модели: порог уверенности для каждого номера класса и номера искомых классов.
+        Возвращает (наименьший порог, пороги по номерам классов, номера классов или None).
+        '''
+        config = bundle.config
+        names = bundle.backend.names
+        thresholds = np.full(max(names, default=-1) + 1, config.confidence_threshold, dtype=np.float32)
+        for class_id, class_name in names.items():
+            thresholds[class_id] = config.class_thresholds.get(class_name, config.confidence_threshold)
+        classes = None
+        if config.classes:
+            classes = [class_id for class_id, class_name in names.items() if class_name in config.classes]
+        min_conf = float(thresholds.min()) if len(thresholds) else config.confidence_threshold
+        return min_conf, thresholds, classes
+
+    def __format_predictions(self, predictions, bundle, thresholds, scale=1.0):
+        '''
+        Форматирует предсказания в DetectionBatch: порог уверенности класса применяется ко всем
+        объектам сразу, в набор попадают только прошедшие порог. Координаты входа модели
+        масштаба scale переводятся в координаты кадра.
+        '''
+        cls = predictions.cls.astype(np.int64)
+        conf = predictions.conf
+        keep = conf >= thresholds[cls] if len(thresholds) else conf >= bundle.config.confidence_threshold
+        keypoints = predictions.keypoints[keep] if predictions.keypoints is not None else None
+        batch = DetectionBatch(bundle.name, predictions.names, predictions.xyxy[keep], conf[keep], cls[keep], keypoints)
+        return batch.scaled(1 / scale, 1 / scale) if scale != 1.0 else batch
 
     def get_models_list(self):
         """Получение списка моделей."""
@@ -166,10 +283,25 @@ class Detector:
                     "confidence_threshold": yolo_model.confidence_threshold,
                     "model_type": yolo_model.model_type,
                     "processor_file": yolo_model.processor_file,
+                    "backend": yolo_model.backend,
                 }
             )
         return models_list
 
+    def get_bundle(self):
+        """Активный набор модели: модель, постобработка и конфигурация."""
+        return self.__bundle
+
+    def get_model_job(self, job_id):
+        job = self.__loader.get(job_id)
+        return job.to_dict() if job is not None else None
+
+    def get_model_jobs(self):
+        return self.__loader.jobs()
+
+    def get_cache_status(self):
+        return self.__cache.status()
+
     def get_current_yolo_model(self):
         if self.__current_model not in self.__models:
             logger.error("Текущая модель не найдена в списке моделей")
@@ -190,46 +322,56 @@ class Detector:
             "confidence_threshold": yolo_model.confidence_threshold,
             "model_type": yolo_model.model_type,
             "processor_file": yolo_model.processor_file,
+            "backend": yolo_model.backend,
         }
 
     def change_model(self, model_name):
-        """Смена модели."""
+        """
+        Смена модели. Модель из кэша становится активной сразу, иначе загружается в фоне
+        и становится активной после прогрева. Возвращает задание (ModelJob) или None.
+        """
 
-        if model_name == self.__current_model:
-            logger.warning(f"Модель {model_name} уже активна")
-            return True
         logger.info(f"Запрос на смену модели на {model_name}")
         if model_name not in self.__models:
             logger.error(f"Модель {model_name} не найдена в списке доступных моделей")
-            return False
-        new_yolo, new_modelfun = self.__load_model(model_name)
-        if new_yolo is None:
-            logger.error(f"Не удалось загрузить модель {model_name}")
-            return False
-        self.__yolo = new_yolo
-        self.__modelfun = new_modelfun
-        Config.set("Process.LastModel", model_name)
-        Config.save()
-        return True
+            return None
+        self.__requested_model = model_name
+        bundle = self.__cache.get(model_name)
+        if bundle is not None:
+            if model_name == self.__current_model:
+                logger.warning(f"Модель {model_name} уже активна")
+            else:
+                self.__activate(bundle)
+            return self.__loader.completed(model_name, ACTION_CHANGE)
+        model_config = self.__models[model_name]
+        return self.__loader.submit(
+            model_name, ACTION_CHANGE, lambda job: self.__get_bundle(model_config, job), on_ready=self.__activate
+        )
 
-    def detect(self, frame):
-        """Обработка кадра моделью YOLO"""
-        if self.__yolo is None:
+    def detect(self, frame, bundle=None):
+        """Обработка кадра моделью YOLO; bundle - набор модели, прочитанный для этого кадра"""
+        bundle = bundle if bundle is not None else self.__bundle
+        if bundle is None:
             logger.error("Модель YOLO не загружена, пропускаем обработку кадра")
             return None
-        predictions = self.__yolo.predict(frame, verbose=False)[0]
+        model_input, scale = self.__model_input(frame)
+        min_conf, thresholds, classes = self.__class_filters(bundle)
+        predictions = bundle.backend.predict(model_input, min_conf, classes)
         if not predictions:
             logger.warning("Нет предсказаний от модели, пропускаем обработку кадра")
             return None
 
         logger.debug(
-            f"Обработка кадра с моделью {self.__current_model}, найдено {len(predictions.boxes)} объектов"
+            f"Обработка кадра с моделью {bundle.name}, найдено {len(predictions)} объектов"
         )
 
-        return self.__format_predictions(predictions)
+        return self.__format_predictions(predictions, bundle, thresholds, scale)
 
-    def add_model(self, model_name, model_file_name, confidence_threshold, model_type, processor_file):
-        ''' Добавляет новую модель в конфигурацию '''
+    def add_model(self, model_name, model_file_name, confidence_threshold, model_type, processor_file, on_ready=None):
+        '''
+        Добавляет новую модель: проверка, загрузка и прогрев выполняются в фоне,
+        модель появляется в списке только после успешной загрузки. Возвращает задание (ModelJob).
+        '''
         yolo_model = YoloModel(
                 model_name=model_name,
                 model_file_name=model_file_name,
@@ -237,15 +379,31 @@ class Detector:
                 model_type=model_type,
                 processor_file=processor_file,
             )
-        self.__models[model_name] = yolo_model
 
-        logger.info(f"Модель {yolo_model.model_name} добавлена в конфигурацию")
+        def added(bundle):
+            self.__models[model_name] = yolo_model
+            if model_name == self.__current_model:
+                # Заменена активная модель: новый набор публикуется сразу
+                self.__activate(bundle)
+            if on_ready is not None:
+                on_ready()
+            logger.info(f"Модель {yolo_model.model_name} добавлена в конфигурацию")
+
+        return self.__loader.submit(
+            model_name, ACTION_ADD, lambda job: self.__get_bundle(yolo_model, job, reload=True), on_ready=added
+        )
 
     def set_model_threshold(self, model_name, new_threshold):
         if model_name not in self.__models:
             logger.error(f"Модель {model_name} не найдена в списке доступных моделей")
             return False
         self.__models[model_name].confidence_threshold = new_threshold
+        bundle = self.__cache.get(model_name)
+        if bundle is not None:
+            bundle = bundle._replace(config=copy.copy(self.__models[model_name]))
+            self.__cache.put(bundle, pinned=[self.__current_model])
+            if model_name == self.__current_model:
+                self.__bundle = bundle
         Config.set(f"Models.{model_name}.ConfidenceThreshold", new_threshold)
         Config.save()
         logger.info(f"Порог уверенности модели {model_name} изменен на {new_threshold}")
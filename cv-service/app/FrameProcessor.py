@@ -13,12 +13,19 @@ from common.Logger import config_logger
 from common.Redis import get_redis_client
 from common.Utils import is_docker
 from common.Colors import *
+from common.FrameBus import FrameBusReader, REDIS_CAMERA_FRAME_BUS_KEY
+from common.FrameMeta import FrameMeta, get_frame, get_frame_seq, is_new_frame, publish_frame
+from common.FrameNotifier import get_frame_notifier
+from common.FrameLease import FrameLeaseKeeper, RENDITION_FRAME, RENDITION_FRAME_BUS
+from common.CameraRoi import request_roi
+from common.Metrics import Metrics
 
 from Aruco import Aruco
 from Calibrator import Calibrator
 from Detector import Detector
 from Drawer import Drawer
 from ProcessFunction import ProcessFunction
+from ProcessingPipeline import ProcessingPipeline
 
 
 logger = config_logger("cv-service/FrameProcessor.py")
@@ -33,6 +40,19 @@ else:
    MAT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
 
 
+class FrameJob:
+    ''' Кадр в конвейере обработки: изображение, метаданные камеры и результаты стадий '''
+
+    def __init__(self, frame, meta, calibrated):
+        self.frame = frame
+        self.meta = meta
+        self.calibrated = calibrated
+        self.markers = None
+        self.bundle = None
+        self.predictions = None
+        self.received = time.perf_counter()
+
+
 class FrameProcessor:
 
     def __init__(self):
@@ -41,83 +61,223 @@ class FrameProcessor:
         self.calibrator = Calibrator()
         self.detector = Detector()
         self.drawer = Drawer()
-        model = self.detector.get_current_yolo_model()
+        # Модуль постобработки берётся из набора модели, прочитанного для кадра
         self.function = ProcessFunction()
-        self.function.load_function(model)
 
         self.__models = self.detector.get_models_list()
 
         self.process_started = False
         self.__objects = None
+        # Номер последнего прочитанного кадра камеры
+        self.__last_seq = None
+        self.__processed_count = 0
+        # Метка времени триггера текущей серии кадров и количество обработанных кадров серии
+        self.__trigger_timestamp = 0.0
+        self.__trigger_frames = 0
+
+        self.__frame_bus = None
+        if Config.get("Process.UseFrameBus", True):
+            self.__frame_bus = FrameBusReader(redis_client=redis_client)
+
+        self.__notifier = get_frame_notifier(
+            redis_client, REDIS_CAMERA_FRAME_BUS_KEY if self.__frame_bus is not None else REDIS_CAMERA_FRAME_KEY
+        )
+        # Заявка на кадры: без неё camera-service снимает с дежурной частотой
+        self.__lease = FrameLeaseKeeper(redis_client, "cv-service")
+
+        # Стадии после чтения кадра работают в своих потоках: инференс не ждёт кодирования JPEG и Redis
+        self.metrics = Metrics()
+        self.__pipeline = ProcessingPipeline(
+            [
+                ("preprocess", self.__preprocess),
+                ("infer", self.__infer),
+                ("postprocess", self.__postprocess),
+                ("render", self.__render),
+            ],
+            queue_size=Config.get("Process.StageQueueSize", 2),
+            metrics=self.metrics,
+        )
+        self.__pipeline.start()
 
         #self.detector.change_model("LongDetails")
         self.__process_thread = threading.Thread(target=self.__process_loop).start()
         
+    def __get_latest_seq(self):
+        ''' Возвращает номер последнего кадра камеры без чтения самого кадра '''
+        if self.__frame_bus is not None:
+            try:
+                seq = self.__frame_bus.latest_seq()
+                if seq is not None:
+                    return seq
+            except Exception as e:
+                logger.warning(f"Шина кадров недоступна, используется JPEG из Redis: {e}")
+                self.__frame_bus = None
+                self.__notifier = get_frame_notifier(redis_client, REDIS_CAMERA_FRAME_KEY)
+        return get_frame_seq(redis_client, REDIS_CAMERA_FRAME_KEY)
+
+    def __get_frame_from_bus(self):
+        ''' Получает несжатый кадр из шины кадров в разделяемой памяти '''
+        try:
+            bus_frame = self.__frame_bus.read_latest()
+        except Exception as e:
+            logger.warning(f"Шина кадров недоступна, используется JPEG из Redis: {e}")
+            self.__frame_bus = None
+            self.__notifier = get_frame_notifier(redis_client, REDIS_CAMERA_FRAME_KEY)
+            return None, None
+        if bus_frame is None:
+            return None, None
+        meta = FrameMeta(
+            bus_frame.seq, bus_frame.host_timestamp, bus_frame.device_timestamp,
+            bus_frame.width, bus_frame.height, bus_frame.pixel_format,
+            offset_x=bus_frame.offset_x, offset_y=bus_frame.offset_y, binning=bus_frame.binning,
+            trigger_timestamp=bus_frame.trigger_timestamp,
+        )
+        image = bus_frame.image
+        if image.dtype != np.uint8:
+            image = cv2.convertScaleAbs(image, alpha=1 / 256)
+        # Преобразование создаёт новый массив, поэтому дальше слот шины не используется
+        grayscale = Config.get("Process.Grayscale", False)
+        if image.ndim == 2:
+            img = image.copy() if grayscale else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        else:
+            img = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if grayscale else image.copy()
+        if not self.__frame_bus.is_valid(bus_frame):
+            logger.debug("Слот шины кадров перезаписан во время чтения, кадр пропущен")
+            return None, None
+        return img, meta
+
     def __get_frame_from_redis(self):
-        ''' Получает кадр из Redis '''
-        frame_data = redis_client.get(REDIS_CAMERA_FRAME_KEY)
+        ''' Получает кадр из шины кадров или Redis; возвращает (кадр, метаданные) '''
+        if self.__frame_bus is not None:
+            img, meta = self.__get_frame_from_bus()
+            if img is not None:
+                return img, meta
+        frame_data, meta = get_frame(redis_client, REDIS_CAMERA_FRAME_KEY)
         if frame_data:
             np_arr = np.frombuffer(frame_data, np.uint8)
-            img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-            return img
-        return None
+            mode = cv2.IMREAD_GRAYSCALE if Config.get("Process.Grayscale", False) else cv2.IMREAD_COLOR
+            img = cv2.imdecode(np_arr, mode)
+            return img, meta
+        return None, meta
     
-    def __put_frame_to_redis(self, frame):
+    def __put_frame_to_redis(self, frame, source=None):
         ''' Помещает обработанный кадр обратно в Redis '''
 
         _, buffer = cv2.imencode('.jpg', frame)
-        redis_client.set(REDIS_PROCESSED_FRAME_KEY, buffer.tobytes())
-
-    def __process_uncalibrated(self, frame):
-        ''' Обрабатывает некалиброванный кадр '''
-
-        markers = self.__find_markers(frame)
-        if markers and len(markers) > 0:
-            logger.debug(f"Обнаружено {len(markers)} маркерa(ов) ArUco")
-            self.__draw_markers(frame, markers)
-        self.__objects = None
-        self.__put_frame_to_redis(frame)
-
-    def __scale_predictions(self, predictions):
-        ''' Масштабирует координаты объектов '''
-
-        scale_x = Config.get("CalibrationData.ScaleX", 1.0)
-        scale_y = Config.get("CalibrationData.ScaleY", 1.0)
-            
-        for prediction in predictions:
-            prediction.xyxy = (prediction.xyxy[0] * scale_x, prediction.xyxy[1] * scale_y, prediction.xyxy[2] * scale_x, prediction.xyxy[3] * scale_y)
-            prediction.pick_point = (prediction.pick_point[0] * scale_x, prediction.pick_point[1] * scale_y)
-            if prediction.keypoints:
-                prediction.keypoints = [(point[0] * scale_x, point[1] * scale_y) for point in prediction.keypoints]
-        return predictions
-
-    def __process_calibrated(self, frame):
-        ''' Обрабатывает откалиброванный кадр '''
-        frame = self.__prepare_frame(frame)
-        predictions = self.detector.detect(frame)
+        # Обработанный кадр наследует номер и метки времени исходного кадра камеры
+        self.__processed_count += 1
+        meta = FrameMeta(
+            source.seq if source else self.__processed_count,
+            source.host_timestamp if source else None,
+            source.device_timestamp if source else 0,
+            frame.shape[1], frame.shape[0], "Mono8" if frame.ndim == 2 else "BGR8",
+            offset_x=source.offset_x if source else 0,
+            offset_y=source.offset_y if source else 0,
+            binning=source.binning if source else 1,
+            trigger_timestamp=source.trigger_timestamp if source else 0,
+        )
+        publish_frame(redis_client, REDIS_PROCESSED_FRAME_KEY, buffer.tobytes(), meta)
+
+    def __preprocess(self, job):
+        ''' Стадия подготовки: поиск маркеров на некалиброванном кадре, поворот и обрезка откалиброванного '''
+        if job.calibrated:
+            job.frame = self.__prepare_frame(job.frame, job.meta)
+        else:
+            job.markers = self.__find_markers(job.frame)
+        return job
+
+    def __infer(self, job):
+        ''' Стадия инференса '''
+        if job.calibrated:
+            # Набор модели читается один раз: смена модели не затрагивает кадр в обработке
+            job.bundle = self.detector.get_bundle()
+            job.predictions = self.detector.detect(job.frame, job.bundle)
+        return job
+
+    def __postprocess(self, job):
+        ''' Стадия постобработки: функция модели и объекты в координатах калибровки '''
+        if not job.calibrated:
+            self.__objects = None
+            return job
+        predictions = job.predictions
         if predictions and len(predictions) > 0:
-            frame, predictions = self.function.process(frame, predictions)
+            job.frame, predictions = self.function.process(job.frame, predictions, job.bundle.postprocessor)
         if predictions and len(predictions) > 0:
             logger.debug(f"0 элемент до масштабирования: {predictions[0].xyxy}")
-            frame = self.drawer.draw(frame, predictions)
-            predictions = self.__scale_predictions(predictions)
-            logger.debug(f"0 элемент после масштабирования: {predictions[0].xyxy}")
-
-            self.__objects = predictions
-            
-        self.__put_frame_to_redis(frame)
-
-    def __prepare_frame(self, frame):
-        ''' Подготавливает кадр для обработки '''
-        temp_frame = frame.copy()
-        (h, w) = temp_frame.shape[:2]
-        center = self.calibrator.Origin
-        angle_deg = np.degrees(self.calibrator.Theta)
-        M = cv2.getRotationMatrix2D(center, angle_deg, 1.0)
-        temp_frame = cv2.warpAffine(temp_frame, M, (w, h))
-        x, y = map(int, self.calibrator.Origin)
-        width, height = map(int, self.calibrator.Size)
-        return temp_frame[y:y+height, x:x+width]
+            # Отрисовке нужны координаты кадра, поэтому масштабированный набор создаётся отдельно
+            objects = self.__scale_predictions(predictions, job.meta)
+            logger.debug(f"0 элемент после масштабирования: {objects[0].xyxy}")
+            self.__objects = objects
+        else:
+            # Кадр без объектов: объекты прежнего кадра устарели и не должны отдаваться роботу
+            self.__objects = None
+        job.predictions = predictions
+        return job
+
+    def __render(self, job):
+        ''' Стадия отрисовки, кодирования и публикации обработанного кадра '''
+        frame = job.frame
+        if job.markers and len(job.markers) > 0:
+            logger.debug(f"Обнаружено {len(job.markers)} маркерa(ов) ArUco")
+            frame = self.__to_display(frame)
+            self.__draw_markers(frame, job.markers)
+        if job.predictions and len(job.predictions) > 0:
+            frame = self.drawer.draw(self.__to_display(frame), job.predictions)
+        self.__put_frame_to_redis(frame, job.meta)
+        self.metrics.observe("frame_to_result", time.perf_counter() - job.received)
+        self.metrics.mark("processed_frames")
+        return None
+
+    @staticmethod
+    def __frame_geometry(meta):
+        ''' Положение кадра на сенсоре: смещение области интереса и объединение пикселей '''
+        if meta is None:
+            return 0, 0, 1
+        return meta.offset_x or 0, meta.offset_y or 0, meta.binning or 1
+
+    def __scale_predictions(self, predictions, meta=None):
+        ''' Новый набор объектов (DetectionBatch) с масштабированными координатами '''
+
+        # Калибровка хранится в пикселях сенсора, а кадр может быть уменьшен объединением пикселей
+        _, _, binning = self.__frame_geometry(meta)
+        scale_x = Config.get("CalibrationData.ScaleX", 1.0) * binning
+        scale_y = Config.get("CalibrationData.ScaleY", 1.0) * binning
+        return predictions.scaled(scale_x, scale_y)
+
+    def __prepare_frame(self, frame, meta=None):
+        ''' Подготавливает кадр для обработки: поворот и обрезка рабочей области за один проход '''
+        (h, w) = frame.shape[:2]
+        offset_x, offset_y, binning = self.__frame_geometry(meta)
+        # Преобразование кэшируется калибратором: затраты зависят от размера рабочей области, а не сенсора
+        if Config.get("Process.UseRemap", False):
+            map1, map2 = self.calibrator.frame_maps((w, h), (offset_x, offset_y), binning)
+            return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR)
+        M, size = self.calibrator.frame_transform((w, h), (offset_x, offset_y), binning)
+        return cv2.warpAffine(frame, M, size)
+
+    @staticmethod
+    def __to_display(frame):
+        ''' Цветная копия одноканального кадра для отрисовки результатов '''
+        return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR) if frame.ndim == 2 else frame
+
+    def __is_wanted_frame(self, meta):
+        ''' Нужно ли искать объекты на кадре: с Process.TriggeredFramesOnly только кадры по триггеру датчика '''
+        if not Config.get("Process.TriggeredFramesOnly", False):
+            return True
+        if meta is None or not meta.trigger_timestamp:
+            return False
+        if meta.trigger_timestamp != self.__trigger_timestamp:
+            self.__trigger_timestamp = meta.trigger_timestamp
+            self.__trigger_frames = 0
+        self.__trigger_frames += 1
+        limit = Config.get("Process.FramesPerTrigger", 1)
+        return not limit or self.__trigger_frames <= limit
+
+    def __acquire_frames(self):
+        ''' Заявка на кадры камеры с частотой обработки: из шины кадров или JPEG из Redis '''
+        delay = Config.get("Process.ProcessingDelay", 1)
+        fps = 0 if Config.get("Process.TriggeredFramesOnly", False) or not delay else 1 / delay
+        self.__lease.acquire(fps, [RENDITION_FRAME_BUS if self.__frame_bus is not None else RENDITION_FRAME])
 
     def __process_loop(self):
         ''' Запускает цикл обработки кадров '''
@@ -125,26 +285,40 @@ class FrameProcessor:
         logger.debug("Запуск цикла обработки кадров")
         self.process_started = True
         while True:
-            frame = self.__get_frame_from_redis()
+            self.__acquire_frames()
+            # Дешёвая проверка номера кадра: один и тот же кадр не декодируется и не обрабатывается повторно
+            seq = self.__get_latest_seq()
+            if seq is not None and not is_new_frame(seq, self.__last_seq):
+                # Поток спит, пока издатель не оповестит о новом кадре
+                self.__notifier.wait_for_frame(self.__last_seq, timeout=Config.get("Process.FrameWaitTimeout", 1))
+                continue
+
+            with self.metrics.timer("ingest"):
+                frame, meta = self.__get_frame_from_redis()
             if frame is None:
                 logger.warning(
                     "Не удалось получить кадр из Redis, повторная попытка через 5 секунд"
                 )
                 time.sleep(5)
                 continue
-            logger.debug("Кадр успешно получен из Redis, начинаем обработку")
+            if meta is not None:
+                self.__last_seq = meta.seq
+            logger.debug(f"Кадр {self.__last_seq} успешно получен из Redis, начинаем обработку")
             # cv2.putText(frame, "Processing...", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 20)
-            if not self.calibrator.Calibrated:
-                self.__process_uncalibrated(frame)
-            else:
-                self.__process_calibrated(frame)
+            calibrated = self.calibrator.Calibrated
+            if calibrated and not self.__is_wanted_frame(meta):
+                logger.debug(f"Кадр {self.__last_seq} снят без триггера датчика, обработка пропущена")
+                continue
+            self.__pipeline.submit(FrameJob(frame, meta, calibrated))
 
             # self.__put_frame_to_redis(frame)
-            time.sleep(Config.get("Process.ProcessingDelay", 1))
+            # При обработке по триггеру темп задаёт датчик, задержка пропустила бы кадры серии
+            if not Config.get("Process.TriggeredFramesOnly", False):
+                time.sleep(Config.get("Process.ProcessingDelay", 1))
 
     def __find_markers(self, frame):
         ''' Находит маркеры ArUco на кадре '''
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         markers = self.__aruco.detectMarkers(gray)
         return markers
 
@@ -157,18 +331,40 @@ class FrameProcessor:
 
     def calibrate(self):
         ''' Выполняет калибровку на текущем кадре '''
-        frame = self.__get_frame_from_redis()
+        frame, meta = self.__get_frame_from_redis()
         if frame is None:
             logger.warning("Не удалось получить кадр из Redis для калибровки")
             return False
         markers = self.__find_markers(frame)
-        success = self.calibrator.calibrate(markers)
+        offset_x, offset_y, binning = self.__frame_geometry(meta)
+        success = self.calibrator.calibrate(markers, (offset_x, offset_y), binning)
         if success:
             logger.info("Калибровка успешно выполнена")
+            self.__request_hardware_roi()
         else:
             logger.error("Калибровка не удалась")
         return success
 
+    def __request_hardware_roi(self):
+        ''' Запрашивает у камеры область интереса по рабочей области калибровки '''
+        if not Config.get("HardwareRoi.Enabled", False):
+            return
+        bounds = self.calibrator.work_area_bounds(Config.get("HardwareRoi.Margin", 32))
+        roi = None
+        if bounds is not None:
+            left, top, right, bottom = bounds
+            roi = {"Left": left, "Top": top, "Right": right, "Bottom": bottom,
+                   "Binning": Config.get("HardwareRoi.Binning", 1)}
+        try:
+            request_roi(redis_client, roi)
+        except Exception as e:
+            logger.error(f"Не удалось запросить область интереса камеры: {e}")
+
+    def uncalibrate(self):
+        ''' Сбрасывает калибровку и возвращает камере полный кадр '''
+        self.calibrator.uncalibrate()
+        self.__request_hardware_roi()
+
     def set_processing_delay(self, delay):
         ''' Устанавливает задержку между обработкой кадров '''
         Config.set("Process.ProcessingDelay", delay)
@@ -176,7 +372,7 @@ class FrameProcessor:
         logger.info(f"Задержка между обработкой кадров установлена на {delay} с")
 
     def add_model(self, model_name, model_file_name, confidence_threshold, model_type, processor_file):
-        ''' Добавляет новую модель в конфигурацию '''
+        ''' Добавляет новую модель; в конфигурацию она записывается после фоновой проверки и загрузки '''
         model_info = {
             "ModelName": model_name,
             "ModelFileName": model_file_name,
@@ -184,30 +380,39 @@ class FrameProcessor:
             "ModelType": model_type,
             "ModelProcessor": processor_file
         }
-        Config.set(f"Models.{model_name}", model_info)
-        Config.save()
-        self.detector.add_model(model_name, model_file_name, confidence_threshold, model_type, processor_file)
 
-        logger.info(f"Модель {model_info['ModelName']} добавлена в конфигурацию")
+        def save_model():
+            Config.set(f"Models.{model_name}", model_info)
+            Config.save()
+
+        job = self.detector.add_model(
+            model_name, model_file_name, confidence_threshold, model_type, processor_file, on_ready=save_model
+        )
+        return job.to_dict()
 
     def change_model(self, model_name):
-        ''' Смена модели детектора '''
-        if self.detector.change_model(model_name):
-            logger.info(f"Модель изменена на {model_name}")
-            self.function.load_function(self.detector.get_current_yolo_model())
-            return True
-        else:
+        ''' Смена модели детектора; возвращает задание загрузки или None '''
+        job = self.detector.change_model(model_name)
+        if job is None:
             logger.error(f"Не удалось изменить модель на {model_name}")
-            return False
+            return None
+        logger.info(f"Смена модели на {model_name}: {job.state}")
+        return job.to_dict()
+
+    def get_metrics(self):
+        ''' Задержки стадий, глубина очередей и отброшенные кадры конвейера обработки '''
+        return {"Queues": self.__pipeline.status(), "Models": self.detector.get_cache_status(), **self.metrics.snapshot()}
 
     def get_objects(self):
         ''' Получение объектов '''
-        return self.__objects
+        objects = self.__objects
+        return objects.to_list() if objects is not None else None
 
     def get_first_object(self):
         ''' Получение первого объекта '''
-        if self.__objects:
-            return self.__objects[0]
+        objects = self.__objects
+        if objects:
+            return objects.to_list()[0]
         return None
 
 if __name__ == "__main__":
@@ -221,4 +426,4 @@ if __name__ == "__main__":
         if key == ord('c'):
             processor.calibrate()
         if key == ord('r'):
-            processor.calibrator.uncalibrate()
\ No newline at end of file
+            processor.uncalibrate()
\ No newline at end of file
@@ -0,0 +1,296 @@
+# Системные импорты
+import os, sys, ast, glob
+from pathlib import Path
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внешние модули
+import numpy as np
+import cv2
+import yaml
+
+# Внутренние модули
+from common.Logger import config_logger
+
+logger = config_logger("cv-service/InferenceBackend.py")
+
+# Среды выполнения модели
+BACKEND_TORCH = "torch"        # PyTorch, исходный файл .pt
+BACKEND_ONNX = "onnx"          # ONNX Runtime, файл .onnx
+BACKEND_OPENVINO = "openvino"  # OpenVINO, каталог *_openvino_model
+BACKENDS = (BACKEND_TORCH, BACKEND_ONNX, BACKEND_OPENVINO)
+
+PRECISIONS = ("fp32", "fp16", "int8")
+
+# Тип модели в конфигурации -> задача ultralytics
+MODEL_TASKS = {"yolo-pose": "pose", "yolo-detect": "detect"}
+
+# Порог уверенности по умолчанию и NMS как у predict() ultralytics, чтобы среды выполнения давали одинаковые результаты
+MIN_CONFIDENCE = 0.25
+NMS_IOU = 0.7
+MAX_DETECTIONS = 300
+
+
+def path_size(path):
+    """Размер файла или каталога модели на диске, байт."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(file) for file in glob.glob(os.path.join(path, "**"), recursive=True) if os.path.isfile(file))
+    return os.path.getsize(path) if os.path.isfile(path) else 0
+
+
+def artifact_name(model_file_name, backend, precision="fp32"):
+    """Имя файла или каталога модели для среды выполнения: экспорт создаёт его рядом с .pt."""
+    if backend == BACKEND_TORCH:
+        return model_file_name
+    stem = Path(model_file_name).stem
+    suffix = "" if precision == "fp32" else f"_{precision}"
+    if backend == BACKEND_ONNX:
+        return f"{stem}{suffix}.onnx"
+    return f"{stem}{suffix}_openvino_model"
+
+
+class InferenceBackendException(Exception):
+    """Исключение для ошибок загрузки модели в среду выполнения."""
+    pass
+
+
+class Detections:
+    """Результаты модели на одном кадре: массивы NumPy в координатах входного изображения."""
+
+    def __init__(self, xyxy, conf, cls, names, keypoints=None):
+        """
+        :param xyxy: (N, 4) - рамки объектов.
+        :param conf: (N,) - уверенность.
+        :param cls: (N,) - номера классов.
+        :param names: словарь номер класса -> имя.
+        :param keypoints: (N, K, 3) - ключевые точки (x, y, видимость) или None.
+        """
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+        self.names = names
+        self.keypoints = keypoints
+
+    def __len__(self):
+        return len(self.conf)
+
+
+class InferenceBackend:
+    """
+    Общий интерфейс среды выполнения: predict() возвращает Detections для изображения BGR.
+    Порог уверенности и классы применяются до NMS и до передачи результатов из памяти устройства.
+    """
+
+    name = None
+    names = {}
+
+    def predict(self, image, conf=MIN_CONFIDENCE, classes=None) -> Detections:
+        """
+        :param conf: наименьшая уверенность объекта.
+        :param classes: номера классов, которые нужно искать; None - все.
+        """
+        raise NotImplementedError
+
+    def warmup(self, size=640):
+        """Пробный инференс: первые кадры после загрузки не ждут инициализации среды выполнения."""
+        self.predict(np.zeros((size, size, 3), dtype=np.uint8))
+
+    def memory_bytes(self) -> int:
+        """Оценка памяти, занимаемой моделью, байт."""
+        return 0
+
+
+class TorchBackend(InferenceBackend):
+    """Модель ultralytics на PyTorch (CPU или CUDA)."""
+
+    name = BACKEND_TORCH
+
+    def __init__(self, model_file, device="cpu", threads=0, precision="fp32"):
+        import torch
+        from ultralytics import YOLO
+
+        if threads:
+            # Число потоков PyTorch общее для процесса
+            torch.set_num_threads(int(threads))
+        self.__yolo = YOLO(model_file)
+        self.__yolo.to(device)
+        self.names = self.__yolo.names
+        # Половинная точность PyTorch доступна только на CUDA
+        self.__half = precision == "fp16" and device == "cuda"
+
+    def memory_bytes(self):
+        model = self.__yolo.model
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+    def predict(self, image, conf=MIN_CONFIDENCE, classes=None):
+        import torch
+
+        results = self.__yolo.predict(image, verbose=False, half=self.__half, conf=conf, classes=classes)[0]
+        # Рамки (xyxy, conf, cls) и ключевые точки передаются с устройства одним массивом на кадр
+        data = results.boxes.data[:, :6]
+        keypoints = results.keypoints
+        if keypoints is not None:
+            data = torch.cat((data, keypoints.data.flatten(1).to(data.dtype)), dim=1)
+        data = data.float().cpu().numpy()
+        if keypoints is not None:
+            keypoints = data[:, 6:].reshape(len(data), *keypoints.data.shape[1:])
+        return Detections(data[:, :4], data[:, 4], data[:, 5], results.names, keypoints)
+
+
+class ExportedBackend(InferenceBackend):
+    """
+    Модель, экспортированная из ultralytics (export_models.py): подготовка входа
+    (letterbox до размера экспорта), разбор выхода и NMS выполняются здесь, поэтому
+    результаты совпадают с TorchBackend без зависимости от PyTorch во время работы.
+    """
+
+    def __init__(self, model_file, metadata):
+        self.model_file = model_file
+        self.names = {int(key): value for key, value in metadata.get("names", {}).items()}
+        imgsz = metadata.get("imgsz", [640, 640])
+        self.imgsz = tuple(imgsz) if isinstance(imgsz, (list, tuple)) else (imgsz, imgsz)
+        kpt_shape = metadata.get("kpt_shape")
+        self.kpt_shape = tuple(kpt_shape) if kpt_shape else None
+
+    def memory_bytes(self):
+        # Веса экспортированной модели загружаются в память целиком
+        return path_size(self.model_file)
+
+    def _infer(self, blob):
+        """Выход модели (1, 4 + классы + точки, N) для входа NCHW."""
+        raise NotImplementedError
+
+    def __letterbox(self, image):
+        """Уменьшение с сохранением пропорций и дополнение до размера входа, как LetterBox ultralytics."""
+        h, w = image.shape[:2]
+        th, tw = self.imgsz
+        gain = min(th / h, tw / w)
+        nw, nh = round(w * gain), round(h * gain)
+        if (nw, nh) != (w, h):
+            image = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        dw, dh = (tw - nw) / 2, (th - nh) / 2
+        left, top = round(dw - 0.1), round(dh - 0.1)
+        right, bottom = tw - nw - left, th - nh - top
+        image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+        blob = cv2.dnn.blobFromImage(image, 1 / 255.0, swapRB=True)
+        return blob, gain, (left, top)
+
+    def predict(self, image, conf=MIN_CONFIDENCE, classes=None):
+        min_conf = conf
+        (h, w) = image.shape[:2]
+        blob, gain, (left, top) = self.__letterbox(image)
+        output = np.asarray(self._infer(blob), dtype=np.float32)[0].T
+        nc = len(self.names) or (output.shape[1] - 4)
+        scores = output[:, 4:4 + nc]
+        cls = scores.argmax(axis=1)
+        conf = scores[np.arange(len(scores)), cls]
+        candidates = conf >= min_conf
+        if classes is not None:
+            candidates &= np.isin(cls, classes)
+        output, cls, conf = output[candidates], cls[candidates], conf[candidates]
+
+        xywh = output[:, :4]
+        boxes = np.column_stack((xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, 2:]))
+        keep = cv2.dnn.NMSBoxesBatched(
+            boxes.tolist(), conf.tolist(), cls.tolist(), min_conf, NMS_IOU
+        ) if len(conf) else []
+        keep = np.asarray(keep, dtype=np.int64).reshape(-1)[:MAX_DETECTIONS]
+
+        # Координаты входа модели переводятся в координаты изображения
+        pad = np.array([left, top, left, top], dtype=np.float32)
+        xyxy = np.column_stack((boxes[keep, :2], boxes[keep, :2] + boxes[keep, 2:]))
+        xyxy = (xyxy - pad) / gain
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+        keypoints = None
+        if self.kpt_shape is not None:
+            keypoints = output[keep, 4 + nc:].reshape(len(keep), *self.kpt_shape).copy()
+            keypoints[..., :2] = (keypoints[..., :2] - pad[:2]) / gain
+        return Detections(xyxy, conf[keep], cls[keep].astype(np.float32), self.names, keypoints)
+
+
+class OnnxBackend(ExportedBackend):
+    """Модель ONNX в ONNX Runtime."""
+
+    name = BACKEND_ONNX
+
+    def __init__(self, model_file, device="cpu", threads=0, precision="fp32"):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = int(threads)
+            options.inter_op_num_threads = 1
+        providers = ["CPUExecutionProvider"]
+        if device == "cuda" and "CUDAExecutionProvider" in ort.get_available_providers():
+            providers.insert(0, "CUDAExecutionProvider")
+        self.__session = ort.InferenceSession(model_file, options, providers=providers)
+        model_input = self.__session.get_inputs()[0]
+        self.__input_name = model_input.name
+        self.__input_type = np.float16 if model_input.type == "tensor(float16)" else np.float32
+        # Метаданные ultralytics хранятся строками в виде литералов Python
+        metadata = {
+            key: ast.literal_eval(value) if key in ("names", "imgsz", "kpt_shape") else value
+            for key, value in self.__session.get_modelmeta().custom_metadata_map.items()
+        }
+        super().__init__(model_file, metadata)
+        logger.info(f"ONNX Runtime: {Path(model_file).name}, {providers[0]}, потоков: {threads or 'по умолчанию'}")
+
+    def _infer(self, blob):
+        return self.__session.run(None, {self.__input_name: blob.astype(self.__input_type, copy=False)})[0]
+
+
+class OpenVinoBackend(ExportedBackend):
+    """Модель OpenVINO (каталог экспорта ultralytics с .xml, .bin и metadata.yaml)."""
+
+    name = BACKEND_OPENVINO
+
+    def __init__(self, model_file, device="cpu", threads=0, precision="fp32"):
+        import openvino as ov
+
+        model_xml = glob.glob(os.path.join(model_file, "*.xml"))
+        if not model_xml:
+            raise InferenceBackendException(f"В каталоге {model_file} нет модели OpenVINO (.xml)")
+        core = ov.Core()
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = int(threads)
+        if precision == "fp32":
+            # Без подсказки процессоры с bf16 считают в пониженной точности
+            config["INFERENCE_PRECISION_HINT"] = "f32"
+        compiled = core.compile_model(core.read_model(model_xml[0]), "CPU", config)
+        self.__request = compiled.create_infer_request()
+        with open(os.path.join(model_file, "metadata.yaml"), encoding="utf-8") as f:
+            metadata = yaml.safe_load(f) or {}
+        super().__init__(model_file, metadata)
+        logger.info(f"OpenVINO: {Path(model_file).name}, точность {precision}, потоков: {threads or 'по умолчанию'}")
+
+    def _infer(self, blob):
+        self.__request.infer({0: blob})
+        return self.__request.get_output_tensor(0).data
+
+
+BACKEND_CLASSES = {
+    BACKEND_TORCH: TorchBackend,
+    BACKEND_ONNX: OnnxBackend,
+    BACKEND_OPENVINO: OpenVinoBackend,
+}
+
+
+def create_backend(models_dir, model, device="cpu"):
+    """
+    Загружает модель (YoloModel) в среду выполнения из её конфигурации.
+    Если экспортированной модели нет, используется исходный .pt в PyTorch.
+    """
+    backend = model.backend if model.backend in BACKENDS else BACKEND_TORCH
+    model_file = os.path.join(models_dir, artifact_name(model.model_file_name, backend, model.precision))
+    if backend != BACKEND_TORCH and not os.path.exists(model_file):
+        logger.warning(
+            f"Модель {model_file} для {backend} не найдена, используется PyTorch. "
+            f"Экспорт: python export_models.py {model.model_name}"
+        )
+        backend = BACKEND_TORCH
+        model_file = os.path.join(models_dir, model.model_file_name)
+    return BACKEND_CLASSES[backend](model_file, device, model.threads, model.precision)
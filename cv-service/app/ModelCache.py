@@ -0,0 +1,102 @@
+# Системные импорты
+import os, sys, threading
+from collections import OrderedDict, namedtuple
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внутренние модули
+from common.Logger import config_logger
+
+logger = config_logger("cv-service/ModelCache.py")
+
+
+class ModelBundle(namedtuple(
+        "ModelBundle", ("name", "backend", "postprocessor", "config", "memory_bytes", "load_ms", "benchmark_ms"))):
+    """
+    Загруженная и прогретая модель: среда выполнения, модуль постобработки и снимок конфигурации (YoloModel).
+    Неизменяемый набор: кадр читает активный набор один раз и обрабатывается целиком одной моделью;
+    изменение (например, порога уверенности) публикуется новым набором через _replace().
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(name={self.name!r}, backend={self.backend.name}, memory={self.memory_bytes})"
+
+
+class ModelCache:
+    """
+    Кэш загруженных моделей с вытеснением давно не использованных (LRU).
+    Сумма memory_bytes моделей не превышает бюджет; закреплённые модели (активная) не вытесняются,
+    поэтому активная модель остаётся в кэше, даже если одна превышает бюджет.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = int(budget_bytes)
+        self.__models = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, name):
+        """Модель из кэша или None; найденная модель становится самой свежей."""
+        with self.__lock:
+            model = self.__models.get(name)
+            if model is not None:
+                self.__models.move_to_end(name)
+            return model
+
+    def put(self, model, pinned=()):
+        """Добавляет или заменяет модель и вытесняет давно не использованные сверх бюджета; возвращает вытесненные."""
+        with self.__lock:
+            self.__models[model.name] = model
+            self.__models.move_to_end(model.name)
+            evicted = self.__evict(set(pinned) | {model.name})
+        self.__log_evicted(evicted)
+        return evicted
+
+    def trim(self, pinned=()):
+        """
+        Вытесняет давно не использованные модели сверх бюджета; возвращает вытесненные.
+        Вызывается после смены активной модели: при загрузке закреплена и прежняя активная.
+        """
+        with self.__lock:
+            evicted = self.__evict(set(pinned))
+        self.__log_evicted(evicted)
+        return evicted
+
+    def __evict(self, pinned):
+        evicted = []
+        for name in list(self.__models):
+            if self.__memory() <= self.budget_bytes:
+                break
+            if name not in pinned:
+                evicted.append(self.__models.pop(name))
+        return evicted
+
+    @staticmethod
+    def __log_evicted(evicted):
+        for old in evicted:
+            logger.info(f"Модель {old.name} вытеснена из кэша ({old.memory_bytes / 2**20:.0f} МБ)")
+
+    def remove(self, name):
+        with self.__lock:
+            return self.__models.pop(name, None)
+
+    def __contains__(self, name):
+        with self.__lock:
+            return name in self.__models
+
+    def __memory(self):
+        return sum(model.memory_bytes for model in self.__models.values())
+
+    def status(self):
+        with self.__lock:
+            return {
+                "BudgetMB": round(self.budget_bytes / 2**20, 1),
+                "UsedMB": round(self.__memory() / 2**20, 1),
+                "Models": [
+                    {"Name": model.name, "Backend": model.backend.name,
+                     "MemoryMB": round(model.memory_bytes / 2**20, 1), "LoadMs": round(model.load_ms, 1),
+                     "BenchmarkMs": round(model.benchmark_ms, 2)}
+                    for model in self.__models.values()
+                ],
+            }
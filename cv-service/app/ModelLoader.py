@@ -0,0 +1,133 @@
+# Системные импорты
+import os, sys, time, queue, threading, uuid
+from collections import OrderedDict
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внутренние модули
+from common.Logger import config_logger
+
+logger = config_logger("cv-service/ModelLoader.py")
+
+# Состояния задания загрузки модели
+JOB_QUEUED = "Queued"
+JOB_VALIDATING = "Validating"
+JOB_LOADING = "Loading"
+JOB_WARMING_UP = "WarmingUp"
+JOB_BENCHMARKING = "Benchmarking"
+JOB_READY = "Ready"
+JOB_FAILED = "Failed"
+JOB_SUPERSEDED = "Superseded"  # Модель загружена в кэш, но активной за это время запрошена другая
+
+# Действия задания
+ACTION_CHANGE = "Change"    # Загрузить и сделать активной
+ACTION_ADD = "Add"          # Проверить, загрузить и добавить в конфигурацию
+ACTION_PRELOAD = "Preload"  # Загрузить в кэш
+
+# Сколько завершённых заданий хранится для опроса состояния
+MAX_JOBS = 20
+
+
+class ModelJob:
+    """Задание фоновой загрузки модели; состояние опрашивается через /model_jobs."""
+
+    def __init__(self, model_name, action, state=JOB_QUEUED):
+        self.id = uuid.uuid4().hex[:12]
+        self.model_name = model_name
+        self.action = action
+        self.state = state
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.load_ms = None
+        self.benchmark_ms = None
+
+    @property
+    def done(self):
+        return self.state in (JOB_READY, JOB_FAILED, JOB_SUPERSEDED)
+
+    def to_dict(self) -> dict:
+        return {
+            "JobId": self.id,
+            "Model": self.model_name,
+            "Action": self.action,
+            "State": self.state,
+            "Error": self.error,
+            "Created": self.created,
+            "Finished": self.finished,
+            "LoadMs": self.load_ms,
+            "BenchmarkMs": self.benchmark_ms,
+        }
+
+
+class ModelLoader:
+    """
+    Фоновая загрузка моделей: задания выполняются по одному в отдельном потоке,
+    поэтому запрос API возвращается сразу, а обработка кадров продолжается на прежней модели.
+    """
+
+    def __init__(self):
+        self.__queue = queue.Queue()
+        self.__jobs = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__thread = threading.Thread(target=self.__worker, daemon=True)
+        self.__thread.start()
+
+    def __remember(self, job):
+        with self.__lock:
+            self.__jobs[job.id] = job
+            while len(self.__jobs) > MAX_JOBS:
+                oldest = next(iter(self.__jobs))
+                if not self.__jobs[oldest].done:
+                    break
+                del self.__jobs[oldest]
+
+    def submit(self, model_name, action, load, on_ready=None):
+        """
+        Ставит задание в очередь.
+        :param load: функция загрузки load(job): обновляет job.state по шагам и возвращает набор модели
+            (ModelBundle) или вызывает исключение с причиной ошибки.
+        :param on_ready: функция on_ready(bundle), вызывается в потоке загрузчика после успешной загрузки;
+            False - результат не применён (задание завершается в состоянии Superseded).
+        """
+        job = ModelJob(model_name, action)
+        self.__remember(job)
+        self.__queue.put((job, load, on_ready))
+        logger.info(f"Задание {job.id}: {action} модели {model_name} поставлено в очередь")
+        return job
+
+    def completed(self, model_name, action):
+        """Запись о задании, выполненном без загрузки (модель уже в кэше)."""
+        job = ModelJob(model_name, action, JOB_READY)
+        job.finished = job.created
+        self.__remember(job)
+        return job
+
+    def get(self, job_id):
+        with self.__lock:
+            return self.__jobs.get(job_id)
+
+    def jobs(self):
+        with self.__lock:
+            return [job.to_dict() for job in self.__jobs.values()]
+
+    def __worker(self):
+        while True:
+            job, load, on_ready = self.__queue.get()
+            try:
+                bundle = load(job)
+                applied = on_ready(bundle) if on_ready is not None else None
+                job.load_ms = round(bundle.load_ms, 1)
+                job.benchmark_ms = round(bundle.benchmark_ms, 2)
+                job.finished = time.time()
+                if applied is False:
+                    job.state = JOB_SUPERSEDED
+                    logger.info(f"Задание {job.id}: модель {job.model_name} загружена, но не применена")
+                else:
+                    job.state = JOB_READY
+                    logger.info(f"Задание {job.id}: модель {job.model_name} готова")
+            except Exception as e:
+                job.error = str(e)
+                job.finished = time.time()
+                job.state = JOB_FAILED
+                logger.error(f"Задание {job.id}: не удалось загрузить модель {job.model_name}: {e}")
@@ -1,6 +1,5 @@
 # Системные импорты
 import os, sys, json, threading, time
-import importlib.util
 from pathlib import Path
 
 # Добавляем директорию проекта в sys.path
@@ -15,36 +14,32 @@ from ultralytics import YOLO
 # Внутренние модули
 from common.Config import Config
 from common.Logger import config_logger
-from common.Utils import is_docker
-from YoloModel import YoloModel
 from YoloData import YoloData
+from DetectionBatch import DetectionBatch, DetectionRow
 
 logger = config_logger("cv-service/ProcessFunction.py")
 
-if is_docker():
-    POSTPROCESSORS_DIR = "/data/postprocessors"
-else:
-    POSTPROCESSORS_DIR = os.path.join(
-        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "postprocessors"
-    )
-
 class ProcessFunction:
 
-    def __init__(self):
-        self.__func = None
-
-    def load_function(self, model):
-        logger.debug(f"Загрузка функции {model.processor_file}")
-        spec = importlib.util.spec_from_file_location("module.name", POSTPROCESSORS_DIR + "/" + model.processor_file)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        self.__func = module
-        logger.info(f"Функция {model.processor_file} загружена")
-
-    def process(self, frame, yolo_data):
+    def process(self, frame, yolo_data, func):
+        '''
+        Постобработка DetectionBatch; func - модуль постобработки набора модели, прочитанного для кадра.
+        Модуль с process_batch(frame, batch) обрабатывает все объекты сразу; process(frame, yolo_data)
+        получает представления строк набора, как прежде список YoloData.
+        '''
         try:
-            if self.__func:
-                return self.__func.process(frame, yolo_data)
+            if hasattr(func, "process_batch"):
+                return func.process_batch(frame, yolo_data)
+            processed, result = func.process(frame, list(yolo_data))
+            return processed, self.__to_batch(yolo_data, result)
         except AttributeError as e:
-            logger.error("Отсутствует функция process")
-        return yolo_data
\ No newline at end of file
+            # Кадр и объекты остаются без постобработки
+            logger.error(f"Ошибка постобработки: {e}")
+        return frame, yolo_data
+
+    @staticmethod
+    def __to_batch(batch, result):
+        ''' Результат постобработки отдельных объектов в виде DetectionBatch '''
+        if all(isinstance(row, DetectionRow) and row.batch is batch for row in result):
+            return batch.select([row.index for row in result])
+        return DetectionBatch.from_yolo_data(batch.model_name, batch.names, result)
@@ -0,0 +1,100 @@
+# Системные импорты
+import os, sys, time, queue, threading
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# Внутренние модули
+from common.Logger import config_logger
+from common.Metrics import Metrics
+
+logger = config_logger("cv-service/ProcessingPipeline.py")
+
+
+class ProcessingPipeline:
+    """
+    Конвейер обработки кадров: каждая стадия работает в своём потоке, стадии связаны
+    ограниченными очередями. При переполнении очереди отбрасывается самый старый элемент,
+    поэтому медленная стадия (кодирование JPEG, запись в Redis) не задерживает предыдущие,
+    а следующие стадии получают самые свежие кадры.
+    """
+
+    def __init__(self, stages, queue_size=2, metrics=None):
+        """
+        :param stages: список пар (имя стадии, функция); функция получает элемент и возвращает
+            элемент для следующей стадии или None, если обработка элемента закончена.
+        :param queue_size: размер очереди перед каждой стадией.
+        :param metrics: счётчики (common.Metrics): задержки стадий, отброшенные элементы, размеры очередей.
+        """
+        self.__stages = list(stages)
+        self.__queues = [queue.Queue(maxsize=max(1, int(queue_size))) for _ in self.__stages]
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.__dropped = {name: 0 for name, _ in self.__stages}
+        self.__stop = threading.Event()
+        self.__threads = []
+
+    def start(self):
+        logger.info(f"Запуск конвейера обработки кадров, стадии: {[name for name, _ in self.__stages]}")
+        self.__stop.clear()
+        self.__threads = [
+            threading.Thread(target=self.__stage_loop, args=(index,), daemon=True)
+            for index in range(len(self.__stages))
+        ]
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        for thread in self.__threads:
+            thread.join(timeout=5)
+        self.__threads = []
+
+    def submit(self, item):
+        """Передаёт элемент первой стадии."""
+        self.__put(0, item)
+
+    def __put(self, index, item):
+        """Помещает элемент в очередь стадии; при переполнении отбрасывает самый старый элемент."""
+        stage_queue = self.__queues[index]
+        while True:
+            try:
+                stage_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    stage_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                name = self.__stages[index][0]
+                self.__dropped[name] += 1
+                self.metrics.count(f"dropped_{name}")
+                logger.debug(f"Стадия {name} не успевает, старый кадр отброшен")
+
+    def __stage_loop(self, index):
+        name, func = self.__stages[index]
+        stage_queue = self.__queues[index]
+        last = index == len(self.__stages) - 1
+        while not self.__stop.is_set():
+            try:
+                item = stage_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                result = func(item)
+            except Exception as e:
+                self.metrics.count(f"failed_{name}")
+                logger.error(f"Ошибка стадии {name}: {e}")
+                continue
+            finally:
+                self.metrics.observe(name, time.perf_counter() - start)
+            if result is not None and not last:
+                self.__put(index + 1, result)
+
+    def status(self):
+        """Глубина очередей и количество отброшенных кадров по стадиям."""
+        status = {}
+        for (name, _), stage_queue in zip(self.__stages, self.__queues):
+            depth = stage_queue.qsize()
+            self.metrics.set_gauge(f"queue_{name}", depth)
+            status[name] = {"QueueDepth": depth, "QueueSize": stage_queue.maxsize, "Dropped": self.__dropped[name]}
+        return status
@@ -6,13 +6,24 @@ class YoloModel:
         confidence_threshold,
         model_type,
         processor_file,
-        
+        backend="torch",
+        threads=0,
+        precision="fp32",
+        class_thresholds=None,
+        classes=None,
     ):
         self.model_name = model_name
         self.model_file_name = model_file_name
         self.confidence_threshold = confidence_threshold
         self.model_type = model_type
         self.processor_file = processor_file
+        # Среда выполнения (torch, onnx, openvino), потоки инференса (0 - по умолчанию) и точность
+        self.backend = backend
+        self.threads = threads
+        self.precision = precision
+        # Пороги уверенности отдельных классов (имя класса -> порог) и список искомых классов (None - все)
+        self.class_thresholds = class_thresholds or {}
+        self.classes = classes or None
 
     def __repr__(self):
         return (
@@ -21,6 +32,7 @@ class YoloModel:
             f"   Файл модели: {self.model_file_name}\n"
             f"   Порог уверенности: {self.confidence_threshold:.2f}\n"
             f"   Тип модели: {self.model_type}"
+            f"   Среда выполнения: {self.backend} ({self.precision}, потоков: {self.threads})\n"
             f"   Выбор точки: {self.pick_point}\n"
         )
 
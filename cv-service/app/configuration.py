@@ -10,8 +10,24 @@ base_settings = {
 
     "Process":{
         "ProcessingDelay": 1,
+        "FrameWaitTimeout": 1,  # Максимальное ожидание оповещения о новом кадре, сек
         "LastModel": "LongDetails",
-        "FirstObjectCriteria": "Probability" # "Probability" or "Coordinates"
+        "FirstObjectCriteria": "Probability", # "Probability" or "Coordinates"
+        "UseFrameBus": True,  # Чтение несжатых кадров из разделяемой памяти camera-service
+        # Одноканальный конвейер для камер Mono: чтение, поворот и обрезка без размножения каналов,
+        # 3 канала - только на входе модели после уменьшения, цвет - только для отображения
+        "Grayscale": False,
+        "ModelInputSize": 640,  # Размер входа модели, до которого уменьшается одноканальный кадр
+        "UseRemap": False,  # Поворот и обрезка по готовым картам cv2.remap вместо warpAffine (память на карты по размеру рабочей области)
+        "TriggeredFramesOnly": False,  # Искать объекты только на кадрах, снятых по триггеру датчика (режимы IO/Hardware)
+        "FramesPerTrigger": 1,  # Обрабатываемых кадров на один триггер, 0 - все кадры серии
+        "StageQueueSize": 2,  # Очередь перед каждой стадией конвейера обработки; при переполнении отбрасывается самый старый кадр
+    },
+
+    "HardwareRoi": {
+        "Enabled": False,  # Запрашивать у камеры область интереса по рабочей области калибровки
+        "Margin": 32,  # Запас вокруг рабочей области, пиксели сенсора
+        "Binning": 1,  # Объединение пикселей сенсора (1 - без объединения)
     },
 
     "Markers": {
@@ -34,7 +50,11 @@ base_settings = {
             "ConfidenceThreshold": 0.5,
             "ModelType": "yolo-pose",
             "ModelProcessor": "LongDetailsProcessor.py",
-            
+            "Backend": "torch",  # Среда выполнения: torch, onnx или openvino (модель экспортируется export_models.py)
+            "Threads": 0,  # Потоки инференса на CPU, 0 - по умолчанию среды выполнения
+            "Precision": "fp32",  # Точность экспортированной модели: fp32, fp16 или int8
+            "ClassThresholds": {},  # Пороги уверенности отдельных классов: {"имя класса": порог}
+            "Classes": [],  # Искомые классы по именам, пусто - все классы модели
         },
         "RoundDetails": {
             "ModelName": "RoundDetails",
@@ -42,8 +62,18 @@ base_settings = {
             "ConfidenceThreshold": 0.5,
             "ModelType": "yolo-detect",
             "ModelProcessor": "RoundDetailsProcessor.py",
+            "Backend": "torch",
+            "Threads": 0,
+            "Precision": "fp32",
+            "ClassThresholds": {},
+            "Classes": [],
         },
     },
+    "ModelCache": {
+        "MemoryBudgetMB": 2048,  # Память под загруженные модели; сверх бюджета вытесняются давно не использованные
+        "Preload": False,  # Загружать и прогревать все модели при запуске: первая смена модели без загрузки файла
+        "BenchmarkRuns": 3,  # Пробных инференсов после прогрева при загрузке модели (замер скорости)
+    },
     "Display": {
         "BBOX": True,
         "COORDINATES": True,
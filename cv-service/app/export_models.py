@@ -0,0 +1,105 @@
+# Системные импорты
+import os, sys, shutil, argparse, tempfile
+# Добавляем директорию проекта в sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Внешние модули
+import torch
+from ultralytics import YOLO
+
+# Внутренние модули
+from common.Config import Config
+from common.Logger import config_logger
+from common.Utils import is_docker
+import configuration
+from InferenceBackend import BACKEND_TORCH, BACKENDS, PRECISIONS, MODEL_TASKS, artifact_name
+
+logger = config_logger("cv-service/export_models.py")
+
+if is_docker():
+    MODELS_DIR = "/data/models"
+else:
+    MODELS_DIR = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "models"
+    )
+
+EXPORT_FORMATS = {"onnx": "onnx", "openvino": "openvino"}
+
+
+def unsupported_precision(backend, precision):
+    """
+    Причина, по которой ultralytics не создаст модель нужной точности, или None.
+    Для ONNX int8 не поддерживается, а fp16 без CUDA молча заменяется на fp32:
+    такой файл загружался бы как квантованный.
+    """
+    if backend == "onnx" and precision == "int8":
+        return "ultralytics не квантует ONNX в int8, используйте OpenVINO int8 или ONNX fp16/fp32"
+    if backend == "onnx" and precision == "fp16" and not torch.cuda.is_available():
+        return "экспорт ONNX fp16 возможен только на видеокарте CUDA"
+    return None
+
+
+def export_model(model_name, model_config, backend=None, precision=None, data=None):
+    """
+    Экспорт .pt модели из Models для среды выполнения модели (Backend, Precision).
+    Результат сохраняется в каталоге моделей под именем, которое ищет InferenceBackend.
+    """
+    backend = backend or model_config.get("Backend", BACKEND_TORCH)
+    precision = precision or model_config.get("Precision", "fp32")
+    if backend == BACKEND_TORCH:
+        logger.info(f"Модель {model_name} работает в PyTorch, экспорт не нужен")
+        return None
+    model_file = os.path.join(MODELS_DIR, model_config["ModelFileName"])
+    if not os.path.isfile(model_file):
+        logger.error(f"Файл модели {model_file} не найден")
+        return None
+    if precision == "int8" and data is None:
+        logger.error(f"Для int8 нужен набор данных калибровки (--data), модель {model_name} пропущена")
+        return None
+    reason = unsupported_precision(backend, precision)
+    if reason is not None:
+        logger.error(f"Модель {model_name} пропущена: {reason}")
+        return None
+
+    target = os.path.join(MODELS_DIR, artifact_name(model_config["ModelFileName"], backend, precision))
+    imgsz = Config.get("Process.ModelInputSize", 640)
+    task = MODEL_TASKS.get(model_config.get("ModelType", "yolo-pose"))
+    logger.info(f"Экспорт {model_name} -> {backend} {precision}, вход {imgsz}")
+    # ultralytics сохраняет результат рядом с .pt под своим именем, поэтому экспорт идёт из копии
+    # во временном каталоге: иначе fp16/int8 перезаписал бы уже экспортированный <stem>.onnx (fp32)
+    with tempfile.TemporaryDirectory(dir=MODELS_DIR) as work_dir:
+        work_file = os.path.join(work_dir, os.path.basename(model_file))
+        shutil.copy2(model_file, work_file)
+        exported = YOLO(work_file, task=task).export(
+            format=EXPORT_FORMATS[backend],
+            imgsz=imgsz,
+            half=precision == "fp16",
+            int8=precision == "int8",
+            data=data,
+            dynamic=False,
+            device=0 if precision == "fp16" and torch.cuda.is_available() else "cpu",
+        )
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        shutil.move(exported, target)
+    logger.info(f"Модель {model_name} экспортирована: {target}")
+    return target
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Экспорт моделей из data/models для ONNX Runtime и OpenVINO")
+    parser.add_argument("models", nargs="*", help="имена моделей из Models, по умолчанию все")
+    parser.add_argument("--backend", choices=BACKENDS, help="среда выполнения вместо Backend модели")
+    parser.add_argument("--precision", choices=PRECISIONS, help="точность вместо Precision модели")
+    parser.add_argument("--data", help="data.yaml набора данных для калибровки int8")
+    args = parser.parse_args()
+
+    models = Config.get("Models", {})
+    names = args.models or list(models)
+    for name in names:
+        if name not in models:
+            logger.error(f"Модель {name} не найдена в конфигурации")
+            continue
+        export_model(name, models[name], args.backend, args.precision, args.data)
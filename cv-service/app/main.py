@@ -73,7 +73,7 @@ def calibrate():
 @app.post("/uncalibrate")
 def uncalibrate():
     """Сброс калибровки камеры."""
-    processor.calibrator.uncalibrate()
+    processor.uncalibrate()
     return {"Status": "OK", "Calibrated": False}
 
 @app.get("/get_models_list")
@@ -84,11 +84,11 @@ def get_models_list():
 
 @app.post("/change_model")
 def change_model(model_name: str):
-    """Смена модели детектора."""
-    if processor.change_model(model_name):
-        return {"Status": "OK", "CurrentModel": model_name}
-    else:
+    """Смена модели детектора: модель из кэша сразу, иначе фоновая загрузка (состояние - /model_jobs/{job_id})."""
+    job = processor.change_model(model_name)
+    if job is None:
         return {"Status": "Failed", "CurrentModel": processor.detector.get_current_model()}
+    return {"Status": "OK", "CurrentModel": processor.detector.get_current_model(), "Job": job}
     
 @app.get("/get_current_model")
 def get_current_model():
@@ -107,14 +107,27 @@ def set_processing_delay(delay: float):
 
 @app.post("/add_model")
 def add_model(model_name: str, model_file_name: str, confidence_threshold: float, model_type: str, processor_file: str):
-    """Добавление новой модели детектора."""
+    """Добавление новой модели детектора: проверка и загрузка в фоне (состояние - /model_jobs/{job_id})."""
     try:
-        processor.add_model(model_name, model_file_name, confidence_threshold, model_type, processor_file)
-        return {"Status": "OK", "ModelName": model_name, "ModelFileName": model_file_name, "ConfidenceThreshold": confidence_threshold, "ModelType": model_type, "ProcessorFile": processor_file}
+        job = processor.add_model(model_name, model_file_name, confidence_threshold, model_type, processor_file)
+        return {"Status": "OK", "ModelName": model_name, "ModelFileName": model_file_name, "ConfidenceThreshold": confidence_threshold, "ModelType": model_type, "ProcessorFile": processor_file, "Job": job}
     except Exception as e:
         logger.error(f"Ошибка при добавлении модели: {e}")
         return {"Status": "Failed"}
 
+@app.get("/model_jobs")
+def get_model_jobs():
+    """Задания фоновой загрузки моделей."""
+    return {"Status": "OK", "Jobs": processor.detector.get_model_jobs()}
+
+@app.get("/model_jobs/{job_id}")
+def get_model_job(job_id: str):
+    """Состояние задания загрузки модели."""
+    job = processor.detector.get_model_job(job_id)
+    if job is None:
+        return {"Error": f"Задание {job_id} не найдено"}, 404
+    return {"Status": "OK", "Job": job}
+
 @app.post("/set_model_threshold")
 def set_model_threshold(model_name: str, new_threshold: float):
     """Изменение порога уверенности модели."""
@@ -154,6 +167,11 @@ def get_first_object():
     else:
         return {"Status": "Failed"}
 
+@app.get("/metrics")
+def metrics():
+    """Задержки стадий и глубина очередей конвейера обработки."""
+    return {"Status": "OK", **processor.get_metrics()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
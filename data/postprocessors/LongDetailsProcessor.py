@@ -9,10 +9,16 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from common.Logger import config_logger
 logger = config_logger("LongDetailsProcessor.py")
 
+def process_batch(frame, batch):
+    # Точка забора - центр рамки, угол 0: вычисляются для всех объектов набора сразу
+    batch.pick_point = batch.centers()
+    batch.pick_angle = np.zeros(len(batch))
+    return frame, batch
+
 def process(frame, yolo_data):
-    process_frame = frame.copy()
     draw_frame = frame.copy()
-    process_frame = cv2.cvtColor(process_frame, cv2.COLOR_BGR2GRAY)
+    # В одноканальном конвейере (Process.Grayscale) кадр уже в оттенках серого
+    process_frame = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     result = []
     for data in yolo_data:
         x1, y1, x2, y2 = data.xyxy
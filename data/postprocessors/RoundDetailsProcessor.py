@@ -1,5 +1,13 @@
 import cv2
+import numpy as np
 # from data.YoloData import YoloData
+def process_batch(frame, batch):
+    # Класс 0 не забирается; точка забора - центр рамки, угол 0
+    batch = batch.select(batch.class_id != 0)
+    batch.pick_point = batch.centers()
+    batch.pick_angle = np.zeros(len(batch))
+    return frame, batch
+
 def process(frame, yolo_data: list):
     result = []
     for data in yolo_data:
@@ -1,5 +1,5 @@
 # Системные импорты
-import os, time, sys, threading
+import os, time, sys, threading, queue
 # Добавляем директорию проекта в sys.path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
@@ -9,6 +9,8 @@ from pymodbus.client.sync import ModbusTcpClient
 # Внутренние модули
 from common.Logger import config_logger
 from common.Config import Config
+from common.IOEvents import IOEvent, publish_io_event
+from common.Redis import get_redis_client
 from modules.IOModule import IOModule
 from pymodbus.exceptions import ModbusIOException
 
@@ -22,6 +24,35 @@ class IO:
         self.__variables = {}
         for variable_name, variable_id in variables_config.items():
             self.__variables[variable_name] = int(variable_id)
+        # Входы, изменения которых публикуются в Redis: номер бита -> имя переменной
+        published = Config.get("IO.Events.Variables", [])
+        self.__event_inputs = {
+            variable_id - 1000: variable_name
+            for variable_name, variable_id in self.__variables.items()
+            if variable_id >= 1000 and variable_name in published
+        }
+
+    def __detect_edges(self, inputs, timestamp):
+        """Ставит в очередь публикации изменения входов, отслеживаемых переменными IO.Events.Variables."""
+        previous = self.__inputs
+        for bit, variable_name in self.__event_inputs.items():
+            if bit < len(inputs) and bit < len(previous) and inputs[bit] != previous[bit]:
+                event = IOEvent(variable_name, inputs[bit], timestamp)
+                try:
+                    self.__events.put_nowait(event)
+                except queue.Full:
+                    logger.warning(f"Очередь событий IO переполнена, событие {event} отброшено")
+
+    def __event_loop(self):
+        """Публикация событий входов в Redis отдельно от цикла опроса, чтобы Redis не задерживал опрос."""
+        redis_client = get_redis_client()
+        while True:
+            event = self.__events.get()
+            try:
+                publish_io_event(redis_client, event)
+                logger.debug(f"Опубликовано событие {event}")
+            except Exception as e:
+                logger.error(f"Ошибка при публикации события {event}: {e}")
 
 
     def __process_loop(self):
@@ -33,8 +64,13 @@ class IO:
             try:
                 # Чтение данных
                 register = self.__client.read_holding_registers(0, 1).registers[0]
+                # Момент чтения регистра - метка времени фронта с точностью до IO.RefreshRateMS
+                timestamp = time.time()
                 array = [int(bit) for bit in bin(register)[2:].zfill(8)]
-                self.__inputs = array[::-1]
+                inputs = array[::-1]
+                if connected and self.__event_inputs:
+                    self.__detect_edges(inputs, timestamp)
+                self.__inputs = inputs
                 # Запись данных
                 self.__client.write_coils(0, self.__outputs)
                 if not connected:
@@ -51,6 +87,12 @@ class IO:
         self.load_variables()
         self.__inputs = [0] * 16
         self.__outputs = [0] * 16
+        self.__events = queue.Queue(maxsize=1000)
+        if self.__event_inputs and Config.get("IO.Events.Enabled", True):
+            self.__event_thread = threading.Thread(target=self.__event_loop, daemon=True)
+            self.__event_thread.start()
+        else:
+            self.__event_inputs = {}
         self.__process_thread = threading.Thread(target=self.__process_loop)
         self.__process_thread.start()
 
@@ -11,6 +11,10 @@ base_settings = {
     "IO": {
         "IPAddress": "192.168.1.253",
         "RefreshRateMS": 10,
+        "Events": {
+            "Enabled": True,  # Публикация изменений входов в Redis (захват кадров по датчику в camera-service)
+            "Variables": ["DI0", "DI1", "DI2", "DI3", "DI4", "DI5", "DI6", "DI7"],  # Отслеживаемые переменные-входы
+        },
         "Modules": {
             "1": "822-1BF",
             "2": "821-1BF"
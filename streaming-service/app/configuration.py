@@ -10,7 +10,8 @@ from common.Config import Config
 base_settings = {
     "Streaming": {
         "DisplayedFrame": "REDIS_CAMERA",  # Options: REDIS_CAMERA, REDIS_PROCESSED_FRAME
-        "FPS": 24  # Частота кадров для стриминга
+        "FPS": 24,  # Частота кадров для стриминга
+        "UseCameraPreview": True  # Стриминг уменьшенной копии кадра камеры вместо полного кадра
     },
 }
 
@@ -15,18 +15,63 @@ import configuration
 from common.Logger import config_logger
 from common.Redis import get_redis_client
 from common.Config import Config
+from common.FrameMeta import get_frame_seq, is_new_frame
+from common.FrameNotifier import get_frame_notifier
+from common.FrameLease import FrameLeaseKeeper, RENDITION_FRAME, RENDITION_PREVIEW
 
 REDIS_CAMERA_FRAME_KEY = os.getenv("REDIS_CAMERA_FRAME_KEY", "camera_frame")
 REDIS_PROCESSED_FRAME_KEY = os.getenv("REDIS_PROCESSED_FRAME_KEY", "processed_frame")
+REDIS_CAMERA_PREVIEW_KEY = os.getenv("REDIS_CAMERA_PREVIEW_KEY", "camera_frame_preview")
 
 redis_client = get_redis_client()
 logger = config_logger("streaming-service/main.py")
 
+# Заявка на кадры камеры действует, пока открыт хотя бы один поток
+stream_lease = FrameLeaseKeeper(redis_client, "streaming-service")
+active_streams = 0
+active_streams_lock = threading.Lock()
+
+def acquire_stream_frames(key):
+    """Заявка на кадр камеры с частотой стриминга; обработанные кадры публикует cv-service по своей заявке."""
+    if key == REDIS_PROCESSED_FRAME_KEY:
+        stream_lease.release()
+        return
+    rendition = RENDITION_PREVIEW if key == REDIS_CAMERA_PREVIEW_KEY else RENDITION_FRAME
+    stream_lease.acquire(Config.get("Streaming.FPS", 24), [rendition])
+
 def mjpeg_generator():
     """Генератор для MJPEG потока."""
+    global active_streams
+    with active_streams_lock:
+        active_streams += 1
+    try:
+        yield from stream_frames()
+    finally:
+        with active_streams_lock:
+            active_streams -= 1
+            if active_streams == 0:
+                stream_lease.release()
+
+def stream_frames():
+    """Кадры MJPEG потока."""
+    last_seq = None
+    last_key = None
     while True:
         try:
-            frame_data = redis_client.get(CURRENT_REDIS_KEY)
+            key = CURRENT_REDIS_KEY
+            acquire_stream_frames(key)
+            # Повторно отправляем кадр только если издатель опубликовал новый
+            seq = get_frame_seq(redis_client, key)
+            if seq is None and key == REDIS_CAMERA_PREVIEW_KEY:
+                # camera-service не публикует уменьшенную копию, отправляем полный кадр
+                key = REDIS_CAMERA_FRAME_KEY
+                seq = get_frame_seq(redis_client, key)
+            if key == last_key and seq is not None and not is_new_frame(seq, last_seq):
+                # Ждём оповещения о новом кадре вместо опроса Redis
+                get_frame_notifier(redis_client, key).wait_for_frame(last_seq, timeout=1)
+                continue
+            frame_data = redis_client.get(key)
+            last_seq, last_key = seq, key
             if frame_data:
                 yield (
                     b"--frame\r\n"
@@ -34,18 +79,25 @@ def mjpeg_generator():
             )
         except Exception as e:
             logger.error(f"Произошла ошибка при генерации MJPEG потока: {e}")
+        # Ограничение частоты отправки кадров клиенту
         time.sleep(1/Config.get("Streaming.FPS", 24))  # ~24 fps
 
+def get_camera_frame_key():
+    """Ключ кадра камеры для браузера: уменьшенная копия, если включена."""
+    if Config.get("Streaming.UseCameraPreview", True):
+        return REDIS_CAMERA_PREVIEW_KEY
+    return REDIS_CAMERA_FRAME_KEY
+
 def get_redis_key():
     """Получает ключ Redis из конфигурации."""
     key_name =  Config.get("Streaming.DisplayedFrame")
     logger.debug(f"Получение ключа Redis из конфигурации: {key_name}")
     if key_name == "REDIS_CAMERA_FRAME_KEY":
-        return REDIS_CAMERA_FRAME_KEY
+        return get_camera_frame_key()
     elif key_name == "REDIS_PROCESSED_FRAME_KEY":
         return REDIS_PROCESSED_FRAME_KEY
     else:
-        return REDIS_CAMERA_FRAME_KEY  # значение по умолчанию, если ключ не найден
+        return get_camera_frame_key()  # значение по умолчанию, если ключ не найден
 
 CURRENT_REDIS_KEY = get_redis_key()
 logger.debug(f"INITIAL CURRENT_REDIS_KEY установлен на {CURRENT_REDIS_KEY}")
@@ -115,7 +167,7 @@ def stream_camera_frame():
     logger.debug("Запрос /stream_camera_frame")
     Config.set("Streaming.DisplayedFrame", "REDIS_CAMERA_FRAME_KEY")
     Config.save()
-    CURRENT_REDIS_KEY = REDIS_CAMERA_FRAME_KEY
+    CURRENT_REDIS_KEY = get_camera_frame_key()
     logger.debug("Ключ Redis для стриминга кадра камеры установлен")
     return {"Status": "OK",
             "DisplayedFrame": "REDIS_CAMERA_FRAME_KEY"}
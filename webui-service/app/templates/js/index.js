@@ -231,8 +231,8 @@ function changeModel() {
     .then(response => response.json())
     .then(data => {
         if (data.Status === "OK") {
-            console.log(`Модель успешно изменена на ${selectedModel}`);
-            alert(`Модель успешно изменена на ${selectedModel}`);
+            // Модель не из кэша загружается в фоне: ждём завершения задания
+            waitModelJob(data.Job, selectedModel);
         } else {
             console.error(`Ошибка при изменении модели:`, data);
             alert(`Ошибка при изменении модели: ${data.Status}`);
@@ -244,6 +244,39 @@ function changeModel() {
     });
 }
 
+function waitModelJob(job, modelName) {
+    if (job.State === "Ready") {
+        console.log(`Модель успешно изменена на ${modelName}`);
+        alert(`Модель успешно изменена на ${modelName}`);
+        return;
+    }
+    if (job.State === "Superseded") {
+        console.warn(`Модель ${modelName} загружена, но активной запрошена другая модель`);
+        alert(`Модель ${modelName} не активирована: за время загрузки запрошена другая модель`);
+        return;
+    }
+    if (job.State === "Failed") {
+        console.error(`Ошибка при загрузке модели:`, job);
+        alert(`Ошибка при загрузке модели: ${job.Error}`);
+        return;
+    }
+    setTimeout(() => {
+        fetch(`${CV_API_URL}/model_jobs/${job.JobId}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.Status === "OK") {
+                waitModelJob(data.Job, modelName);
+            } else {
+                alert(`Ошибка при изменении модели`);
+            }
+        })
+        .catch(error => {
+            console.error(`Ошибка при опросе загрузки модели:`, error);
+            alert(`Ошибка при изменении модели`);
+        });
+    }, 500);
+}
+
 function setConfidence() {
     const modelSelect = document.getElementById('model-select');
     const confidenceInput = document.getElementById('confidence-input');